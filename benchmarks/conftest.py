@@ -0,0 +1,50 @@
+"""Shared fixtures of the benchmark suite.
+
+Run the suite with ``tox -e bench``. ``tox -e bench-baseline`` stores the
+results as baseline, ``tox -e bench-compare`` compares every benchmark
+against the latest baseline and fails if its mean time regressed by more
+than 20%.
+
+"""
+import tracemalloc
+
+import pytest
+
+
+@pytest.fixture
+def peak_memory(benchmark):
+    """Returns a function measuring the peak memory allocated by a call.
+
+    The peak is stored as `peak_bytes` in the extra info of the benchmark.
+    The call is traced once, outside the timed rounds.
+
+    """
+    def measure(function, *args, **kwargs):
+        tracemalloc.start()
+        try:
+            result = function(*args, **kwargs)
+            benchmark.extra_info['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return result
+    return measure
+
+
+@pytest.fixture
+def throughput(benchmark):
+    """Returns a function benchmarking a call that processes `samples`.
+
+    Calls with a million samples or more are timed in a single round. The
+    processed samples per second are stored as `samples_per_second` in the
+    extra info of the benchmark.
+
+    """
+    def run(samples, function, *args, **kwargs):
+        if samples >= 10**6:
+            result = benchmark.pedantic(function, args, kwargs, rounds=1)
+        else:
+            result = benchmark(function, *args, **kwargs)
+        if benchmark.stats is not None:
+            benchmark.extra_info['samples_per_second'] = samples / benchmark.stats.stats.mean
+        return result
+    return run
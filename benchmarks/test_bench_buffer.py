@@ -0,0 +1,26 @@
+"""Memory and speed of the sample buffer for a 10^6 sample run."""
+import pytest
+
+from heatcapacity.buffer import SampleBuffer
+
+SAMPLES = 10**6
+
+
+def collect_list():
+    data = []
+    for i in range(SAMPLES):
+        data.append((float(i), 1e-3 * i, 1e-6 * i))
+    return tuple(zip(*data))
+
+
+def collect_buffer():
+    data = SampleBuffer()
+    for i in range(SAMPLES):
+        data.append((float(i), 1e-3 * i, 1e-6 * i))
+    return data.columns()
+
+
+@pytest.mark.parametrize('collect', [collect_list, collect_buffer])
+def test_collect(benchmark, peak_memory, collect):
+    peak_memory(collect)
+    benchmark.pedantic(collect, rounds=3)
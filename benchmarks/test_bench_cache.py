@@ -0,0 +1,34 @@
+"""Cost of a cache hit compared to a refit."""
+import numpy as np
+import pytest
+
+from heatcapacity.cache import FitCache
+from heatcapacity.fit import FirstOrder
+
+
+@pytest.fixture(scope='module')
+def pulse():
+    t = np.arange(10000) * 0.01
+    u = np.where(t >= 25., 1e-3, 0.)
+    y = np.where(t >= 25., 0.5 * (1. - np.exp(-0.5 * (t - 25.))), 0.)
+    y += np.random.RandomState(0).normal(scale=1e-3, size=len(t))
+    return t, y, u
+
+
+def test_refit(benchmark, pulse):
+    benchmark(FirstOrder.fit, *pulse)
+
+
+def test_memory_hit(benchmark, pulse):
+    fit = FitCache()(FirstOrder.fit)
+    fit(*pulse)
+    benchmark(fit, *pulse)
+
+
+def test_disk_hit(benchmark, pulse, tmpdir):
+    directory = str(tmpdir)
+    FitCache(directory=directory).fit(FirstOrder.fit, *pulse)
+    # Without memory tier, every lookup reads the pickled result.
+    cache = FitCache(maxsize=0, directory=directory)
+    benchmark(cache.fit, FirstOrder.fit, *pulse)
+    assert cache.misses == 0
@@ -0,0 +1,33 @@
+"""Cost of the excitation design and the measurement time it saves.
+
+Every design is compared to a hand-written pulse, a step of 20 time
+constants, repeated until it reaches the same precision.
+
+"""
+import numpy as np
+import pytest
+
+from heatcapacity.design import FAMILIES, design, relative_uncertainty
+from heatcapacity.fit import FirstOrder
+
+SAMPLING = 0.1
+
+
+def reference_duration(prior, sigma, target):
+    """The duration of the repeated hand-written pulse reaching the target."""
+    pulse = np.r_[np.full(200, 1e-3), np.zeros(200)]
+    for repeat in range(1, 1000):
+        power = 1e3 * np.square(np.tile(pulse, repeat))
+        if relative_uncertainty(prior, power, SAMPLING, sigma)[0] <= target:
+            return len(power) * SAMPLING
+    return np.inf
+
+
+@pytest.mark.parametrize('family', FAMILIES[1:])
+@pytest.mark.parametrize('sigma', [1e-3, 1e-2, 3e-2])
+def test_design(benchmark, family, sigma):
+    prior = FirstOrder.from_ck(0.004, 0.002)
+    best = benchmark(design, prior, SAMPLING, sigma, 0.01, 1e-3, 1e3,
+                     families=(family,), max_duration=1000.)
+    benchmark.extra_info['duration'] = best.duration
+    benchmark.extra_info['reference_duration'] = reference_duration(prior, sigma, 0.01)
@@ -0,0 +1,40 @@
+"""Per-sample latency of the Savitzky-Golay derivative filter."""
+import numpy as np
+import pytest
+from scipy import signal
+
+from heatcapacity.measure import savitzky_golay
+
+WINDOWS = [11, 101]
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_fir_sample(benchmark, window):
+    derivative = savitzky_golay(window, 2, deriv=1, sampling=0.1)
+    benchmark(derivative, 1.)
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_fir_process(benchmark, window):
+    derivative = savitzky_golay(window, 2, deriv=1, sampling=0.1)
+    x = np.random.RandomState(0).normal(size=10**5)
+    benchmark(derivative.process, x)
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_audiolazy_sample(benchmark, window):
+    """The previous implementation based on an audiolazy stream."""
+    try:
+        import audiolazy
+    except ImportError:
+        # Not installed or broken on python 3.10 and newer.
+        pytest.skip('audiolazy is not available.')
+    input = audiolazy.ControlStream(0.)
+    coefficients = signal.savgol_coeffs(window, 2, deriv=1, delta=0.1, use='conv')
+    derivative = audiolazy.ZFilter(numerator=coefficients.tolist())(input)
+
+    def update():
+        input.value = 1.
+        return derivative.take()
+
+    benchmark(update)
@@ -0,0 +1,170 @@
+"""Benchmarks of the first order model fits.
+
+Run with ``tox -e bench`` or ``py.test benchmarks`` (requires pytest-benchmark).
+
+"""
+import numpy as np
+import pytest
+
+from heatcapacity.fit import FirstOrder
+
+
+def pulses(count, samples=600, sampling=0.1, seed=0):
+    """Creates `count` noisy first order step responses."""
+    rng = np.random.RandomState(seed)
+    t = np.arange(samples) * sampling
+    c = rng.uniform(0.003, 0.006, count)[:, None]
+    k = rng.uniform(0.001, 0.003, count)[:, None]
+    on = t >= t[samples // 4]
+    u = np.where(on, 1e-3, 0.)
+    y = np.where(on, 1e-3 / k * (1. - np.exp(-k / c * (t - t[samples // 4]))), 0.)
+    y += rng.normal(scale=1e-4, size=y.shape)
+    return t, y, np.broadcast_to(u, y.shape)
+
+
+def trace(samples, sampling=0.01):
+    """A noisy step response of `samples` samples.
+
+    The time constant scales with the length, so every trace covers the same
+    15 time constants of heating.
+
+    """
+    t = np.arange(samples) * sampling
+    tau = t.max() / 20.
+    on = t >= t[samples // 4]
+    u = np.where(on, 1e-3, 0.)
+    y = 0.5 * (1. - np.exp(-np.clip(t - t[samples // 4], 0., None) / tau))
+    y += np.random.RandomState(0).normal(scale=1e-4, size=samples)
+    return t, y, u
+
+
+@pytest.mark.parametrize('samples', [10**2, 10**3, 10**4, 10**5, 10**6, 10**7])
+def test_fit_length(throughput, peak_memory, samples):
+    t, y, u = trace(samples)
+    peak_memory(FirstOrder.fit, t, y, u)
+    throughput(samples, FirstOrder.fit, t, y, u)
+
+
+@pytest.mark.parametrize('count', [10, 100, 1000])
+def test_fit_loop(benchmark, count):
+    t, y, u = pulses(count)
+    benchmark(lambda: [FirstOrder.fit(t, yi, ui) for yi, ui in zip(y, u)])
+
+
+@pytest.mark.parametrize('count', [10, 100, 1000])
+def test_fit_batch(benchmark, count):
+    t, y, u = pulses(count)
+    benchmark(FirstOrder.fit_batch, t, y, u)
+
+
+@pytest.mark.parametrize('count', [10, 100])
+def test_lsim_loop(benchmark, count):
+    """Quality check of every fit with a generic lti simulation."""
+    from scipy import signal
+
+    t, y, u = pulses(count)
+    models = [FirstOrder.fit_integral(t, yi, ui) for yi, ui in zip(y, u)]
+
+    def check():
+        return [np.sqrt(np.mean((signal.lsim((m.num, m.den), ui, t, interp=False)[1] - yi)**2))
+                for m, yi, ui in zip(models, y, u)]
+    benchmark.pedantic(check, rounds=3)
+
+
+@pytest.mark.parametrize('count', [10, 100, 1000])
+def test_residuals_batch(benchmark, count):
+    t, y, u = pulses(count)
+    heat_capacity, thermal_conductivity = FirstOrder.fit_batch(t, y, u)
+    benchmark(FirstOrder.residuals_batch, heat_capacity, thermal_conductivity, t, y, u)
+
+
+@pytest.fixture(scope='module')
+def simulated():
+    """A 10^5 sample pulse response generated with :class:`Simulation`."""
+    from heatcapacity.simulation import Simulation
+
+    c, k, sampling, samples = 0.004, 0.002, 0.01, 100000
+    sim = Simulation(FirstOrder.from_ck(c, k), sampling=sampling,
+                     heater_resistance=1e3, sigma=1e-3, seed=0)
+    pulse = np.where(np.arange(samples) < samples // 2, 1e-3, 0.)
+    t = np.arange(samples) * sampling
+    u, y = sim.simulate(pulse)
+    return c, k, t, y, u
+
+
+@pytest.mark.parametrize('derivative', ['spline', 'savgol', 'gradient'])
+def test_fit_derivative(benchmark, simulated, derivative):
+    c, k, t, y, u = simulated
+    model = benchmark(FirstOrder.fit, t, y, u, derivative=derivative)
+    benchmark.extra_info['heat_capacity_error'] = model.heat_capacity / c - 1
+    benchmark.extra_info['thermal_conductivity_error'] = model.thermal_conductivity / k - 1
+
+
+def test_fit_integral(benchmark, simulated):
+    c, k, t, y, u = simulated
+    model = benchmark(FirstOrder.fit_integral, t, y, u)
+    benchmark.extra_info['heat_capacity_error'] = model.heat_capacity / c - 1
+    benchmark.extra_info['thermal_conductivity_error'] = model.thermal_conductivity / k - 1
+
+
+def test_fit_arx(benchmark, simulated):
+    c, k, t, y, u = simulated
+    model = benchmark(FirstOrder.fit_arx, t, y, u)
+    benchmark.extra_info['heat_capacity_error'] = model.heat_capacity / c - 1
+    benchmark.extra_info['thermal_conductivity_error'] = model.thermal_conductivity / k - 1
+
+
+@pytest.mark.parametrize('sigma', [1e-4, 1e-3, 1e-2])
+@pytest.mark.parametrize('method', ['fit', 'fit_integral', 'fit_arx'])
+def test_noise_robustness(benchmark, method, sigma):
+    """Fits 20 noise realisations and reports the rms relative error."""
+    c, k = 0.004, 0.002
+    t, y, u = pulses(20, samples=3000, sampling=0.01)
+    y = 1e-3 / k * (1. - np.exp(-k / c * np.clip(t - t[750], 0., None)))
+    y = y + np.random.RandomState(1).normal(scale=sigma, size=(20, len(t)))
+    fit = getattr(FirstOrder, method)
+
+    models = benchmark(lambda: [fit(t, yi, ui) for yi, ui in zip(y, u)])
+    c_fit = np.array([m.heat_capacity for m in models])
+    k_fit = np.array([m.thermal_conductivity for m in models])
+    benchmark.extra_info['heat_capacity_rms_error'] = np.sqrt(np.mean((c_fit / c - 1)**2))
+    benchmark.extra_info['thermal_conductivity_rms_error'] = np.sqrt(np.mean((k_fit / k - 1)**2))
+
+
+@pytest.fixture(scope='module')
+def two_tau():
+    """A noisy two-tau pulse response generated with :class:`SecondOrder`."""
+    from heatcapacity.fit import SecondOrder
+
+    parameters = (0.002, 0.004, 0.002, 0.001)
+    t = np.arange(6000) * 0.1
+    u = np.where((t >= 10.) & (t < 310.), 1e-3, 0.)
+    y = SecondOrder.from_ck(*parameters).predict(t, u)
+    y += np.random.RandomState(0).normal(scale=1e-3, size=y.shape)
+    return parameters, t, y, u
+
+
+def naive_fit(t, y, u):
+    """General purpose nonlinear least squares from a generic initial guess."""
+    from scipy import optimize
+    from heatcapacity.fit import SecondOrder
+
+    def residuals(x):
+        return SecondOrder.from_ck(*np.exp(x)).predict(t, u) - y
+    result = optimize.least_squares(residuals, np.log([1e-3, 1e-3, 1e-3, 1e-3]))
+    return SecondOrder.from_ck(*np.exp(result.x))
+
+
+@pytest.mark.parametrize('method', ['linear', 'refined', 'naive'])
+def test_fit_second_order(benchmark, two_tau, method):
+    from heatcapacity.fit import SecondOrder
+
+    parameters, t, y, u = two_tau
+    if method == 'naive':
+        model = benchmark(naive_fit, t, y, u)
+    else:
+        model = benchmark(SecondOrder.fit, t, y, u, refine=method == 'refined')
+    errors = np.array(model._parameters()) / parameters - 1
+    for name, error in zip(['addenda_heat_capacity', 'sample_heat_capacity',
+                            'thermal_conductivity', 'internal_conductivity'], errors):
+        benchmark.extra_info[name + '_error'] = error
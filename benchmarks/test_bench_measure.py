@@ -0,0 +1,39 @@
+"""Overhead of the acquisition loop per sample.
+
+The instruments answer instantly and a virtual clock replaces the sleeps, so
+the benchmarks time the pure software cost of a sample, i.e. the lower
+bound of the sampling time.
+
+"""
+import numpy as np
+import pytest
+
+from heatcapacity.measure import PulseMeasurement
+from heatcapacity.simulation import VirtualClock
+
+
+class Instrument(object):
+    """A zero latency current source, powermeter and thermometer."""
+    current = voltage = temperature = 1.
+
+
+def pulse_measurement(samples, concurrent=False):
+    instrument = Instrument()
+    measurement = PulseMeasurement(instrument, instrument, instrument,
+                                   np.zeros(samples), 0.1, concurrent=concurrent)
+    measurement.clock = VirtualClock()
+    return measurement
+
+
+@pytest.mark.parametrize('samples', [10**3, 10**5])
+def test_pulse_measurement(throughput, peak_memory, samples):
+    measurement = pulse_measurement(samples)
+    peak_memory(measurement.start)
+    throughput(samples, measurement.start)
+    assert measurement.scheduler.overruns == 0
+
+
+def test_pulse_measurement_concurrent(throughput):
+    measurement = pulse_measurement(10**3, concurrent=True)
+    throughput(10**3, measurement.start)
+    measurement.close()
@@ -0,0 +1,16 @@
+"""Scaling of the Monte-Carlo engine with the number of worker processes."""
+import numpy as np
+import pytest
+
+from heatcapacity.fit import FirstOrder
+from heatcapacity.montecarlo import monte_carlo
+
+
+@pytest.mark.parametrize('workers', [1, 2, 4, 8])
+def test_monte_carlo(benchmark, workers):
+    pulse = np.r_[np.zeros(500), np.full(1500, 1e-3), np.zeros(1500)]
+    model = FirstOrder.from_ck(0.004, 0.002)
+    benchmark.pedantic(
+        monte_carlo, args=(model, pulse, 0.01, 1e-3, 400),
+        kwargs=dict(heater_resistance=1e3, workers=workers, seed=0),
+        rounds=3)
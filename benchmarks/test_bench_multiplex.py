@@ -0,0 +1,37 @@
+"""Throughput of the multiplexed acquisition of several platforms.
+
+The instruments run on a virtual clock with a bridge settling time of 30 ms
+and heater reads of 20 ms. The benchmark times the software cost of a run,
+`extra_info` reports the samples per second of the simulated setup.
+
+"""
+import numpy as np
+import pytest
+
+from heatcapacity.fit import FirstOrder
+from heatcapacity.multiplex import Multiplexer, Platform
+from heatcapacity.simulation import SimulatedScanner, Simulation, VirtualClock
+from heatcapacity.test.helpers import SlowPowermeter
+
+
+def run(platforms, interleave, samples=1000):
+    clock = VirtualClock()
+    sims = dict((channel, Simulation(FirstOrder.from_ck(0.004, 0.002), sampling=0.1,
+                                     heater_resistance=1e3, sigma=1e-3, seed=channel))
+                for channel in range(platforms))
+    pulse = np.where(np.arange(samples) % 200 < 100, 1e-3, 0.)
+    multiplexer = Multiplexer(
+        [Platform(channel, sim, SlowPowermeter(sim, clock, 0.02), channel, pulse)
+         for channel, sim in sims.items()],
+        SimulatedScanner(sims, settle=0.03, clock=clock), settle=0.03,
+        interleave=interleave)
+    multiplexer.clock = clock
+    multiplexer.start()
+    return multiplexer.statistics()
+
+
+@pytest.mark.parametrize('interleave', [True, False])
+@pytest.mark.parametrize('platforms', [1, 4, 16])
+def test_multiplexer(benchmark, platforms, interleave):
+    statistics = benchmark(run, platforms, interleave)
+    benchmark.extra_info['samples_per_second'] = statistics['samples_per_second']
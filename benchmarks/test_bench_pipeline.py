@@ -0,0 +1,42 @@
+"""Throughput and memory of the sweep pipeline on memory mapped traces.
+
+The peak memory should not grow with the length of the trace.
+
+"""
+import numpy as np
+import pytest
+
+from heatcapacity.fit import FirstOrder
+from heatcapacity.pipeline import iter_pulses, sweep
+from heatcapacity.simulation import Simulation
+from heatcapacity.storage import load_trace
+
+
+@pytest.fixture(scope='module', params=[10**6, 10**7])
+def archive(request, tmpdir_factory):
+    """A memory mapped trace with a pulse every 2000 samples."""
+    samples = request.param
+    sim = Simulation(FirstOrder.from_ck(0.004, 0.002), sampling=0.1,
+                     heater_resistance=1e3, sigma=1e-3, seed=0)
+    current = np.where(np.arange(samples) % 2000 < 1000, 1e-3, 0.)
+    current[:1000] = 0.
+    power, temperature = sim.simulate(current)
+    data = np.empty(samples, dtype=[('timestamp', '<f8'), ('power', '<f8'), ('temperature', '<f8')])
+    data['timestamp'] = 0.1 * np.arange(samples)
+    data['power'] = power
+    data['temperature'] = temperature + 4.2
+    path = str(tmpdir_factory.mktemp('archive').join('trace.npy'))
+    np.save(path, data)
+    return samples, path
+
+
+def test_sweep(benchmark, throughput, peak_memory, archive, tmpdir):
+    samples, path = archive
+    output = str(tmpdir.join('sweep.npy'))
+
+    def run():
+        timestamp, power, temperature = load_trace(path)
+        return sweep(iter_pulses(timestamp, temperature, power), output, resume=False)
+
+    benchmark.extra_info['pulses'] = peak_memory(run)
+    throughput(samples, run)
@@ -0,0 +1,60 @@
+"""Measurement time saved by the stop policies of AdaptiveStep and the
+accuracy lost in exchange.
+
+Every policy measures the same simulated platforms with a conservative
+`duration` of 30 s, as used with the default derivative threshold. The
+benchmark times the software cost of a run, `extra_info` reports the mean
+measurement duration and the rms relative error of the fitted heat capacity
+next to the ones of the default policy.
+
+"""
+import numpy as np
+import pytest
+
+from heatcapacity.fit import FirstOrder
+from heatcapacity.measure import AdaptiveStep, Convergence, DerivativeThreshold, Equilibrium
+from heatcapacity.simulation import Simulation, VirtualClock
+
+SEEDS = range(10)
+
+#: The policy factories, called with the true time constant.
+POLICIES = {
+    'derivative': lambda tau: DerivativeThreshold(),
+    'equilibrium': lambda tau: Equilibrium(multiple=5.),
+    'equilibrium-prior': lambda tau: Equilibrium(multiple=5., tau=tau),
+    'convergence': lambda tau: Convergence(tolerance=0.01),
+}
+
+
+def run(policy, heat_capacity, seed):
+    """Measures and fits one simulated pulse, returns the duration and the
+    relative error of the heat capacity."""
+    sim = Simulation(FirstOrder.from_ck(heat_capacity, 0.002), sampling=0.1,
+                     heater_resistance=1e3, sigma=1e-3, seed=seed)
+    measurement = AdaptiveStep(sim, sim, sim, duration=30., max_current=1e-3,
+                               sampling=0.1, threaded=False, policy=policy)
+    measurement.clock = VirtualClock()
+    timestamp, power, temperature = measurement.start()
+    model = FirstOrder.fit_integral(timestamp, temperature, power)
+    return len(timestamp) * 0.1, model.heat_capacity / heat_capacity - 1.
+
+
+def summary(name, heat_capacity):
+    results = np.array([run(POLICIES[name](heat_capacity / 0.002), heat_capacity, seed) for seed in SEEDS])
+    return results[:, 0].mean(), np.sqrt(np.mean(results[:, 1]**2))
+
+
+@pytest.mark.parametrize('heat_capacity', [0.004, 0.02])
+@pytest.mark.parametrize('name', sorted(POLICIES))
+def test_policy(benchmark, name, heat_capacity):
+    benchmark.pedantic(run, args=(POLICIES[name](heat_capacity / 0.002), heat_capacity, 0),
+                       rounds=3)
+    duration, error = summary(name, heat_capacity)
+    default_duration, default_error = summary('derivative', heat_capacity)
+    benchmark.extra_info.update({
+        'duration': duration,
+        'c_rms_error': error,
+        'default_duration': default_duration,
+        'default_c_rms_error': default_error,
+        'time_saved': 1. - duration / default_duration,
+    })
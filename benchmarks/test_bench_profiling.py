@@ -0,0 +1,24 @@
+"""Overhead of the profiling hooks on the measurement hot path."""
+import pytest
+
+from heatcapacity import profiling
+from heatcapacity.measure import Measurement
+
+
+class Instrument(object):
+    """A zero latency instrument."""
+    current = voltage = temperature = 1.
+
+
+@pytest.mark.parametrize('enabled', [False, True])
+def test_measure(benchmark, enabled):
+    instrument = Instrument()
+    measurement = Measurement(instrument, instrument, instrument)
+    profiling.reset()
+    if enabled:
+        profiling.enable()
+    try:
+        benchmark(measurement.measure)
+    finally:
+        profiling.disable()
+        profiling.reset()
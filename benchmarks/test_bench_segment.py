@@ -0,0 +1,32 @@
+"""Benchmarks of the segmentation and per-pulse fitting of long traces."""
+import numpy as np
+import pytest
+
+from heatcapacity.fit import FirstOrder
+from heatcapacity.segment import find_edges, fit_segments
+from heatcapacity.simulation import Simulation
+
+
+@pytest.fixture(scope='module')
+def trace():
+    """A 10^7 sample trace with 5000 pulses generated with :class:`Simulation`."""
+    sampling = 0.1
+    sim = Simulation(FirstOrder.from_ck(0.004, 0.002), sampling=sampling,
+                     heater_resistance=1e3, sigma=1e-3, seed=0)
+    current = np.where(np.arange(10**7) % 2000 < 1000, 1e-3, 0.)
+    current[:1000] = 0.
+    power, temperature = sim.simulate(current)
+    return sampling * np.arange(len(current)), temperature + 4.2, power
+
+
+def test_find_edges(benchmark, trace):
+    t, y, u = trace
+    rising, falling = benchmark(find_edges, u)
+    assert len(rising) == 4999
+
+
+@pytest.mark.parametrize('workers', [1, 2, 4])
+def test_fit_segments(benchmark, trace, workers):
+    t, y, u = trace
+    table = benchmark.pedantic(fit_segments, args=(t, y, u), kwargs=dict(workers=workers), rounds=1)
+    np.testing.assert_allclose(np.median(table['heat_capacity']), 0.004, rtol=1e-2)
@@ -0,0 +1,26 @@
+"""Benchmarks of the simulation throughput."""
+import numpy as np
+import pytest
+
+from heatcapacity.fit import FirstOrder
+from heatcapacity.simulation import Simulation
+
+
+def simulation():
+    return Simulation(FirstOrder.from_ck(0.004, 0.002), sampling=0.1,
+                      heater_resistance=1e3, sigma=1e-3, seed=0)
+
+
+def test_temperature(benchmark):
+    """The sample by sample simulation used as instrument."""
+    sim = simulation()
+    sim.current = 1e-3
+    benchmark(lambda: sim.temperature)
+
+
+@pytest.mark.parametrize('samples', [10**3, 10**5, 10**6, 10**7])
+def test_simulate(throughput, peak_memory, samples):
+    sim = simulation()
+    current = np.where(np.arange(samples) % 1000 < 500, 1e-3, 0.)
+    peak_memory(sim.simulate, current)
+    throughput(samples, sim.simulate, current)
@@ -0,0 +1,37 @@
+"""Throughput and worst case latency of the trace writer."""
+import time
+
+import numpy as np
+
+from heatcapacity.storage import TraceWriter, load_trace
+
+
+def test_append(benchmark, tmpdir):
+    path = str(tmpdir.join('trace.npy'))
+    samples = 10**5
+
+    def run():
+        latency = np.empty(samples)
+        with TraceWriter(path, flush_interval=0.1) as writer:
+            for i in range(samples):
+                start = time.perf_counter()
+                writer.append((i, 1e-3, 1e-6))
+                latency[i] = time.perf_counter() - start
+        return latency
+
+    latency = benchmark.pedantic(run, rounds=3)
+    # The sampling loop must keep up at >= 1 kHz, i.e. < 1 ms per sample.
+    if benchmark.stats is not None:
+        benchmark.extra_info['samples_per_second'] = samples / benchmark.stats.stats.mean
+    benchmark.extra_info['p99_latency'] = np.percentile(latency, 99)
+    benchmark.extra_info['max_latency'] = latency.max()
+    assert np.percentile(latency, 99) < 1e-3
+
+
+def test_load_trace(benchmark, tmpdir):
+    path = str(tmpdir.join('trace.npy'))
+    with TraceWriter(path, chunksize=2**16) as writer:
+        for chunk in range(16):
+            for i in range(2**16):
+                writer.append((i, 1e-3, 1e-6))
+    benchmark(load_trace, path)
@@ -35,8 +35,49 @@
 """
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
-from future.builtins import *
+import importlib
+import sys
 __version__ = '0.1.0'
 
-from heatcapacity.measure import *
-from heatcapacity.fit import *
+#: The public names of the submodules available at package level.
+_exports = {
+    'heatcapacity.measure': [
+        'Measurement', 'SystemClock', 'Scheduler', 'CurrentSource',
+        'Powermeter', 'Thermometer', 'Scanner', 'PulseMeasurement', 'AdaptiveStep',
+        'FIRFilter', 'savitzky_golay', 'sampling',
+    ],
+    'heatcapacity.fit': [
+        'FirstOrder', 'SecondOrder', 'RecursiveFirstOrder', 'ARXAccumulator',
+        'DERIVATIVES', 'is_uniform', 'spline_derivative', 'savgol_derivative',
+        'gradient_derivative',
+    ],
+    'heatcapacity.simulation': ['Simulation', 'SimulatedScanner', 'VirtualClock'],
+}
+_modules = dict((name, module) for module, names in _exports.items() for name in names)
+__all__ = sorted(_modules)
+
+if sys.version_info < (3, 7):
+    # Module level __getattr__ is not supported, import everything eagerly.
+    for _module, _names in _exports.items():
+        _module = importlib.import_module(_module)
+        for _name in _names:
+            globals()[_name] = getattr(_module, _name)
+else:
+    def __getattr__(name):
+        """Imports the submodule defining `name` on first access.
+
+        The submodules depend on scipy, which dominates the import time. They
+        are only loaded when needed, e.g. fitting does not import the
+        measurement code.
+
+        """
+        try:
+            module = _modules[name]
+        except KeyError:
+            raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+        value = getattr(importlib.import_module(module), name)
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(list(globals()) + list(_modules))
@@ -0,0 +1,376 @@
+#  -*- coding: utf-8 -*-
+"""Asyncio variants of the heat capacity measurements.
+
+A single event loop can drive several calorimeter platforms at once, e.g.::
+
+    import asyncio
+    from heatcapacity.asynchronous import AsyncPulseMeasurement
+
+    async def main():
+        first = AsyncPulseMeasurement(source1, meter1, thermometer1, pulse, 0.1)
+        second = AsyncPulseMeasurement(source2, meter2, thermometer2, pulse, 0.1)
+        return await asyncio.gather(first.start(), second.start())
+
+    (t1, p1, y1), (t2, p2, y2) = asyncio.run(main())
+
+Instruments implementing the blocking interfaces of :mod:`heatcapacity.measure`
+are wrapped in a :class:`BlockingInstrument` automatically.
+
+.. note:: This module requires Python 3.7 or newer.
+
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import asyncio
+import threading
+import warnings
+from concurrent import futures
+
+from heatcapacity import profiling
+from heatcapacity.buffer import SampleBuffer
+from heatcapacity.measure import (DECAY, HEATING, STEADY, DerivativeThreshold, Scheduler,
+                                  SystemClock)
+
+
+class AsyncCurrentSource(object):
+    """Abstract base class defining the asynchronous current source
+    interface."""
+    async def get_current(self):
+        raise NotImplementedError()
+
+    async def set_current(self, value):
+        raise NotImplementedError()
+
+
+class AsyncPowermeter(object):
+    """Abstract base class defining the asynchronous powermeter interface."""
+    async def get_voltage(self):
+        raise NotImplementedError()
+
+
+class AsyncThermometer(object):
+    """Abstract base class defining the asynchronous thermometer interface."""
+    async def get_temperature(self):
+        raise NotImplementedError()
+
+
+#: The executors shared by the adapters of one instrument, keyed by the id of
+#: the instrument, with their reference counts.
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _acquire_executor(instrument):
+    """Returns the single threaded executor of an instrument."""
+    with _executors_lock:
+        executor, count = _executors.get(id(instrument), (None, 0))
+        if executor is None:
+            executor = futures.ThreadPoolExecutor(1)
+        _executors[id(instrument)] = executor, count + 1
+        return executor
+
+
+def _release_executor(instrument):
+    """Shuts the executor of an instrument down once it is no longer used."""
+    with _executors_lock:
+        executor, count = _executors.pop(id(instrument))
+        if count > 1:
+            _executors[id(instrument)] = executor, count - 1
+            return
+    executor.shutdown()
+
+
+class BlockingInstrument(AsyncCurrentSource, AsyncPowermeter, AsyncThermometer):
+    """Adapts a blocking instrument to the asynchronous interfaces.
+
+    The blocking calls run in an executor. By default all adapters of an
+    instrument share a single worker thread, so accesses to one instrument
+    are serialized, e.g. if it is used as current source and powermeter,
+    while different instruments are accessed in parallel. The thread is shut
+    down when the last adapter is closed, see :meth:`close`.
+
+    :param instrument: An object implementing the blocking
+        :class:`~heatcapacity.measure.CurrentSource`,
+        :class:`~heatcapacity.measure.Powermeter` or
+        :class:`~heatcapacity.measure.Thermometer` interface.
+    :param executor: An optional :class:`concurrent.futures.Executor`. It is
+        owned by the caller and not shut down by :meth:`close`.
+
+    """
+    def __init__(self, instrument, executor=None):
+        self.instrument = instrument
+        self._shared = executor is None
+        if executor is None:
+            executor = _acquire_executor(instrument)
+        self.executor = executor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        """Releases the shared worker thread of the instrument."""
+        if self._shared:
+            self._shared = False
+            _release_executor(self.instrument)
+
+    async def _run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    async def get_current(self):
+        return await self._run(getattr, self.instrument, 'current')
+
+    async def set_current(self, value):
+        await self._run(setattr, self.instrument, 'current', value)
+
+    async def get_voltage(self):
+        return await self._run(getattr, self.instrument, 'voltage')
+
+    async def get_temperature(self):
+        return await self._run(getattr, self.instrument, 'temperature')
+
+
+def asynchronous(instrument, executor=None):
+    """Returns an asynchronous version of the instrument.
+
+    Instruments implementing one of the asynchronous interfaces are returned
+    unchanged, all others are wrapped in a :class:`BlockingInstrument`.
+
+    """
+    if isinstance(instrument, (AsyncCurrentSource, AsyncPowermeter, AsyncThermometer)):
+        return instrument
+    return BlockingInstrument(instrument, executor)
+
+
+class AsyncScheduler(Scheduler):
+    """A :class:`~heatcapacity.measure.Scheduler` used as asynchronous
+    context manager.
+
+    Waiting for the deadline suspends the coroutine instead of blocking the
+    event loop. Clocks other than the
+    :class:`~heatcapacity.measure.SystemClock`, e.g. a
+    :class:`~heatcapacity.simulation.VirtualClock`, are slept on directly and
+    the coroutine only yields to the event loop.
+
+    """
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, type, value, traceback):
+        if type is not None:
+            return
+        remaining = self._remaining()
+        if remaining is None:
+            await asyncio.sleep(0)
+            return
+        if remaining > self.spin:
+            if isinstance(self.clock, SystemClock):
+                await asyncio.sleep(remaining - self.spin)
+            else:
+                self.clock.sleep(remaining - self.spin)
+                await asyncio.sleep(0)
+        self._wake()
+
+
+class AsyncMeasurement(object):
+    """Abstract base class defining the asynchronous measurement interface.
+
+    :param currentsource: The current source.
+    :param powermeter: The powermeter.
+    :param thermometer: The thermometer.
+
+    The instruments either implement the asynchronous interfaces or the
+    blocking ones of :mod:`heatcapacity.measure`, see :func:`asynchronous`.
+    Samples are passed to the :attr:`writer` as in
+    :class:`~heatcapacity.measure.Measurement`, only the last :attr:`tail`
+    samples are then kept in memory. Call :meth:`close` or use the
+    measurement as context manager to release the worker threads of blocking
+    instruments.
+
+    """
+    def __init__(self, currentsource, powermeter, thermometer):
+        self.currentsource = asynchronous(currentsource)
+        self.powermeter = asynchronous(powermeter)
+        self.thermometer = asynchronous(thermometer)
+        # The adapters created here, closed by close().
+        self._adapters = [adapter for adapter, instrument in (
+            (self.currentsource, currentsource), (self.powermeter, powermeter),
+            (self.thermometer, thermometer)) if adapter is not instrument]
+        self.clock = SystemClock()
+        #: The :class:`AsyncScheduler` of the last run.
+        self.scheduler = None
+        self.writer = None
+        #: The number of samples kept in memory while a :attr:`writer` is set.
+        self.tail = 2**16
+
+    def _buffer(self, capacity=1024):
+        """Creates the sample buffer of a run, bounded to the :attr:`tail` if
+        a writer is set."""
+        return SampleBuffer(capacity, maxlen=None if self.writer is None else self.tail)
+
+    def _record(self, data, sample):
+        """Appends a sample to the data and the writer."""
+        data.append(sample)
+        if self.writer is not None:
+            self.writer.append(sample)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        """Releases the worker threads of the blocking instruments."""
+        for adapter in self._adapters:
+            adapter.close()
+
+    async def start(self, queue=None):
+        """Starts the heat capacity measurement.
+
+        :param queue: An optional :class:`asyncio.Queue` receiving every
+            `(timestamp, power, temperature)` sample as it is measured,
+            followed by `None` when the measurement is done.
+
+        """
+        raise NotImplementedError()
+
+    async def measure(self):
+        """Measures the time, heater power and platform temperature.
+
+        The three instruments are read concurrently.
+
+        """
+        timestamp = self.clock.time()
+        current, heater_voltage, temperature = await asyncio.gather(
+            self.currentsource.get_current(),
+            self.powermeter.get_voltage(),
+            self.thermometer.get_temperature(),
+        )
+        return timestamp, current * heater_voltage, temperature
+
+
+class AsyncPulseMeasurement(AsyncMeasurement):
+    """Asynchronous version of :class:`~heatcapacity.measure.PulseMeasurement`.
+
+    :param currentsource: The current source.
+    :param powermeter: The powermeter.
+    :param thermometer: The thermometer.
+    :param pulse: A sequence of current values.
+    :param sampling_time: The sampling time.
+
+    """
+    def __init__(self, currentsource, powermeter, thermometer, pulse, sampling_time):
+        super(AsyncPulseMeasurement, self).__init__(currentsource, powermeter, thermometer)
+        self.pulse = pulse
+        self.sampling_time = sampling_time
+
+    async def start(self, queue=None):
+        """Starts the heat capacity measurement.
+
+        :param queue: An optional :class:`asyncio.Queue` receiving the
+            samples, see :meth:`AsyncMeasurement.start`.
+
+        """
+        data = self._buffer(len(self.pulse))
+        self.scheduler = scheduler = AsyncScheduler(self.sampling_time, clock=self.clock)
+        try:
+            for current in self.pulse:
+                async with scheduler:
+                    await self.currentsource.set_current(current)
+                    sample = await self.measure()
+                    self._record(data, sample)
+                    if queue is not None:
+                        await queue.put(sample)
+        finally:
+            # Release the consumer, also after an error or cancellation.
+            if queue is not None:
+                await queue.put(None)
+
+        if self.writer is not None:
+            self.writer.flush()
+        timestamp, power, temperature = data.columns()
+        return timestamp, power, temperature
+
+
+class AsyncAdaptiveStep(AsyncMeasurement):
+    """Asynchronous version of :class:`~heatcapacity.measure.AdaptiveStep`.
+
+    The stop `policy` is a :class:`~heatcapacity.measure.StopPolicy`,
+    defaulting to a :class:`~heatcapacity.measure.DerivativeThreshold` with
+    the filter `window`. The `window` is ignored if a policy is given.
+
+    """
+    def __init__(self, currentsource, powermeter, thermometer, duration, max_current, min_current=0., window=None, sampling=0.1, policy=None, max_duration=None):
+        super(AsyncAdaptiveStep, self).__init__(currentsource, powermeter, thermometer)
+        self.duration = duration
+        self.max_current = max_current
+        self.min_current = min_current
+        self.sampling = sampling
+        self.policy = DerivativeThreshold(window=window) if policy is None else policy
+        self.max_duration = 10. * duration if max_duration is None else max_duration
+        #: The phases of the last run ended by the `max_duration`.
+        self.timeouts = []
+
+    async def start(self, queue=None, verbose=False):
+        """Starts the heat capacity measurement.
+
+        :param queue: An optional :class:`asyncio.Queue` receiving the
+            samples, see :meth:`AsyncMeasurement.start`.
+
+        """
+        data = self._buffer()
+        policy = self.policy
+        policy.reset(self)
+
+        self.scheduler = scheduler = AsyncScheduler(self.sampling, clock=self.clock)
+
+        async def sample(phase):
+            async with scheduler:
+                timestamp, power, temperature = await self.measure()
+                self._record(data, (timestamp, power, temperature))
+                if queue is not None:
+                    await queue.put((timestamp, power, temperature))
+                profile = profiling.monotonic() if profiling.enabled else None
+                stop = policy.update(phase, timestamp, power, temperature)
+                if profile is not None:
+                    profiling.record('adaptive_step.filter', profiling.monotonic() - profile)
+            return stop
+
+        try:
+            # measure steady state
+            start = scheduler.elapsed
+            await self.currentsource.set_current(self.min_current)
+            while scheduler.elapsed - start < self.duration:
+                await sample(STEADY)
+
+            #measure response to heat pulse and decay
+            self.timeouts = []
+            for phase, current in ((HEATING, self.max_current), (DECAY, self.min_current)):
+                start = scheduler.elapsed
+                await self.currentsource.set_current(current)
+                while not await sample(phase):
+                    # Half a period absorbs rounding errors of the sampling grid.
+                    if scheduler.elapsed - start > self.max_duration - 0.5 * self.sampling:
+                        self.timeouts.append(phase)
+                        warnings.warn('The {} phase reached the maximal duration of {}s.'.format(
+                            phase, self.max_duration), RuntimeWarning)
+                        break
+        finally:
+            # Switch the heater off and release the consumer, also after an
+            # error or cancellation.
+            try:
+                await self.currentsource.set_current(self.min_current)
+            finally:
+                if queue is not None:
+                    await queue.put(None)
+
+        if self.writer is not None:
+            self.writer.flush()
+        timestamp, power, temperature = data.columns()
+        if verbose:
+            return timestamp, power, temperature, getattr(policy, 'derivative', [])
+        return timestamp, power, temperature
@@ -0,0 +1,113 @@
+#  -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import sys
+if sys.version_info[0] < 3:
+    from future.builtins import *
+
+import numpy as np
+
+
+class SampleBuffer(object):
+    """A growable buffer of measurement samples.
+
+    The samples are stored column wise in a preallocated float64 array, which
+    takes 8 bytes per value instead of a python float and tuple per sample.
+    If the buffer is full, its capacity is doubled, so appending takes
+    amortized constant time, e.g.::
+
+        buffer = SampleBuffer()
+        buffer.append((timestamp, power, temperature))
+        timestamp, power, temperature = buffer.columns()
+
+    If `maxlen` is given, only the most recent `maxlen` samples are kept,
+    e.g. while the full trace is streamed to a
+    :class:`~heatcapacity.storage.TraceWriter`. The memory is then bounded by
+    twice `maxlen` samples.
+
+    :param capacity: The initial capacity in samples.
+    :param columns: The number of values per sample.
+    :param maxlen: The optional maximal number of samples kept.
+
+    """
+    def __init__(self, capacity=1024, columns=3, maxlen=None):
+        if maxlen is not None:
+            capacity = min(capacity, 2 * maxlen)
+        self.maxlen = maxlen
+        self._data = np.empty((columns, max(int(capacity), 1)))
+        self._size = 0
+
+    def __len__(self):
+        if self.maxlen is not None:
+            return min(self._size, self.maxlen)
+        return self._size
+
+    @property
+    def capacity(self):
+        return self._data.shape[1]
+
+    def append(self, sample):
+        """Appends a single sample.
+
+        :param sample: A sequence with one value per column.
+
+        """
+        if self._size == self.capacity:
+            if self.maxlen is not None and self._size >= 2 * self.maxlen:
+                self._discard()
+            else:
+                self._reserve(self._grown(self._size + 1))
+        self._data[:, self._size] = sample
+        self._size += 1
+
+    def extend(self, samples):
+        """Appends several samples.
+
+        :param samples: A 2-D array like with one sample per row.
+
+        """
+        samples = np.asarray(samples, dtype=float)
+        if self.maxlen is not None:
+            samples = samples[-self.maxlen:]
+            if self._size + len(samples) > 2 * self.maxlen:
+                self._discard()
+        size = self._size + len(samples)
+        if size > self.capacity:
+            self._reserve(self._grown(size))
+        self._data[:, self._size:size] = samples.T
+        self._size = size
+
+    def columns(self):
+        """Returns the columns as tuple of array views.
+
+        The views share memory with the buffer, no data is copied. They are
+        only valid until the next :meth:`append`, :meth:`extend` or
+        :meth:`clear`, which may overwrite the memory behind them, e.g. when a
+        buffer with `maxlen` discards old samples. Copy them to keep the
+        data.
+
+        """
+        start = 0 if self.maxlen is None else max(self._size - self.maxlen, 0)
+        return tuple(self._data[:, start:self._size])
+
+    def clear(self):
+        """Removes all samples, keeping the capacity."""
+        self._size = 0
+
+    def _reserve(self, capacity):
+        data = np.empty((self._data.shape[0], capacity))
+        data[:, :self._size] = self._data[:, :self._size]
+        self._data = data
+
+    def _grown(self, size):
+        """Returns the doubled capacity holding `size` samples."""
+        capacity = max(size, 2 * self.capacity)
+        if self.maxlen is not None:
+            capacity = min(capacity, 2 * self.maxlen)
+        return capacity
+
+    def _discard(self):
+        """Moves the most recent `maxlen` samples to the front."""
+        start = max(self._size - self.maxlen, 0)
+        self._data[:, :self._size - start] = self._data[:, start:self._size].copy()
+        self._size -= start
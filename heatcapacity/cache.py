@@ -0,0 +1,257 @@
+#  -*- coding: utf-8 -*-
+"""Memoization of fit results keyed on the content of the traces.
+
+Reprocessing archived pulses with unchanged data costs a hash instead of a
+refit, e.g.::
+
+    from heatcapacity.cache import FitCache
+
+    cache = FitCache(directory='fit-cache')
+    fit = cache(FirstOrder.fit)
+    model = fit(timestamp, temperature, power, derivative='savgol')
+    print(cache.statistics())
+
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import sys
+if sys.version_info[0] < 3:
+    from future.builtins import *
+import collections
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+import numpy as np
+
+from heatcapacity import __version__
+
+#: The version of the cached results. It is part of every key and must be
+#: incremented whenever a change of a fit algorithm changes its results, so
+#: stale results on disk are never returned.
+VERSION = 1
+
+_SUFFIX = '.pkl'
+
+
+def _hasher():
+    # blake2b is considerably faster than sha1 but requires python 3.6.
+    if hasattr(hashlib, 'blake2b'):
+        return hashlib.blake2b(digest_size=20)
+    return hashlib.sha1()
+
+
+def fingerprint(function, args, kwargs):
+    """Computes the cache key of a fit call.
+
+    Array arguments are hashed by their dtype, shape and raw data, all other
+    arguments by their `repr`. The key includes the qualified name of the
+    function, so different fit methods never share results, as well as the
+    package version and the cache :data:`VERSION`.
+
+    :param function: The fit function.
+    :param args: The positional arguments.
+    :param kwargs: The keyword arguments.
+    :returns: A hex string.
+
+    """
+    digest = _hasher()
+    digest.update(repr((__version__, VERSION)).encode('utf-8'))
+    owner = getattr(function, '__self__', None)
+    name = (getattr(function, '__module__', None), getattr(owner, '__name__', None),
+            getattr(function, '__qualname__', getattr(function, '__name__', repr(function))))
+    digest.update(repr(name).encode('utf-8'))
+    _update(digest, args)
+    for name in sorted(kwargs):
+        digest.update(repr(name).encode('utf-8'))
+        _update(digest, kwargs[name])
+    return digest.hexdigest()
+
+
+def _update(digest, value):
+    if isinstance(value, (list, tuple)):
+        array = np.asarray(value) if value and not isinstance(value[0], (list, tuple, np.ndarray)) else None
+        if array is None or array.dtype.kind not in 'biuf':
+            # Nested or ragged sequences, e.g. the traces of fit_batch.
+            digest.update(('(%d' % len(value)).encode('utf-8'))
+            for item in value:
+                _update(digest, item)
+            digest.update(b')')
+            return
+        value = array
+    if isinstance(value, np.ndarray) and value.dtype.kind in 'biufc':
+        array = np.ascontiguousarray(value)
+        digest.update(repr((array.dtype.str, array.shape)).encode('utf-8'))
+        digest.update(array.reshape(-1).view(np.uint8))
+    else:
+        digest.update(repr(value).encode('utf-8'))
+
+
+class FitCache(object):
+    """A two tier cache of fit results.
+
+    Results are kept in an in-memory least recently used cache. If a
+    `directory` is given, they are also pickled to disk, where the least
+    recently used files are evicted once the total size exceeds `max_bytes`.
+    The disk tier is shared between processes and survives restarts.
+
+    Cached results are returned as they are, they should not be modified.
+
+    :param maxsize: The maximal number of results kept in memory.
+    :param directory: An optional directory of the disk tier. It is created
+        if it does not exist.
+    :param max_bytes: The maximal total size of the disk tier in bytes.
+
+    """
+    def __init__(self, maxsize=1024, directory=None, max_bytes=256 * 2**20):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.max_bytes = max_bytes
+        #: The number of results found in memory.
+        self.hits = 0
+        #: The number of results found on disk.
+        self.disk_hits = 0
+        #: The number of results that had to be computed.
+        self.misses = 0
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        if directory is not None:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            self._disk_bytes = sum(os.path.getsize(path) for path in self._files())
+
+    def __call__(self, function):
+        """Wraps a fit function, e.g. :meth:`FirstOrder.fit
+        <heatcapacity.fit.FirstOrder.fit>`, with this cache."""
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return self.fit(function, *args, **kwargs)
+        wrapper.cache = self
+        return wrapper
+
+    def __len__(self):
+        return len(self._memory)
+
+    def fit(self, function, *args, **kwargs):
+        """Returns the cached result of `function(*args, **kwargs)`.
+
+        On a miss, the function is called and its result stored.
+
+        """
+        key = fingerprint(function, args, kwargs)
+        with self._lock:
+            if key in self._memory:
+                self.hits += 1
+                self._memory[key] = result = self._memory.pop(key)
+                return result
+        result = self._load(key)
+        if result is not None:
+            with self._lock:
+                self.disk_hits += 1
+                self._remember(key, result)
+            return result
+
+        result = function(*args, **kwargs)
+        with self._lock:
+            self.misses += 1
+            self._remember(key, result)
+        self._store(key, result)
+        return result
+
+    def clear(self):
+        """Removes all results from both tiers and resets the counters."""
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+            for path in self._files():
+                os.remove(path)
+            self._disk_bytes = 0
+
+    def statistics(self):
+        """Returns the cache statistics as dictionary."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.,
+            'size': len(self._memory),
+            'disk_bytes': self._disk_bytes,
+        }
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _files(self):
+        if self.directory is None:
+            return []
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                if name.endswith(_SUFFIX)]
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+        try:
+            # The modification time tracks the last use for the eviction.
+            os.utime(path, None)
+        except OSError:
+            pass
+        return result
+
+    def _store(self, key, result):
+        if self.directory is None:
+            return
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        # Write to a temporary file first, so readers never see partial files.
+        handle, temporary = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(handle, 'wb') as f:
+            f.write(data)
+        path = self._path(key)
+        with self._lock:
+            # A concurrent store of the same key replaces the file.
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            getattr(os, 'replace', os.rename)(temporary, path)
+            self._disk_bytes += len(data) - replaced
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Removes the least recently used files until the tier fits."""
+        files = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        self._disk_bytes = sum(size for _, size, _ in files)
+        # Evict down to 90% to amortize the directory scan.
+        for _, size, path in files:
+            if self._disk_bytes <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._disk_bytes -= size
@@ -0,0 +1,226 @@
+#  -*- coding: utf-8 -*-
+"""Design of the shortest excitation reaching a target precision.
+
+Given a prior model of the sample, e.g. from a previous pulse, the noise of
+the thermometer and the target relative uncertainty of the heat capacity,
+the excitations of several families are compared by their Fisher
+information and the shortest one is returned, e.g.::
+
+    import heatcapacity as hc
+    from heatcapacity.design import design
+
+    prior = hc.FirstOrder.from_ck(0.004, 0.002)
+    best = design(prior, sampling=0.1, sigma=1e-3, target=0.01,
+                  max_current=1e-3, heater_resistance=1e3)
+    print(best.family, best.duration, best.relative_uncertainty)
+    measurement = hc.PulseMeasurement(source, powermeter, thermometer,
+                                      best.pulse, sampling_time=0.1)
+
+The uncertainties are the Cramér-Rao bounds of a fit of the heat capacity,
+the thermal conductivity and the initial temperature, e.g.
+:meth:`~heatcapacity.fit.FirstOrder.fit_integral`. They are only as good as
+the prior, a prior time constant off by a factor of two still gives a
+reasonable design.
+
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import sys
+if sys.version_info[0] < 3:
+    from future.builtins import *
+
+import numpy as np
+from scipy import signal
+
+#: The excitation families, see :func:`excitation`.
+FAMILIES = ('step', 'multistep', 'prbs', 'chirp')
+
+#: The periods tried per family, in units of the prior time constant.
+PERIODS = {
+    'step': (0.5, 1., 2., 3., 5., 8.),
+    'multistep': (0.25, 0.5, 1., 2., 4., 8.),
+    'prbs': (0.25, 0.5, 1., 2.),
+    'chirp': (0.5, 1., 2.),
+}
+
+
+class Design(object):
+    """An excitation designed by :func:`design`.
+
+    :param family: The excitation family, one of :data:`FAMILIES`.
+    :param period: The period of the excitation in seconds, see
+        :func:`excitation`.
+    :param pulse: The heater currents, one per sampling step.
+    :param sampling: The sampling time.
+    :param relative_uncertainty: The predicted relative standard uncertainties
+        `(heat_capacity, thermal_conductivity)`.
+
+    """
+    def __init__(self, family, period, pulse, sampling, relative_uncertainty):
+        self.family = family
+        self.period = period
+        self.pulse = pulse
+        self.sampling = sampling
+        self.relative_uncertainty = relative_uncertainty
+
+    @property
+    def duration(self):
+        """The duration of the excitation in seconds."""
+        return len(self.pulse) * self.sampling
+
+    def __repr__(self):
+        return '<Design {} period={:g}s duration={:g}s dC/C={:.3g}>'.format(
+            self.family, self.period, self.duration, self.relative_uncertainty[0])
+
+
+def excitation(family, samples, period):
+    """Generates a normalized heater power sequence.
+
+    * `'step'`: heats for one `period`, then relaxes.
+    * `'multistep'`: a square wave, alternately heating and relaxing for one
+      `period`.
+    * `'prbs'`: a 511 bit maximum length pseudo random binary sequence, each
+      bit lasting one `period`, repeated.
+    * `'chirp'`: a sinusoidal power sweeping from zero frequency to the
+      frequency `1 / (2 * period)` within 32 periods, repeated.
+
+    Every family starts heating at the first sample. A shorter sequence is
+    always a prefix of a longer one.
+
+    :param family: The excitation family, one of :data:`FAMILIES`.
+    :param samples: The number of samples.
+    :param period: The period in samples.
+    :returns: An array of powers between `0` and `1`.
+
+    """
+    period = max(int(round(period)), 1)
+    k = np.arange(samples)
+    if family == 'step':
+        return (k < period).astype(float)
+    if family == 'multistep':
+        return ((k // period) % 2 == 0).astype(float)
+    if family == 'prbs':
+        bits = -(-samples // period)
+        sequence = signal.max_len_seq(9)[0]
+        # The sequence is rolled to start heating.
+        sequence = np.roll(sequence, -np.argmax(sequence))
+        return np.resize(sequence, bits).repeat(period)[:samples].astype(float)
+    if family == 'chirp':
+        sweep = 32 * period
+        x = signal.chirp(k % sweep, f0=0., t1=sweep, f1=0.5 / period)
+        return 0.5 * (1. + x)
+    raise ValueError('Unknown excitation family {!r}.'.format(family))
+
+
+def _sensitivities(model, power, sampling):
+    """Computes the derivatives of the exact zero order hold response with
+    respect to `log C`, `log K` and the initial temperature."""
+    c, k = model.heat_capacity, model.thermal_conductivity
+    a = np.exp(-k * sampling / c)
+    b = (1. - a) / k
+    # Derivatives of the discrete pole `a` and gain `b` with respect to the
+    # logarithmic parameters.
+    da_c = a * k * sampling / c
+    da_k = -a * k * sampling / c
+    db_c = -da_c / k
+    db_k = -da_k / k - b
+    y = signal.lfilter([0., b], [1., -a], power)
+    jacobian = np.empty((len(power), 3))
+    jacobian[:, 0] = signal.lfilter([0., 1.], [1., -a], da_c * y + db_c * power)
+    jacobian[:, 1] = signal.lfilter([0., 1.], [1., -a], da_k * y + db_k * power)
+    jacobian[:, 2] = a ** np.arange(len(power))
+    return jacobian
+
+
+def fisher_information(model, power, sampling, sigma):
+    """Computes the Fisher information matrix of an excitation.
+
+    :param model: The prior :class:`~heatcapacity.fit.FirstOrder` model.
+    :param power: The heater power sequence, one value per sampling step.
+    :param sampling: The sampling time.
+    :param sigma: The standard deviation of the temperature noise.
+    :returns: A 3x3 matrix for the parameters `log C`, `log K` and the
+        initial temperature.
+
+    """
+    jacobian = _sensitivities(model, np.asarray(power, dtype=float), sampling)
+    return np.dot(jacobian.T, jacobian) / sigma**2
+
+
+def relative_uncertainty(model, power, sampling, sigma):
+    """Predicts the relative uncertainties of a fit.
+
+    :param model: The prior :class:`~heatcapacity.fit.FirstOrder` model.
+    :param power: The heater power sequence, one value per sampling step.
+    :param sampling: The sampling time.
+    :param sigma: The standard deviation of the temperature noise.
+    :returns: The relative standard uncertainties
+        `(heat_capacity, thermal_conductivity)`.
+
+    """
+    return tuple(_prefix_uncertainty(model, power, sampling, sigma)[:, -1].tolist())
+
+
+def _prefix_uncertainty(model, power, sampling, sigma):
+    """Computes the relative uncertainties of every prefix of the excitation
+    in a single pass, returns a `(2, n)` array."""
+    jacobian = _sensitivities(model, np.asarray(power, dtype=float), sampling)
+    i, j = np.triu_indices(3)
+    f = np.cumsum(jacobian[:, i] * jacobian[:, j], axis=0).T / sigma**2
+    f00, f01, f02, f11, f12, f22 = f
+    # The diagonal of the inverse by cofactors, vectorized over all prefixes.
+    c00 = f11 * f22 - f12**2
+    c11 = f00 * f22 - f02**2
+    det = f00 * c00 - f01 * (f01 * f22 - f12 * f02) + f02 * (f01 * f12 - f11 * f02)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = np.array([c00, c11]) / det
+    variance[:, ~(det > 0.)] = np.inf
+    return np.sqrt(np.maximum(variance, 0.))
+
+
+def design(model, sampling, sigma, target, max_current, heater_resistance,
+           families=FAMILIES, max_duration=None):
+    """Finds the shortest excitation reaching the target precision.
+
+    Every family in `families` is tried with the :data:`PERIODS` scaled by the
+    time constant of the prior. The heater is driven between zero and
+    `max_current`.
+
+    :param model: The prior :class:`~heatcapacity.fit.FirstOrder` model, e.g.
+        from :meth:`FirstOrder.from_ck <heatcapacity.fit.FirstOrder.from_ck>`.
+    :param sampling: The sampling time.
+    :param sigma: The standard deviation of the temperature noise.
+    :param target: The target relative standard uncertainty of the heat
+        capacity.
+    :param max_current: The maximal heater current.
+    :param heater_resistance: The heater resistance.
+    :param families: The excitation families to try.
+    :param max_duration: The longest excitation considered in seconds,
+        defaults to 100 time constants.
+    :returns: The shortest :class:`Design`.
+    :raises ValueError: If no excitation reaches the target within
+        `max_duration`.
+
+    """
+    tau = model.heat_capacity / model.thermal_conductivity
+    if max_duration is None:
+        max_duration = 100. * tau
+    samples = int(max_duration / sampling)
+    max_power = heater_resistance * max_current**2
+    best = None
+    for family in families:
+        for scale in PERIODS[family]:
+            period = max(int(round(scale * tau / sampling)), 1)
+            power = max_power * excitation(family, samples, period)
+            uncertainty = _prefix_uncertainty(model, power, sampling, sigma)
+            reached = np.flatnonzero(uncertainty[0] <= target)
+            if not len(reached):
+                continue
+            length = reached[0] + 1
+            if best is None or length < len(best.pulse):
+                pulse = np.sqrt(power[:length] / heater_resistance)
+                best = Design(family, period * sampling, pulse, sampling,
+                              tuple(uncertainty[:, length - 1].tolist()))
+    if best is None:
+        raise ValueError('No excitation reaches the target within {}s.'.format(max_duration))
+    return best
@@ -1,11 +1,15 @@
 #  -*- coding: utf-8 -*-
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
-from future.builtins import *
+import sys
+if sys.version_info[0] < 3:
+    from future.builtins import *
 
 import numpy as np
 from scipy import interpolate, linalg, signal
 
+from heatcapacity import profiling
+
 
 class FirstOrder(signal.TransferFunction):
     """First order heat capacity differential equation model.
@@ -55,24 +59,866 @@ class FirstOrder(signal.TransferFunction):
         return self.den[1] * self.heat_capacity
 
     @classmethod
-    def fit(cls, t, y, u):
+    def fit(cls, t, y, u, derivative='spline', **kwargs):
         """Fits a first order heat capacity model.
 
+        If the timestamps are not uniformly spaced, the data is resampled on a
+        uniform grid first.
+
         :param t: A sequence of timestamps.
         :param y: A sequence of temperatures.
         :param u: A sequence of heater power values.
+        :param derivative: The derivative estimator. Either the name of one of
+            the estimators in :data:`DERIVATIVES` or a callable with the
+            signature of :func:`spline_derivative`.
+        :param kwargs: Additional keyword arguments passed to the derivative
+            estimator.
 
         """
-        yspline = interpolate.UnivariateSpline(t, y, s=0)
-        uspline = interpolate.UnivariateSpline(t, u, s=0)
+        if not callable(derivative):
+            derivative = DERIVATIVES[derivative]
+        t, y, u = (np.asarray(x, dtype=float) for x in (t, y, u))
 
-        ti = np.linspace(np.min(t), np.max(t), len(t))
-        yi = yspline(ti)
-        dyi = yspline.derivative(n=1)(ti)
-        ui = uspline(ti)
-        result = linalg.lstsq(np.hstack((yi[:,None], ui[:, None])) , dyi)[0]
+        with profiling.timer('fit.resample'):
+            ti = t if is_uniform(t) else np.linspace(np.min(t), np.max(t), len(t))
+        with profiling.timer('fit.derivative'):
+            yi, dyi = derivative(t, y, ti, **kwargs)
+            # The power is passed through the same estimator, so both sides of
+            # the differential equation see the same smoothing.
+            ui, _ = derivative(t, u, ti, **kwargs)
+        with profiling.timer('fit.lstsq'):
+            result = linalg.lstsq(np.hstack((yi[:,None], ui[:, None])) , dyi)[0]
 
         b = np.r_[result[1]]
         a = np.r_[1., - result[0]]
 
         return cls(b, a)
+
+    @classmethod
+    def fit_integral(cls, t, y, u, weights=None, offset=False):
+        """Fits a first order heat capacity model in integral form.
+
+        Integrating the differential equation yields
+
+            y(t) - y(0) = -K / C * integral(y) + 1 / C * integral(u)
+
+        which is linear in the cumulative integrals of the temperature and
+        the heater power. No derivative has to be estimated, the integration
+        averages out the measurement noise instead of amplifying it. The
+        initial temperature `y(0)` is fitted as well.
+
+        The temperature is integrated with the trapezoidal rule. The heater
+        power is integrated assuming it is held constant until the next
+        sample, as it is the case when the current is set at the start of
+        each sampling period.
+
+        :param t: A sequence of timestamps.
+        :param y: A sequence of temperatures.
+        :param u: A sequence of heater power values.
+        :param weights: An optional sequence of non-negative weights, one per
+            sample, e.g. the inverse variance of the temperature readings.
+        :param offset: If `True`, the temperature is not assumed to relax to
+            zero but to an unknown constant bath temperature. This adds a term
+            `K / C * T_bath * t` to the integral form.
+
+        """
+        t, y, u = (np.asarray(x, dtype=float) for x in (t, y, u))
+        columns = [np.ones_like(y), _cumtrapz(y, t), _cumhold(u, t)]
+        if offset:
+            columns.append(t - t[0])
+        design = np.column_stack(columns)
+        target = y
+        if weights is not None:
+            w = np.sqrt(np.asarray(weights, dtype=float))
+            design, target = design * w[:, None], target * w
+
+        # Normalize the columns, the integrals differ by orders of magnitude.
+        scale = np.sqrt(np.sum(design**2, axis=0))
+        scale[scale == 0] = 1.
+        result = linalg.lstsq(design / scale, target)[0] / scale
+
+        b = np.r_[result[2]]
+        a = np.r_[1., - result[1]]
+
+        return cls(b, a)
+
+    @classmethod
+    def fit_arx(cls, t, y, u, chunksize=65536, offset=False, sampling=None, rtol=0.5):
+        """Fits a first order heat capacity model in discrete time.
+
+        For uniformly sampled data and a heater power held constant between
+        samples, the differential equation is solved exactly by the
+        autoregressive model
+
+            y[k + 1] = a * y[k] + b * u[k]
+
+        with `a = exp(-K / C * dt)` and `b = (1 - a) / K`. The coefficients are
+        fitted by linear least squares directly on the raw samples, no
+        derivative or interpolation is needed. The data is processed in chunks
+        with an :class:`ARXAccumulator`, so memory mapped traces of arbitrary
+        length, e.g. loaded with :func:`~heatcapacity.storage.load_trace`,
+        are fitted in constant memory.
+
+        Measured timestamps carry the jitter of the sampling loop. Only
+        intervals deviating from the sampling time by more than `rtol`, e.g.
+        missed samples, are rejected. The remaining jitter is treated like
+        noise of the heater power timing.
+
+        :param t: A sequence of uniformly spaced timestamps.
+        :param y: A sequence of temperatures.
+        :param u: A sequence of heater power values.
+        :param chunksize: The number of samples processed at once.
+        :param offset: If `True`, the temperature is not assumed to relax to
+            zero but to an unknown constant bath temperature `T_bath`, as in
+            :meth:`fit_integral`. This adds a constant `(1 - a) * T_bath` to
+            the model.
+        :param sampling: The nominal sampling time, e.g. the `sampling_time`
+            of a :class:`~heatcapacity.measure.PulseMeasurement`. Defaults to
+            the mean interval of the timestamps.
+        :param rtol: The tolerated deviation of every sampling interval from
+            the sampling time, relative to the sampling time.
+        :raises ValueError: If the timestamps are not uniformly spaced.
+
+        """
+        if len(t) < 2:
+            raise ValueError('At least two samples are required.')
+        if sampling is None:
+            sampling = (t[-1] - t[0]) / (len(t) - 1)
+        accumulator = ARXAccumulator(offset)
+        for start in range(0, len(t), chunksize):
+            stop = start + chunksize
+            # Overlap by one sample to check the spacing across chunks.
+            dt = np.diff(np.asarray(t[start:stop + 1], dtype=float))
+            if np.any(np.abs(dt - sampling) > rtol * abs(sampling)):
+                raise ValueError('The timestamps are not uniformly spaced.')
+            accumulator.update(y[start:stop], u[start:stop])
+        return accumulator.model(sampling)
+
+    def predict(self, t, u, y0=0.):
+        """Predicts the temperature response to a heater power trace.
+
+        The heater power is held constant between samples. The response is
+        computed in closed form, it is exact for arbitrary sampling.
+
+        :param t: A sequence of timestamps.
+        :param u: A sequence of heater power values.
+        :param y0: The initial temperature.
+        :returns: An array of temperatures.
+
+        """
+        t, u = (np.asarray(x, dtype=float) for x in (t, u))
+        rate = self.thermal_conductivity / self.heat_capacity
+        return _response(rate, 1. / self.heat_capacity, t, u, y0)
+
+    @classmethod
+    def fit_batch(cls, t, y, u):
+        """Fits first order heat capacity models to many traces at once.
+
+        Instead of building splines for every single trace, the temperature
+        derivative is estimated with second order finite differences and the
+        2x2 normal equations of all traces are solved in one vectorized pass.
+
+        :param t: The timestamps. Either a sequence of 1-D sequences, one per
+            trace, or a 2-D array with one trace per row. If `y` is a 2-D
+            array, `t` may also be a single 1-D sequence shared by all traces.
+        :param y: The temperatures, in the same layout as `t`.
+        :param u: The heater power values, in the same layout as `y`.
+        :returns: A tuple of arrays `(heat_capacity, thermal_conductivity)`
+            with one entry per trace.
+
+        """
+        t, y, u, starts = _concatenate(t, y, u)
+        dy = _gradient(t, y, starts)
+
+        # Accumulate the normal equations of dy = r0 * y + r1 * u per trace.
+        syy = np.add.reduceat(y * y, starts)
+        syu = np.add.reduceat(y * u, starts)
+        suu = np.add.reduceat(u * u, starts)
+        syd = np.add.reduceat(y * dy, starts)
+        sud = np.add.reduceat(u * dy, starts)
+
+        det = syy * suu - syu * syu
+        r0 = (suu * syd - syu * sud) / det
+        r1 = (syy * sud - syu * syd) / det
+
+        heat_capacity = 1. / r1
+        thermal_conductivity = -r0 * heat_capacity
+        return heat_capacity, thermal_conductivity
+
+    @classmethod
+    def predict_batch(cls, heat_capacity, thermal_conductivity, t, u, y0=0.):
+        """Predicts the response of many first order models at once.
+
+        Like :meth:`predict`, the response is exact for a heater power held
+        constant between samples. All traces are solved in a single
+        vectorized pass instead of one model at a time.
+
+        :param heat_capacity: The heat capacity of each model, e.g. as
+            returned by :meth:`fit_batch`.
+        :param thermal_conductivity: The thermal conductivity of each model.
+        :param t: The timestamps, in the layouts accepted by :meth:`fit_batch`.
+        :param u: The heater power values, in the same layout as `t`.
+        :param y0: The initial temperature, a scalar or one value per trace.
+        :returns: The predicted temperatures, a 2-D array if `u` is a 2-D
+            array, a list of arrays otherwise.
+
+        """
+        t, _, stacked, lengths = _stack(t, u, u)
+        y = _batch_response(heat_capacity, thermal_conductivity, t, stacked, y0)
+        return _unstack(y, lengths, u)
+
+    @classmethod
+    def residuals_batch(cls, heat_capacity, thermal_conductivity, t, y, u, y0=None):
+        """Compares the response of many first order models to the measured
+        temperatures.
+
+        :param heat_capacity: The heat capacity of each model, e.g. as
+            returned by :meth:`fit_batch`.
+        :param thermal_conductivity: The thermal conductivity of each model.
+        :param t: The timestamps, in the layouts accepted by :meth:`fit_batch`.
+        :param y: The measured temperatures, in the same layout as `t`.
+        :param u: The heater power values, in the same layout as `t`.
+        :param y0: The initial temperature, a scalar or one value per trace.
+            Defaults to the first measured temperature of each trace.
+        :returns: A tuple `(residuals, rms, r_squared)`. The residuals are the
+            measured minus the predicted temperatures in the layout of `y`,
+            `rms` their root mean square and `r_squared` the coefficient of
+            determination of each trace.
+
+        """
+        t, stacked, u, lengths = _stack(t, y, u)
+        if y0 is None:
+            y0 = stacked[:, 0]
+        residuals = stacked - _batch_response(heat_capacity, thermal_conductivity, t, u, y0)
+
+        mask = np.arange(stacked.shape[1]) < lengths[:, None]
+        residuals[~mask] = 0.
+        sse = np.sum(residuals**2, axis=1)
+        mean = np.sum(np.where(mask, stacked, 0.), axis=1) / lengths
+        sst = np.sum(np.where(mask, stacked - mean[:, None], 0.)**2, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r_squared = 1. - sse / sst
+        return _unstack(residuals, lengths, y), np.sqrt(sse / lengths), r_squared
+
+
+class SecondOrder(signal.TransferFunction):
+    """Two-tau heat capacity model of a sample with poor thermal contact.
+
+    The heater and thermometer sit on the addenda, e.g. the sample platform,
+    which is coupled to the bath and, by an internal thermal link, to the
+    sample
+
+        C1 * dy1/dt = u - K1 * y1 - K2 * (y1 - y2)
+        C2 * dy2/dt = K2 * (y1 - y2)
+
+    with C1 and C2 the addenda and sample heat capacity, K1 the thermal
+    conductivity to the bath, K2 the internal conductivity and y1 the
+    measured addenda temperature. The corresponding transferfunction is
+
+                             b0 * s + b1
+        G(s) = ------------------------------------------
+               C1 * C2 * s^2 + (C1 K2 + C2 K1 + C2 K2) * s + K1 K2
+
+    with `b0 = C2` and `b1 = K2`. Like :class:`FirstOrder`, it is normalized
+    to a leading denominator coefficient of one.
+
+    :param b: Numerator polynom.
+    :param a: Denominator polynom.
+
+    """
+    def __init__(self, b, a):
+        # Normalize transfer function.
+        b = np.array(b) / a[0]
+        a = np.array(a) / a[0]
+        super(SecondOrder, self).__init__(b, a)
+
+    @classmethod
+    def from_ck(cls, addenda_heat_capacity, sample_heat_capacity,
+                thermal_conductivity, internal_conductivity):
+        c1, c2 = addenda_heat_capacity, sample_heat_capacity
+        k1, k2 = thermal_conductivity, internal_conductivity
+        b = [1. / c1, k2 / (c1 * c2)]
+        a = [1., (c1 * k2 + c2 * k1 + c2 * k2) / (c1 * c2), k1 * k2 / (c1 * c2)]
+        return cls(b, a)
+
+    def _parameters(self):
+        """Returns `(C1, C2, K1, K2)` computed from the coefficients."""
+        b0, b1 = np.r_[0., 0., self.num][-2:]
+        a1, a2 = self.den[1:3]
+        c1 = 1. / b0
+        rate = b1 / b0  # K2 / C2
+        k1 = a2 * c1 / rate
+        k2 = c1 * (a1 - rate) - k1
+        return c1, k2 / rate, k1, k2
+
+    @property
+    def addenda_heat_capacity(self):
+        return self._parameters()[0]
+
+    @property
+    def sample_heat_capacity(self):
+        return self._parameters()[1]
+
+    @property
+    def heat_capacity(self):
+        """The total heat capacity of addenda and sample."""
+        c1, c2, _, _ = self._parameters()
+        return c1 + c2
+
+    @property
+    def thermal_conductivity(self):
+        return self._parameters()[2]
+
+    @property
+    def internal_conductivity(self):
+        return self._parameters()[3]
+
+    @property
+    def time_constants(self):
+        """The two time constants `(tau1, tau2)`, the longer one first."""
+        return tuple(np.sort(-1. / np.roots(self.den).real)[::-1])
+
+    @classmethod
+    def fit(cls, t, y, u, iterations=5, refine=True, **kwargs):
+        """Fits a two-tau heat capacity model.
+
+        The system is assumed to be at rest at zero temperature at the first
+        sample. If the timestamps are not uniformly spaced, the data is
+        interpolated on a uniform grid for the initial estimate.
+
+        The initial estimate is linear. A second order ARX model is fitted to
+        the sampled data and improved by instrumental variable iterations,
+        which remove the bias the measurement noise introduces into the ARX
+        fit. The discrete poles and residues are converted to the continuous
+        model assuming a zero order hold heater power. The estimate is then
+        refined by nonlinear least squares on the exact response, see
+        :meth:`predict`, in the logarithms of `C1, C2, K1, K2`.
+
+        :param t: A sequence of timestamps.
+        :param y: A sequence of temperatures.
+        :param u: A sequence of heater power values.
+        :param iterations: The number of instrumental variable iterations.
+        :param refine: If `False`, the linear estimate is returned.
+        :param kwargs: Additional keyword arguments passed to
+            :func:`scipy.optimize.least_squares`.
+        :raises ValueError: If the linear estimate is unphysical, e.g. if the
+            trace does not show two time constants.
+
+        """
+        t, y, u = (np.asarray(x, dtype=float) for x in (t, y, u))
+        if is_uniform(t):
+            yi, ui = y, u
+        else:
+            ti = np.linspace(np.min(t), np.max(t), len(t))
+            yi, ui = np.interp(ti, t, y), np.interp(ti, t, u)
+        dt = (t[-1] - t[0]) / (len(t) - 1)
+        parameters = _continuous(*_arx(yi, ui, iterations), dt=dt)
+        if not refine:
+            return cls.from_ck(*parameters)
+
+        from scipy import optimize
+
+        def residuals(x):
+            return _two_tau_response(*np.exp(x), t=t, u=u) - y
+
+        kwargs.setdefault('x_scale', 'jac')
+        result = optimize.least_squares(residuals, np.log(parameters), **kwargs)
+        return cls.from_ck(*np.exp(result.x))
+
+    def predict(self, t, u, y0=0.):
+        """Predicts the addenda temperature response to a heater power trace.
+
+        The heater power is held constant between samples. The response is
+        computed in closed form, it is exact for arbitrary sampling.
+
+        :param t: A sequence of timestamps.
+        :param u: A sequence of heater power values.
+        :param y0: The initial temperature of addenda and sample.
+        :returns: An array of temperatures.
+
+        """
+        t, u = (np.asarray(x, dtype=float) for x in (t, u))
+        return _two_tau_response(*self._parameters(), t=t, u=u, y0=y0)
+
+
+def _arx(y, u, iterations):
+    """Fits `y[k] = -a1 y[k-1] - a2 y[k-2] + b1 u[k-1] + b2 u[k-2]`.
+
+    The least squares estimate is improved by simplified refined
+    instrumental variable iterations. The noise free output simulated with
+    the previous estimate serves as instrument, it is correlated with the
+    regressors but not with the noise. All signals are prefiltered with the
+    previous denominator, which whitens the equation error.
+
+    Returns the discrete numerator `[0, b1, b2]` and denominator
+    `[1, a1, a2]`.
+
+    """
+    def regressors(y, u):
+        return np.column_stack((-y[1:-1], -y[:-2], u[1:-1], u[:-2]))
+
+    phi, target = regressors(y, u), y[2:]
+    scale = np.sqrt(np.sum(phi**2, axis=0))
+    scale[scale == 0] = 1.
+    theta = linalg.lstsq(phi / scale, target)[0] / scale
+    for _ in range(iterations):
+        a = np.r_[1., theta[:2]]
+        if np.any(np.abs(np.roots(a)) >= 1.):
+            break
+        x = signal.lfilter(np.r_[0., theta[2:]], a, u)
+        yf, uf, xf = (signal.lfilter([1.], a, v) for v in (y, u, x))
+        phi, instruments, target = regressors(yf, uf) / scale, regressors(xf, uf) / scale, yf[2:]
+        theta = linalg.solve(instruments.T.dot(phi), instruments.T.dot(target)) / scale
+    return np.r_[0., theta[2:]], np.r_[1., theta[:2]]
+
+
+def _continuous(b, a, dt):
+    """Converts a discrete two-tau model to `(C1, C2, K1, K2)`.
+
+    The zero order hold equivalent of `r / (s - p)` is
+    `r / p * (exp(p * dt) - 1) / (z - exp(p * dt))`, which is inverted for
+    every discrete pole.
+
+    :raises ValueError: If the discrete model has no physical counterpart,
+        e.g. complex poles, poles outside of the range `(0, 1)` or negative
+        heat capacities and conductivities.
+
+    """
+    residues, poles, _ = signal.residue(b, a)
+    if np.any(np.abs(poles.imag) > 1e-9 * np.abs(poles)):
+        raise ValueError('The discrete model has complex poles {}.'.format(poles))
+    poles = poles.real
+    if np.any((poles <= 0.) | (poles >= 1.)):
+        raise ValueError('The discrete poles {} are outside of (0, 1).'.format(poles))
+    rates = np.log(poles) / dt
+    residues = residues.real * rates / (poles - 1.)
+    num, den = signal.invres(residues, rates, [])
+    b0, b1 = np.r_[0., 0., num.real][-2:]
+    a1, a2 = den.real[1:3]
+    # See SecondOrder._parameters.
+    c1 = 1. / b0
+    rate = b1 / b0
+    k1 = a2 * c1 / rate
+    k2 = c1 * (a1 - rate) - k1
+    parameters = c1, k2 / rate, k1, k2
+    if not all(x > 0. for x in parameters):
+        raise ValueError('The discrete model gives unphysical parameters '
+                         '(C1, C2, K1, K2) = {}.'.format(parameters))
+    return parameters
+
+
+def _two_tau_response(c1, c2, k1, k2, t, u, y0=0.):
+    """Computes the addenda temperature of the two-tau model.
+
+    The system is decoupled into its two modes, which are solved
+    independently with :func:`_response`.
+
+    """
+    system = np.array([[-(k1 + k2) / c1, k2 / c1], [k2 / c2, -k2 / c2]])
+    rates, vectors = linalg.eig(system)
+    rates, vectors = -rates.real, vectors.real
+    inverse = linalg.inv(vectors)
+    gains = inverse[:, 0] / c1
+    initial = inverse.dot([y0, y0])
+    return sum(vectors[0, i] * _response(rates[i], gains[i], t, u, initial[i]) for i in range(2))
+
+
+def is_uniform(t, rtol=1e-4):
+    """Checks if the timestamps are uniformly spaced.
+
+    :param t: A sequence of timestamps.
+    :param rtol: The tolerated spread of the sampling interval relative to the
+        mean sampling interval.
+
+    """
+    dt = np.diff(t)
+    if not len(dt):
+        return False
+    return np.ptp(dt) <= rtol * np.abs(np.mean(dt))
+
+
+def spline_derivative(t, y, ti):
+    """Estimates the derivative with an interpolating spline.
+
+    :param t: A sequence of timestamps.
+    :param y: The sequence to differentiate.
+    :param ti: The uniformly spaced timestamps to evaluate at.
+    :returns: A tuple `(yi, dyi)` with the values and the derivative at `ti`.
+
+    """
+    with profiling.timer('fit.spline'):
+        spline = interpolate.UnivariateSpline(t, y, s=0)
+    return spline(ti), spline.derivative(n=1)(ti)
+
+
+def savgol_derivative(t, y, ti, window=None, order=2):
+    """Estimates the derivative with a Savitzky-Golay filter.
+
+    The filter coefficients are computed with :func:`scipy.signal.savgol_coeffs`
+    and both the values and the derivative are smoothed, which makes this
+    estimator considerably more robust against measurement noise than
+    :func:`spline_derivative`.
+
+    :param t: A sequence of timestamps.
+    :param y: The sequence to differentiate.
+    :param ti: The uniformly spaced timestamps to evaluate at.
+    :param window: The odd filter window length. Defaults to the shortest
+        odd window larger than `order + 3`, e.g. 7 for the default order.
+    :param order: The order of the fitted polynom.
+    :returns: A tuple `(yi, dyi)` with the values and the derivative at `ti`.
+
+    """
+    if ti is not t:
+        y = np.interp(ti, t, y)
+    if window is None:
+        window = 2 * (order // 2) + 5
+    delta = ti[1] - ti[0]
+    return (signal.savgol_filter(y, window, order, deriv=0),
+            signal.savgol_filter(y, window, order, deriv=1, delta=delta))
+
+
+def gradient_derivative(t, y, ti):
+    """Estimates the derivative with central finite differences.
+
+    :param t: A sequence of timestamps.
+    :param y: The sequence to differentiate.
+    :param ti: The uniformly spaced timestamps to evaluate at.
+    :returns: A tuple `(yi, dyi)` with the values and the derivative at `ti`.
+
+    """
+    if ti is not t:
+        y = np.interp(ti, t, y)
+    return y, np.gradient(y, ti[1] - ti[0])
+
+
+#: The available derivative estimators of :meth:`FirstOrder.fit`.
+DERIVATIVES = {
+    'spline': spline_derivative,
+    'savgol': savgol_derivative,
+    'gradient': gradient_derivative,
+}
+
+
+def _response(rate, gain, t, u, y0):
+    """Solves dy/dt = -rate * y + gain * u for a zero order hold input.
+
+    Between two samples the exact solution is
+
+        y[k + 1] = exp(-rate * dt) * y[k] + (1 - exp(-rate * dt)) * gain / rate * u[k]
+
+    Unrolling the recursion turns it into cumulative sums of exponentially
+    scaled increments. These are evaluated in blocks short enough that the
+    exponentials do not overflow.
+
+    """
+    y = np.empty_like(t)
+    if not len(t):
+        return y
+    y[0] = y0
+    block = np.floor((t - t[0]) * (rate / 500.))
+    edges = np.flatnonzero(np.diff(block)) + 1
+    bounds = np.unique(np.r_[0, np.clip(edges, 1, len(t) - 1), len(t) - 1])
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        growth = np.exp(np.minimum(rate * (t[start:stop + 1] - t[start]), 700.))
+        increments = np.diff(growth) * u[start:stop]
+        y[start + 1:stop + 1] = (y[start] + gain / rate * np.cumsum(increments)) / growth[1:]
+    return y
+
+
+def _cumtrapz(y, t):
+    """Cumulative trapezoidal integral starting at zero."""
+    return np.r_[0., np.cumsum(0.5 * (y[1:] + y[:-1]) * np.diff(t))]
+
+
+def _cumhold(u, t):
+    """Cumulative integral of a zero order hold signal starting at zero."""
+    return np.r_[0., np.cumsum(u[:-1] * np.diff(t))]
+
+
+def _concatenate(t, y, u):
+    """Concatenates a batch of traces.
+
+    :returns: A tuple `(t, y, u, starts)` of flat arrays and the start index
+        of each trace.
+
+    """
+    if isinstance(y, np.ndarray) and y.ndim == 2:
+        t = np.broadcast_to(np.asarray(t, dtype=float), y.shape)
+        u = np.broadcast_to(np.asarray(u, dtype=float), y.shape)
+        lengths = np.full(y.shape[0], y.shape[1])
+        t, y, u = (np.ravel(x).astype(float) for x in (t, y, u))
+    else:
+        t, y, u = ([np.asarray(x, dtype=float) for x in seq] for seq in (t, y, u))
+        lengths = np.array([len(x) for x in y])
+        if not all(len(a) == len(b) == len(c) for a, b, c in zip(t, y, u)):
+            raise ValueError('t, y and u traces must have equal lengths.')
+        t, y, u = (np.concatenate(x) for x in (t, y, u))
+
+    if np.any(lengths < 3):
+        raise ValueError('Each trace needs at least three samples.')
+    starts = np.r_[0, np.cumsum(lengths)[:-1]]
+    return t, y, u, starts
+
+
+def _stack(t, y, u):
+    """Stacks a batch of traces into 2-D arrays with one trace per row.
+
+    Shorter traces are padded by repeating their last timestamp with zero
+    heater power, which leaves the response unchanged.
+
+    :returns: A tuple `(t, y, u, lengths)`.
+
+    """
+    if isinstance(y, np.ndarray) and y.ndim == 2:
+        t, u = (np.broadcast_to(np.asarray(x, dtype=float), y.shape) for x in (t, u))
+        return t, np.asarray(y, dtype=float), u, np.full(y.shape[0], y.shape[1])
+    t, y, u = ([np.asarray(x, dtype=float) for x in seq] for seq in (t, y, u))
+    lengths = np.array([len(x) for x in y])
+    if not all(len(a) == len(b) == len(c) for a, b, c in zip(t, y, u)):
+        raise ValueError('t, y and u traces must have equal lengths.')
+    if np.any(lengths < 1):
+        raise ValueError('Each trace needs at least one sample.')
+    shape = len(y), np.max(lengths)
+    columns = np.arange(shape[1])
+    # Index of the sample of each padded element, the last one is repeated.
+    index = np.minimum(columns, lengths[:, None] - 1)
+    rows = np.arange(shape[0])[:, None]
+    mask = columns < lengths[:, None]
+    stacked = []
+    for traces, padding in ((t, None), (y, 0.), (u, 0.)):
+        x = np.empty(shape)
+        x[mask] = np.concatenate(traces)
+        if padding is None:
+            x = x[rows, index]
+        else:
+            x[~mask] = padding
+        stacked.append(x)
+    return stacked[0], stacked[1], stacked[2], lengths
+
+
+def _batch_response(heat_capacity, thermal_conductivity, t, u, y0):
+    """Solves the first order model for 2-D arrays of traces.
+
+    Each row is solved in closed form as in :func:`_response`. The blocks
+    keeping the exponentials finite are shared by all rows, so every block
+    is a single vectorized cumulative sum along the rows.
+
+    """
+    rows = len(u)
+    heat_capacity, thermal_conductivity, y0 = (
+        np.broadcast_to(np.asarray(x, dtype=float), (rows,))[:, None]
+        for x in (heat_capacity, thermal_conductivity, y0))
+    exponent = thermal_conductivity / heat_capacity * (t - t[:, :1])
+    y = np.empty(u.shape)
+    y[:, :1] = y0
+    if u.shape[1] < 2:
+        return y
+    # An upper bound of the exponent increase of all rows.
+    bound = np.r_[0., np.cumsum(np.max(np.diff(exponent, axis=1), axis=0))]
+    start, end = 0, u.shape[1] - 1
+    while start < end:
+        stop = min(max(np.searchsorted(bound, bound[start] + 500., 'right') - 1, start + 1), end)
+        growth = np.exp(np.minimum(exponent[:, start:stop + 1] - exponent[:, start:start + 1], 700.))
+        increments = np.diff(growth, axis=1) * u[:, start:stop]
+        y[:, start + 1:stop + 1] = (y[:, start:start + 1] + np.cumsum(increments, axis=1) / thermal_conductivity) / growth[:, 1:]
+        start = stop
+    return y
+
+
+def _unstack(x, lengths, layout):
+    """Returns the rows in the layout of the input."""
+    if isinstance(layout, np.ndarray) and layout.ndim == 2:
+        return x
+    return [row[:length] for row, length in zip(x, lengths)]
+
+
+def _gradient(t, y, starts):
+    """Differentiates concatenated traces with finite differences.
+
+    Interior points use the second order accurate central difference for
+    non-uniform grids, the first and last sample of each trace use one-sided
+    differences.
+
+    """
+    ends = np.r_[starts[1:], len(y)] - 1
+    h = np.diff(t)
+    dy = np.empty_like(y)
+    h0, h1 = h[:-1], h[1:]
+    dy[1:-1] = (h0**2 * y[2:] - h1**2 * y[:-2] + (h1**2 - h0**2) * y[1:-1]) / (h0 * h1 * (h0 + h1))
+    dy[starts] = (y[starts + 1] - y[starts]) / (t[starts + 1] - t[starts])
+    dy[ends] = (y[ends] - y[ends - 1]) / (t[ends] - t[ends - 1])
+    return dy
+
+
+class RecursiveFirstOrder(object):
+    """Recursive least squares estimator of the first order model.
+
+    The estimator solves the integral form used by
+    :meth:`FirstOrder.fit_integral` incrementally. Each sample updates a fixed
+    size state, so the heat capacity, thermal conductivity and their
+    covariance are available at any time during a measurement, e.g.::
+
+        estimator = RecursiveFirstOrder()
+        for current in pulse:
+            with sampling(sampling_time):
+                measurement.currentsource.current = current
+                estimator.update(*measurement.measure())
+        print(estimator.heat_capacity, estimator.relative_uncertainty)
+
+    :param forgetting: The forgetting factor in the range (0, 1]. Values below
+        one discount old samples exponentially, which lets the estimate track
+        slowly changing parameters.
+    :param delta: The initial parameter covariance scale. Large values mean an
+        uninformative prior.
+
+    """
+    def __init__(self, forgetting=1., delta=1e8):
+        if not 0. < forgetting <= 1.:
+            raise ValueError('forgetting must be in the range (0, 1].')
+        self.forgetting = forgetting
+        #: The parameters (y(0), -K / C, 1 / C) of the integral form.
+        self.parameters = np.zeros(3)
+        self._p = np.eye(3) * delta
+        self._previous = None
+        self._integrals = np.zeros(2)
+        self._sse = 0.
+        #: The effective number of samples.
+        self.samples = 0.
+
+    def update(self, timestamp, power, temperature):
+        """Updates the estimate with a new sample.
+
+        :param timestamp: The sample time.
+        :param power: The heater power.
+        :param temperature: The temperature.
+
+        """
+        if self._previous is not None:
+            t0, u0, y0 = self._previous
+            dt = timestamp - t0
+            self._integrals += dt * np.array([0.5 * (temperature + y0), u0])
+        self._previous = timestamp, power, temperature
+
+        lam = self.forgetting
+        phi = np.r_[1., self._integrals]
+        p_phi = self._p.dot(phi)
+        gain = p_phi / (lam + phi.dot(p_phi))
+        error = temperature - phi.dot(self.parameters)
+        self.parameters = self.parameters + gain * error
+        p = (self._p - np.outer(gain, p_phi)) / lam
+        self._p = 0.5 * (p + p.T)
+
+        residual = temperature - phi.dot(self.parameters)
+        self._sse = lam * self._sse + residual * error
+        self.samples = lam * self.samples + 1.
+
+    @property
+    def heat_capacity(self):
+        return 1. / self.parameters[2]
+
+    @property
+    def thermal_conductivity(self):
+        return -self.parameters[1] / self.parameters[2]
+
+    @property
+    def variance(self):
+        """The estimated variance of the temperature noise."""
+        dof = self.samples - len(self.parameters)
+        return self._sse / dof if dof > 0 else np.inf
+
+    @property
+    def covariance(self):
+        """The 2x2 covariance matrix of the heat capacity and the thermal
+        conductivity."""
+        _, r0, r1 = self.parameters
+        # Jacobian of (C, K) = (1 / r1, -r0 / r1) with respect to (r0, r1).
+        jacobian = np.array([
+            [0., -1. / r1**2],
+            [-1. / r1, r0 / r1**2],
+        ])
+        return self.variance * jacobian.dot(self._p[1:, 1:]).dot(jacobian.T)
+
+    @property
+    def relative_uncertainty(self):
+        """The standard deviations of the heat capacity and the thermal
+        conductivity relative to their values."""
+        std = np.sqrt(np.diag(self.covariance))
+        return std / np.abs([self.heat_capacity, self.thermal_conductivity])
+
+    def model(self):
+        """Returns the current estimate as :class:`FirstOrder` model."""
+        return FirstOrder.from_ck(self.heat_capacity, self.thermal_conductivity)
+
+
+class ARXAccumulator(object):
+    """Accumulates the normal equations of the first order ARX model.
+
+    The model `y[k + 1] = a * y[k] + b * u[k]` is fitted by least squares,
+    see :meth:`FirstOrder.fit_arx`. Samples are added in chunks of any size,
+    the state is a small linear system and the last sample of the previous
+    chunk, e.g.::
+
+        accumulator = ARXAccumulator()
+        for chunk in chunks:
+            accumulator.update(chunk['temperature'], chunk['power'])
+        model = accumulator.model(sampling_time)
+
+    :param offset: If `True`, a constant `c` is added to the model,
+        `y[k + 1] = a * y[k] + b * u[k] + c`, which accounts for a bath
+        temperature `c / (1 - a)`.
+
+    """
+    def __init__(self, offset=False):
+        self.offset = offset
+        size = 3 if offset else 2
+        self._normal = np.zeros((size, size))
+        self._rhs = np.zeros(size)
+        self._previous = None
+        #: The number of accumulated sample pairs.
+        self.samples = 0
+
+    def update(self, y, u):
+        """Adds a chunk of consecutive samples.
+
+        :param y: A sequence of temperatures.
+        :param u: A sequence of heater power values.
+
+        """
+        y, u = (np.asarray(x, dtype=float) for x in (y, u))
+        if not len(y):
+            return
+        if self._previous is not None:
+            # Pair the last sample of the previous chunk with the first one.
+            y0, u0 = self._previous
+            self._add(np.r_[y0], np.r_[u0], y[:1])
+        self._add(y[:-1], u[:-1], y[1:])
+        self._previous = y[-1], u[-1]
+
+    def _add(self, y0, u0, y1):
+        columns = [y0, u0]
+        if self.offset:
+            columns.append(np.ones_like(y0))
+        regressors = np.column_stack(columns)
+        self._normal += regressors.T.dot(regressors)
+        self._rhs += regressors.T.dot(y1)
+        self.samples += len(y1)
+
+    def solve(self):
+        """Returns the least squares estimate of the coefficients `(a, b)`,
+        or `(a, b, c)` if :attr:`offset` is set."""
+        # Normalize, temperature and power differ by orders of magnitude.
+        scale = np.sqrt(np.diag(self._normal))
+        scale[scale == 0] = 1.
+        normal = self._normal / np.outer(scale, scale)
+        return tuple(linalg.solve(normal, self._rhs / scale, assume_a='pos') / scale)
+
+    def model(self, sampling):
+        """Returns the estimate as :class:`FirstOrder` model.
+
+        :param sampling: The sampling time.
+
+        """
+        a, b = self.solve()[:2]
+        thermal_conductivity = (1. - a) / b
+        heat_capacity = -thermal_conductivity * sampling / np.log(a)
+        return FirstOrder.from_ck(heat_capacity, thermal_conductivity)
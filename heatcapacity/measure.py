@@ -1,12 +1,30 @@
 #  -*- coding: utf-8 -*-
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
-from future.builtins import *
+import sys
+if sys.version_info[0] < 3:
+    from future.builtins import *
 import time
 import contextlib
+import threading
+import warnings
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 import numpy as np
 
+from heatcapacity import profiling
+from heatcapacity.buffer import SampleBuffer
+
+try:
+    _monotonic = time.perf_counter
+except AttributeError:
+    # Python 2 lacks a monotonic clock.
+    _monotonic = time.time
+
 
 class Measurement(object):
     """Abstract base class defining the heat capacity measurement interface.
@@ -16,12 +34,47 @@ class Measurement(object):
     :param powermeter: An object implementing the :class:`Powermeter` interface.
     :param thermometer: An object implementing the :class:`Thermometer`
         interface.
+    :param concurrent: If `True`, the instruments are read in parallel from a
+        thread pool. This is useful if each read blocks on slow instrument
+        I/O, e.g. GPIB. The instrument drivers must then be thread safe.
+
+    The :attr:`clock` used for timestamps and sampling defaults to the
+    :class:`SystemClock` and can be replaced, e.g. by a
+    :class:`~heatcapacity.simulation.VirtualClock` to run a simulated
+    measurement faster than real time.
+
+    If the :attr:`writer` is set, e.g. to a
+    :class:`~heatcapacity.storage.TraceWriter`, every sample is passed to its
+    `append` method as soon as it is measured. The full trace is then only
+    kept by the writer, the arrays returned by :meth:`start` hold the last
+    :attr:`tail` samples, so the memory use does not grow with the duration.
 
     """
-    def __init__(self, currentsource, powermeter, thermometer):
+    #: The instrument and attribute read for each channel.
+    channels = (
+        ('current', 'currentsource'),
+        ('voltage', 'powermeter'),
+        ('temperature', 'thermometer'),
+    )
+
+    def __init__(self, currentsource, powermeter, thermometer, concurrent=False):
         self.currentsource = currentsource
         self.powermeter = powermeter
         self.thermometer = thermometer
+        self.concurrent = concurrent
+        self.clock = SystemClock()
+        #: The :class:`Scheduler` of the last run, holding its timing
+        #: statistics.
+        self.scheduler = None
+        #: The timestamps of the last read of each channel, taken halfway
+        #: through the read.
+        self.timestamps = {}
+        #: The duration of the last read of each channel.
+        self.latency = {}
+        self.writer = None
+        #: The number of samples kept in memory while a :attr:`writer` is set.
+        self.tail = 2**16
+        self._executor = None
 
     def start(self):
         """Starts the heat capacity measurement."""
@@ -29,11 +82,179 @@ class Measurement(object):
 
     def measure(self):
         """Measures the time, heater power and platform temperature."""
-        timestamp = time.time()
-        current = self.currentsource.current
-        heater_voltage = self.powermeter.voltage
-        temperature = self.thermometer.temperature
-        return timestamp, current * heater_voltage, temperature
+        timestamp = self.clock.time()
+        if self.concurrent:
+            if self._executor is None:
+                from concurrent import futures
+                self._executor = futures.ThreadPoolExecutor(len(self.channels))
+            readings = list(self._executor.map(self._read, self.channels))
+        else:
+            readings = [self._read(channel) for channel in self.channels]
+
+        values = {}
+        for (channel, _), (value, read_timestamp, latency) in zip(self.channels, readings):
+            values[channel] = value
+            self.timestamps[channel] = read_timestamp
+            self.latency[channel] = latency
+        return timestamp, values['current'] * values['voltage'], values['temperature']
+
+    def _buffer(self, capacity=1024):
+        """Creates the sample buffer of a run, bounded to the :attr:`tail` if
+        a writer is set."""
+        return SampleBuffer(capacity, maxlen=None if self.writer is None else self.tail)
+
+    def _record(self, data, sample):
+        """Appends a sample to the data and the writer."""
+        data.append(sample)
+        if self.writer is not None:
+            self.writer.append(sample)
+
+    def close(self):
+        """Releases the threads used for concurrent reads."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _read(self, channel):
+        """Reads a channel and returns its value, timestamp and latency."""
+        name, instrument = channel
+        profile = profiling.monotonic() if profiling.enabled else None
+        timestamp = self.clock.time()
+        start = self.clock.monotonic()
+        value = getattr(getattr(self, instrument), name)
+        latency = self.clock.monotonic() - start
+        if profile is not None:
+            profiling.record('measure.' + name, profiling.monotonic() - profile)
+        return value, timestamp + 0.5 * latency, latency
+
+
+class SystemClock(object):
+    """The system clock.
+
+    Timestamps are taken from the wall clock, while the sampling is scheduled
+    with a monotonic clock that is not affected by wall clock adjustments.
+
+    """
+    def time(self):
+        """Returns the wall clock time in seconds since the epoch."""
+        return time.time()
+
+    def monotonic(self):
+        """Returns the time of a monotonic clock in seconds."""
+        return _monotonic()
+
+    def sleep(self, seconds):
+        """Suspends execution for the given number of seconds."""
+        time.sleep(seconds)
+
+
+class Scheduler(object):
+    """Paces a loop at a fixed sampling time.
+
+    Each entry of the scheduler context starts a new sampling period, the
+    exit waits until its deadline. The deadlines lie on an absolute grid
+    relative to the first entry, so timing errors do not accumulate, e.g.::
+
+        scheduler = Scheduler(0.1)
+        for current in pulse:
+            with scheduler:
+                source.current = current
+
+    If a period overruns its deadline, the next period starts immediately and
+    ends on the next deadline of the grid that lies in the future.
+
+    :param step: The sampling time in seconds.
+    :param clock: The clock, defaults to the :class:`SystemClock`.
+    :param spin: The time in seconds before a deadline from which on the
+        scheduler busy waits instead of sleeping. The default of zero sleeps
+        only, which has the lowest cpu load. Small positive values reduce
+        the jitter at the cost of cpu time.
+
+    """
+    def __init__(self, step, clock=None, spin=0.):
+        if step <= 0:
+            raise ValueError('step must be positive.')
+        self.step = step
+        self.clock = SystemClock() if clock is None else clock
+        self.spin = spin
+        self.start = None
+        self.deadline = None
+        #: The number of sampling periods.
+        self.periods = 0
+        #: The number of periods overrunning their deadline.
+        self.overruns = 0
+        #: The number of deadlines skipped due to overruns.
+        self.missed = 0
+        #: The largest delay of a wake up after its deadline.
+        self.max_jitter = 0.
+        self._jitter = 0.
+
+    @property
+    def elapsed(self):
+        """The time since the first period started."""
+        if self.start is None:
+            return 0.
+        return self.clock.monotonic() - self.start
+
+    @property
+    def mean_jitter(self):
+        """The mean delay of a wake up after its deadline."""
+        sleeps = self.periods - self.overruns
+        return self._jitter / sleeps if sleeps else 0.
+
+    def statistics(self):
+        """Returns the timing statistics as dictionary."""
+        return {
+            'periods': self.periods,
+            'overruns': self.overruns,
+            'missed': self.missed,
+            'mean_jitter': self.mean_jitter,
+            'max_jitter': self.max_jitter,
+        }
+
+    def __enter__(self):
+        if self.deadline is None:
+            self.start = self.deadline = self.clock.monotonic()
+        self.deadline += self.step
+        self.periods += 1
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type is not None:
+            return
+        remaining = self._remaining()
+        if remaining is None:
+            return
+        if remaining > self.spin:
+            self.clock.sleep(remaining - self.spin)
+        self._wake()
+
+    def _remaining(self):
+        """Returns the time left until the deadline.
+
+        Overruns are accounted for and yield `None`.
+
+        """
+        now = self.clock.monotonic()
+        if now >= self.deadline:
+            self.overruns += 1
+            missed = int((now - self.deadline) // self.step)
+            if profiling.enabled:
+                profiling.record('scheduler.overrun', now - self.deadline)
+                profiling.count('scheduler.missed', missed)
+            self.missed += missed
+            self.deadline += missed * self.step
+            return None
+        return self.deadline - now
+
+    def _wake(self):
+        """Waits out the spin margin and records the wake up jitter."""
+        now = self.clock.monotonic()
+        while now < self.deadline:
+            now = self.clock.monotonic()
+        jitter = now - self.deadline
+        self._jitter += jitter
+        self.max_jitter = max(self.max_jitter, jitter)
 
 
 class CurrentSource(object):
@@ -61,6 +282,23 @@ class Thermometer(object):
         raise NotImplementedError()
 
 
+class Scanner(object):
+    """Abstract base class defining the scanner interface.
+
+    A scanner connects one of several sensors to a shared instrument, e.g.
+    the platform thermometers to a resistance bridge, see
+    :class:`~heatcapacity.multiplex.Multiplexer`.
+
+    """
+    @property
+    def channel(self):
+        raise NotImplementedError()
+
+    @channel.setter
+    def channel(self, value):
+        raise NotImplementedError()
+
+
 class PulseMeasurement(Measurement):
     """A heat capacity measurement using a predefined pulse sequence.
 
@@ -71,100 +309,491 @@ class PulseMeasurement(Measurement):
         interface.
     :param pulse: A sequence of current values.
     :param sampling_time: The sampling time.
+    :param concurrent: If `True`, the instruments are read in parallel.
 
     """
-    def __init__(self, currentsource, powermeter, thermometer, pulse, sampling_time):
-        super(PulseMeasurement, self).__init__(currentsource, powermeter, thermometer)
+    def __init__(self, currentsource, powermeter, thermometer, pulse, sampling_time, concurrent=False):
+        super(PulseMeasurement, self).__init__(currentsource, powermeter, thermometer, concurrent)
         self.pulse = pulse
         self.sampling_time = sampling_time
 
     def start(self):
-        """Starts the heat capacity measurement."""
-        data = []
+        """Starts the heat capacity measurement.
+
+        :returns: A tuple of arrays `(timestamp, power, temperature)`.
+
+        """
+        data = self._buffer(len(self.pulse))
+        self.scheduler = scheduler = Scheduler(self.sampling_time, clock=self.clock)
         for current in self.pulse:
-            with sampling(self.sampling_time):
+            with scheduler:
                 self.currentsource.current = current
-                data.append(self.measure)
+                self._record(data, self.measure())
 
-        timestamp, power, temperature = zip(*data)
+        if self.writer is not None:
+            self.writer.flush()
+        timestamp, power, temperature = data.columns()
         return timestamp, power, temperature
 
 
+#: The phases of an :class:`AdaptiveStep` measurement.
+STEADY, HEATING, DECAY = 'steady', 'heating', 'decay'
+
+
+def _window(duration, sampling):
+    """Returns the default odd filter window of a fifth of the duration."""
+    window = int(duration / sampling / 5)
+    return window + 1 if window % 2 == 0 else window
+
+
+class StopPolicy(object):
+    """Abstract base class deciding when the phases of an
+    :class:`AdaptiveStep` end.
+
+    Every sample is passed to :meth:`update` together with its phase. The
+    steady state always lasts the `duration` of the measurement, the
+    heating and decay phase last until :meth:`update` returns `True`.
+    Policies are called once per sample and should be cheap.
+
+    """
+    def reset(self, measurement):
+        """Prepares the policy for a new run.
+
+        :param measurement: The :class:`AdaptiveStep` measurement.
+
+        """
+        pass
+
+    def update(self, phase, timestamp, power, temperature):
+        """Processes a sample.
+
+        :param phase: One of :data:`STEADY`, :data:`HEATING` or
+            :data:`DECAY`.
+        :param timestamp: The sample time.
+        :param power: The heater power.
+        :param temperature: The temperature.
+        :returns: `True` if the phase may end.
+
+        """
+        raise NotImplementedError()
+
+
+class DerivativeThreshold(StopPolicy):
+    """Ends heating once the Savitzky-Golay derivative of the temperature
+    settled, the decay lasts as long as the heating.
+
+    The heating lasts at least the `duration` of the measurement. This is the
+    default policy of :class:`AdaptiveStep`.
+
+    :param threshold: The derivative threshold, defaults to the
+        `deriv_threshold` of the measurement or `1`.
+    :param window: The odd filter window length, defaults to the `window` of
+        the measurement or a fifth of its `duration`.
+    :param order: The order of the filter polynom, defaults to the `order` of
+        the measurement or `2`.
+
+    """
+    def __init__(self, threshold=None, window=None, order=None):
+        self.threshold = threshold
+        self.window = window
+        self.order = order
+        #: The filtered derivatives of the last run.
+        self.derivative = []
+
+    def reset(self, measurement):
+        window = self.window
+        if window is None:
+            window = getattr(measurement, 'window', None)
+        if window is None:
+            window = _window(measurement.duration, measurement.sampling)
+        order = self.order
+        if order is None:
+            order = getattr(measurement, 'order', 2)
+        self._filter = savitzky_golay(window, order, deriv=1, sampling=measurement.sampling)
+        self._threshold = self.threshold
+        if self._threshold is None:
+            self._threshold = getattr(measurement, 'deriv_threshold', 1.)
+        self._min_samples = measurement.duration / measurement.sampling
+        self._phase = None
+        self._samples = self._heating = 0
+        self.derivative = []
+
+    def update(self, phase, timestamp, power, temperature):
+        self.derivative.append(self._filter(temperature / power if power else temperature))
+        if phase != self._phase:
+            self._phase, self._samples = phase, 0
+        self._samples += 1
+        if phase == HEATING:
+            self._heating = self._samples
+            return (self._samples >= self._min_samples
+                    and np.abs(self.derivative[-1]) <= self._threshold)
+        return self._samples >= self._heating
+
+
+class _Estimate(StopPolicy):
+    """Feeds the samples relative to the mean steady state temperature to a
+    :class:`~heatcapacity.fit.RecursiveFirstOrder` estimator."""
+    def reset(self, measurement):
+        # Imported lazily, scipy dominates the import time otherwise.
+        from heatcapacity.fit import RecursiveFirstOrder
+        self._estimator = RecursiveFirstOrder()
+        self._sampling = measurement.sampling
+        self._steady = [0., 0]
+        self._baseline = None
+        self._phase = None
+        self._samples = self._heating = 0
+
+    def _update(self, phase, timestamp, power, temperature):
+        if phase != self._phase:
+            self._phase, self._samples = phase, 0
+        self._samples += 1
+        if phase == STEADY:
+            self._steady[0] += temperature
+            self._steady[1] += 1
+            return
+        if phase == HEATING:
+            self._heating = self._samples
+        if self._baseline is None:
+            total, count = self._steady
+            self._baseline = total / count if count else temperature
+        self._estimator.update(timestamp, power, temperature - self._baseline)
+
+    @property
+    def _uncertainty(self):
+        if self._estimator.samples < self.min_samples:
+            return np.inf
+        with np.errstate(divide='ignore', invalid='ignore'):
+            uncertainty = self._estimator.relative_uncertainty
+        return np.inf if not np.all(np.isfinite(uncertainty)) else np.max(uncertainty)
+
+
+class Equilibrium(_Estimate):
+    """Ends the heating and the decay once the temperature approached the
+    equilibrium.
+
+    Each phase lasts `multiple` time constants, the remaining deviation
+    from the equilibrium is `exp(-multiple)`. Without a prior, the time
+    constant is estimated incrementally from the measured samples.
+
+    :param multiple: The phase duration in time constants.
+    :param tau: The time constant, e.g. from a previous measurement. If
+        `None`, it is estimated by a
+        :class:`~heatcapacity.fit.RecursiveFirstOrder` fit.
+    :param tolerance: The relative uncertainty below which the estimated time
+        constant is trusted.
+    :param min_samples: The minimal number of samples of the estimate.
+
+    """
+    def __init__(self, multiple=5., tau=None, tolerance=0.1, min_samples=10):
+        self.multiple = multiple
+        self.tau = tau
+        self.tolerance = tolerance
+        self.min_samples = min_samples
+
+    def update(self, phase, timestamp, power, temperature):
+        if self.tau is None:
+            self._update(phase, timestamp, power, temperature)
+            if phase == STEADY or self._uncertainty > self.tolerance:
+                return False
+            tau = self._estimator.heat_capacity / self._estimator.thermal_conductivity
+        else:
+            if phase != self._phase:
+                self._phase, self._samples = phase, 0
+            self._samples += 1
+            tau = self.tau
+        return self._samples * self._sampling >= self.multiple * tau
+
+
+class Convergence(_Estimate):
+    """Ends the heating and the decay once an incremental fit reached the
+    target precision.
+
+    The heater is switched off once the relative uncertainties of the heat
+    capacity and thermal conductivity of a
+    :class:`~heatcapacity.fit.RecursiveFirstOrder` fit drop below
+    `sqrt(2) * tolerance`, i.e. about half of the required information is
+    collected. The decay ends once they drop below `tolerance`, but lasts at
+    most as long as the heating.
+
+    :param tolerance: The target relative uncertainty.
+    :param min_samples: The minimal number of samples of the estimate.
+
+    """
+    def __init__(self, tolerance=0.01, min_samples=20):
+        self.tolerance = tolerance
+        self.min_samples = min_samples
+
+    def update(self, phase, timestamp, power, temperature):
+        self._update(phase, timestamp, power, temperature)
+        if phase == HEATING:
+            return self._uncertainty <= np.sqrt(2.) * self.tolerance
+        if phase == DECAY:
+            return self._samples >= self._heating or self._uncertainty <= self.tolerance
+        return False
+
+
 class AdaptiveStep(Measurement):
-    def __init__(self, currentsource, powermeter, thermometer, duration, max_current, min_current=0., window=None, sampling=0.1):
-        super(AdaptiveStep, self).__init__(currentsource, powermeter, thermometer)
+    """A heat capacity measurement with a step pulse of adaptive length.
+
+    After measuring the steady state for `duration`, the heater current is
+    stepped to `max_current` until the stop `policy` ends the heating. The
+    decay is measured until the policy ends it as well. By default, the
+    heating lasts until at least `duration` passed and the Savitzky-Golay
+    derivative of the temperature settled, the decay is measured for the
+    same time, see :class:`DerivativeThreshold`.
+
+    By default the instruments are sampled by a background acquisition
+    thread, while the calling thread updates the derivative filter and
+    decides when to stop heating. The analysis cost therefore does not
+    disturb the sampling cadence. :attr:`scheduler` holds the sampling
+    overruns of the last run, :attr:`backlog` the largest number of samples
+    waiting for analysis.
+
+    :param currentsource: An object implementing the :class:`CurrentSource`
+        interface.
+    :param powermeter: An object implementing the :class:`Powermeter` interface.
+    :param thermometer: An object implementing the :class:`Thermometer`
+        interface.
+    :param duration: The minimal duration of the steady state and heating
+        phase.
+    :param max_current: The heater current during the heating phase.
+    :param min_current: The heater current otherwise.
+    :param window: The Savitzky-Golay filter window length.
+    :param sampling: The sampling time.
+    :param concurrent: If `True`, the instruments are read in parallel.
+    :param threaded: If `False`, the acquisition and analysis run in the
+        calling thread, in lockstep.
+    :param policy: The :class:`StopPolicy`, defaults to a
+        :class:`DerivativeThreshold`.
+    :param max_duration: The maximal duration of the heating and of the decay
+        phase, defaults to ten times `duration`. A phase reaching it ends
+        regardless of the policy with a :class:`RuntimeWarning` and is
+        listed in :attr:`timeouts`.
+
+    """
+    def __init__(self, currentsource, powermeter, thermometer, duration, max_current, min_current=0., window=None, sampling=0.1, concurrent=False, threaded=True, policy=None, max_duration=None):
+        super(AdaptiveStep, self).__init__(currentsource, powermeter, thermometer, concurrent)
         self.duration = duration
         self.max_current = max_current
         self.min_current = min_current
         self.sampling = sampling
+        self.threaded = threaded
+        self.policy = DerivativeThreshold() if policy is None else policy
+        self.max_duration = 10. * duration if max_duration is None else max_duration
+        #: The phases of the last run ended by the `max_duration`.
+        self.timeouts = []
         self.deriv_threshold = 1
+        self.backlog = 0
         
         if window is None:
-            window = duration / sampling / 5
-            self.window = window + 1 if window % 2 == 0 else window
+            self.window = _window(duration, sampling)
         else:
             self.window = window
             
         self.order = 2
         
     def start(self, verbose=False):
-        data = []
-        derivative = []
+        data = self._buffer()
+        policy = self.policy
+        policy.reset(self)
 
-        input = audiolazy.ControlStream(0.)
-        deriv_filt = savitzky_golay(self.window, self.order, deriv=1., sampling=self.sampling)(input)
-        
-        # measure steady state
-        start = time.time()
-        self.currentsource.current = self.min_current
-        while time.time() - start < self.duration:
-            with sampling(self.sampling):
-                timestamp, power, temperature = self.measure()
-                data.append((timestamp, power, temperature))
-                # Update derivative filter
-                input.value = temperature / power if power else temperature
-                derivative.append(deriv_filt.take())
-        
-        #measure response to heat pulse
-        start = time.time()
-        self.currentsource.current = self.max_current
-        while (time.time() - start < self.duration) or (np.abs(derivative[-1]) > self.deriv_threshold):
-            with sampling(self.sampling):
-                timestamp, power, temperature = self.measure()
-                data.append((timestamp, power, temperature))
-                # Update derivative filter
-                input.value = temperature / power if power else temperature
-                derivative.append(deriv_filt.take())
-                
-        #measure decay for the same time
-        duration = time.time() - start
-        start = time.time()
-        self.currentsource.current = self.min_current
-        while time.time() - start < duration:
-            with sampling(self.sampling):
-                timestamp, power, temperature = self.measure()
-                data.append((timestamp, power, temperature))
-                # Update derivative filter
-                input.value = temperature / power if power else temperature
-                derivative.append(deriv_filt.take())
-
-        timestamp, power, temperature = zip(*data)
+        self.scheduler = scheduler = Scheduler(self.sampling, clock=self.clock)
+        done = {HEATING: threading.Event(), DECAY: threading.Event()}
+        self.timeouts = []
+
+        def analyse(item):
+            phase, sample = item
+            self._record(data, sample)
+            profile = profiling.monotonic() if profiling.enabled else None
+            stop = policy.update(phase, *sample)
+            if profile is not None:
+                profiling.record('adaptive_step.filter', profiling.monotonic() - profile)
+            if phase in done:
+                if stop:
+                    done[phase].set()
+                else:
+                    done[phase].clear()
+
+        if self.threaded:
+            self._consume(analyse, lambda emit, stop: self._acquire(scheduler, done, emit, stop))
+        else:
+            self._acquire(scheduler, done, analyse)
+        for phase in self.timeouts:
+            warnings.warn('The {} phase reached the maximal duration of {}s.'.format(
+                phase, self.max_duration), RuntimeWarning)
+
+        if self.writer is not None:
+            self.writer.flush()
+        timestamp, power, temperature = data.columns()
         if verbose:
-            return timestamp, power, temperature, derivative
+            return timestamp, power, temperature, getattr(policy, 'derivative', [])
         return timestamp, power, temperature
 
+    def _acquire(self, scheduler, done, emit, stop=None):
+        """Runs the measurement phases and emits every sample.
+
+        The heater is returned to `min_current` on exit, including errors.
+
+        :param scheduler: The :class:`Scheduler` pacing the sampling.
+        :param done: A dictionary of events per phase, set as long as the
+            policy allows to end the phase.
+        :param emit: A callable receiving `(phase, sample)` tuples.
+        :param stop: An optional event aborting the acquisition once set.
+
+        """
+        stop = threading.Event() if stop is None else stop
+        try:
+            # measure steady state
+            start = scheduler.elapsed
+            self.currentsource.current = self.min_current
+            while scheduler.elapsed - start < self.duration and not stop.is_set():
+                with scheduler:
+                    emit((STEADY, self.measure()))
+
+            #measure response to heat pulse and decay
+            for phase, current in ((HEATING, self.max_current), (DECAY, self.min_current)):
+                if stop.is_set():
+                    return
+                start = scheduler.elapsed
+                self.currentsource.current = current
+                while not (done[phase].is_set() or stop.is_set()):
+                    # Half a period absorbs rounding errors of the sampling grid.
+                    if scheduler.elapsed - start > self.max_duration - 0.5 * self.sampling:
+                        self.timeouts.append(phase)
+                        break
+                    with scheduler:
+                        emit((phase, self.measure()))
+        finally:
+            self.currentsource.current = self.min_current
+
+    def _consume(self, analyse, acquire):
+        """Runs the acquisition in a background thread and analyses the
+        samples in the calling thread.
+
+        :param analyse: A callable receiving the samples.
+        :param acquire: A callable `acquire(emit, stop)` producing the
+            samples until done or until the `stop` event is set.
+
+        If the analysis fails or is interrupted, the acquisition is stopped
+        before the error propagates.
+
+        """
+        samples = queue.Queue()
+        errors = []
+        stop = threading.Event()
+
+        def produce():
+            try:
+                acquire(samples.put, stop)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                samples.put(None)
+
+        thread = threading.Thread(target=produce)
+        thread.daemon = True
+        thread.start()
+
+        self.backlog = 0
+        try:
+            while True:
+                self.backlog = max(self.backlog, samples.qsize())
+                sample = samples.get()
+                if sample is None:
+                    break
+                analyse(sample)
+        finally:
+            stop.set()
+            thread.join()
+        if errors:
+            raise errors[0]
+
+
+class FIRFilter(object):
+    """A finite impulse response filter processing one sample at a time.
+
+    The filter keeps the most recent input samples in a circular buffer of
+    twice the filter length, so every window is a contiguous slice and an
+    update costs a single dot product.
+
+        y[n] = c[0] * x[n] + c[1] * x[n - 1] + ... + c[N - 1] * x[n - N + 1]
+
+    :param coefficients: The filter coefficients `c`.
+
+    """
+    def __init__(self, coefficients):
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self._reversed = self.coefficients[::-1].copy()
+        self.reset()
+
+    def reset(self):
+        """Clears the filter state, all past inputs are zero."""
+        self._buffer = np.zeros(2 * len(self.coefficients))
+        self._index = 0
+
+    def __call__(self, x):
+        """Filters a single sample and returns the output."""
+        n = len(self._reversed)
+        i = self._index
+        self._buffer[i] = self._buffer[i + n] = x
+        self._index = i = (i + 1) % n
+        return float(self._reversed.dot(self._buffer[i:i + n]))
+
+    def process(self, x):
+        """Filters a sequence of samples in a single pass.
+
+        The filter state is carried over, so this is equivalent to calling
+        the filter for each sample.
+
+        :param x: A sequence of input samples.
+        :returns: An array of output samples.
+
+        """
+        x = np.asarray(x, dtype=float)
+        if not len(x):
+            return np.empty(0)
+        n = len(self._reversed)
+        i = self._index
+        x = np.concatenate((self._buffer[i:i + n], x))
+        y = np.convolve(x, self.coefficients, mode='valid')[1:]
+        self._buffer[:n] = self._buffer[n:] = x[-n:]
+        self._index = 0
+        return y
 
-import audiolazy
-from scipy import signal
 
 def savitzky_golay(window, order, deriv=1, sampling=1.):
-    return audiolazy.ZFilter(numerator=signal.savgol_coeffs(window, order, deriv=deriv, delta=sampling, use='conv').tolist())
+    """Creates a causal Savitzky-Golay filter.
+
+    The filter evaluates the polynomial fitted to the last `window` samples at
+    the center of the window, the output therefore lags by `window // 2`
+    samples.
+
+    :param window: The odd window length.
+    :param order: The order of the fitted polynom.
+    :param deriv: The order of the derivative.
+    :param sampling: The sampling time.
+    :returns: A :class:`FIRFilter`.
+
+    """
+    # Imported lazily, scipy.signal dominates the import time otherwise.
+    from scipy import signal
+    return FIRFilter(signal.savgol_coeffs(window, order, deriv=deriv, delta=sampling, use='conv'))
 
 @contextlib.contextmanager
 def sampling(step, sleep_ratio=0.01):
-    assert step > 0
-    
-    start = time.time()
-    yield
-    while (time.time() - start) < step:
-        time.sleep(step * sleep_ratio)
\ No newline at end of file
+    """Pads the enclosed block to a duration of `step` seconds.
+
+    .. note::
+
+        Consecutive uses do not share a common time grid, use a
+        :class:`Scheduler` to avoid the accumulation of timing errors.
+
+    :param step: The sampling time in seconds.
+    :param sleep_ratio: The fraction of `step` before the end of the block
+        which is busy waited instead of slept, see the `spin` parameter of
+        the :class:`Scheduler`. Smaller values reduce the cpu load, larger
+        values the jitter.
+
+    """
+    with Scheduler(step, spin=step * sleep_ratio):
+        yield
@@ -0,0 +1,112 @@
+#  -*- coding: utf-8 -*-
+"""Monte-Carlo estimation of the fit uncertainties.
+
+The measurement of a model is simulated many times with independent noise
+realisations and fitted again, e.g.::
+
+    import heatcapacity as hc
+    from heatcapacity.montecarlo import monte_carlo
+
+    model = hc.FirstOrder.from_ck(0.004, 0.002)
+    pulse = [0.] * 100 + [0.001] * 200 + [0.] * 200
+    result = monte_carlo(model, pulse, sampling=0.1, sigma=1e-3, trials=1000,
+                         heater_resistance=1e3)
+    print(result.confidence_interval(0.95))
+
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import os
+import sys
+if sys.version_info[0] < 3:
+    from future.builtins import *
+from concurrent import futures
+
+import numpy as np
+
+from heatcapacity.fit import FirstOrder
+from heatcapacity.simulation import Simulation
+
+
+class MonteCarloResult(object):
+    """The distributions of the fitted parameters.
+
+    :param heat_capacity: The fitted heat capacities, one per trial.
+    :param thermal_conductivity: The fitted thermal conductivities, one per
+        trial.
+
+    """
+    def __init__(self, heat_capacity, thermal_conductivity):
+        self.heat_capacity = heat_capacity
+        self.thermal_conductivity = thermal_conductivity
+
+    def __len__(self):
+        return len(self.heat_capacity)
+
+    def std(self):
+        """Returns the standard deviations of the heat capacity and thermal
+        conductivity."""
+        return np.std(self.heat_capacity, ddof=1), np.std(self.thermal_conductivity, ddof=1)
+
+    def confidence_interval(self, level=0.95):
+        """Computes the central confidence intervals from the percentiles.
+
+        :param level: The confidence level.
+        :returns: A tuple `((c_low, c_high), (k_low, k_high))`.
+
+        """
+        q = 50. * np.array([1. - level, 1. + level])
+        return (tuple(np.percentile(self.heat_capacity, q)),
+                tuple(np.percentile(self.thermal_conductivity, q)))
+
+
+def monte_carlo(model, pulse, sampling, sigma, trials, heater_resistance=1.,
+                method='fit', workers=None, seed=None):
+    """Estimates the parameter distributions by repeated simulation and fit.
+
+    The trials are distributed over a process pool. Every trial draws its
+    noise from its own seed derived from `seed`, so the result does not
+    depend on the number of workers.
+
+    :param model: The lti model to simulate, e.g. a :class:`FirstOrder` model.
+    :param pulse: A sequence of current values, one per sampling step.
+    :param sampling: The sampling time.
+    :param sigma: The standard deviation of the temperature noise.
+    :param trials: The number of trials.
+    :param heater_resistance: The heater resistance in ohm.
+    :param method: The name of the :class:`FirstOrder` fit method to use,
+        e.g. `'fit'` or `'fit_integral'`.
+    :param workers: The number of worker processes. `None` uses one process
+        per cpu, `1` runs all trials in the calling process.
+    :param seed: An optional seed making the result reproducible.
+    :returns: A :class:`MonteCarloResult`.
+
+    """
+    seeds = [s.generate_state(1)[0] for s in np.random.SeedSequence(seed).spawn(trials)]
+    args = (model, np.asarray(pulse, dtype=float), sampling, sigma, heater_resistance, method)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        results = [_trials(args, seeds)]
+    else:
+        with futures.ProcessPoolExecutor(workers) as executor:
+            # A few chunks per worker balance the load at low overhead.
+            chunks = np.array_split(seeds, 4 * workers)
+            results = list(executor.map(_trials, [args] * len(chunks), chunks))
+    heat_capacity, thermal_conductivity = np.hstack(results)
+    return MonteCarloResult(heat_capacity, thermal_conductivity)
+
+
+def _trials(args, seeds):
+    """Simulates and fits one trial per seed."""
+    model, pulse, sampling, sigma, heater_resistance, method = args
+    fit = getattr(FirstOrder, method)
+    t = np.arange(len(pulse)) * sampling
+    result = np.empty((2, len(seeds)))
+    for i, seed in enumerate(seeds):
+        sim = Simulation(model, sampling, heater_resistance, sigma, seed=seed)
+        u, y = sim.simulate(pulse)
+        fitted = fit(t, y, u)
+        result[:, i] = fitted.heat_capacity, fitted.thermal_conductivity
+    return result
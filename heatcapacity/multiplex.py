@@ -0,0 +1,210 @@
+#  -*- coding: utf-8 -*-
+"""Acquisition of several calorimeter platforms over shared instruments.
+
+The platform thermometers are switched by a scanner onto a single
+resistance bridge, while every platform keeps its own heater. The
+:class:`Multiplexer` visits the platforms in turn and returns one trace per
+platform, e.g.::
+
+    from heatcapacity.multiplex import Multiplexer, Platform
+
+    platforms = [
+        Platform('A', source_a, powermeter_a, channel=1, pulse=pulse),
+        Platform('B', source_b, powermeter_b, channel=2, pulse=pulse),
+    ]
+    engine = Multiplexer(platforms, scanner=bridge, settle=0.05)
+    traces = engine.start()
+    timestamp, power, temperature = traces['A']
+    print(engine.statistics())
+
+The bridge needs some time to settle after every channel switch. The heater
+of the selected platform is updated and read during this time, so a
+platform costs the settling time plus the temperature read instead of the
+sum of all reads.
+
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import sys
+if sys.version_info[0] < 3:
+    from future.builtins import *
+
+from heatcapacity.buffer import SampleBuffer
+from heatcapacity.measure import Scheduler, SystemClock
+
+
+class Platform(object):
+    """A logical measurement of a :class:`Multiplexer`.
+
+    :param name: A unique name, the key of the trace.
+    :param currentsource: An object implementing the
+        :class:`~heatcapacity.measure.CurrentSource` interface.
+    :param powermeter: An object implementing the
+        :class:`~heatcapacity.measure.Powermeter` interface.
+    :param channel: The scanner channel of the platform thermometer.
+    :param pulse: A sequence of current values, one per scan cycle.
+
+    As with a :class:`~heatcapacity.measure.Measurement`, every sample is
+    passed to the :attr:`writer` if set and only the last
+    :attr:`Multiplexer.tail` samples are kept in memory.
+
+    """
+    def __init__(self, name, currentsource, powermeter, channel, pulse):
+        self.name = name
+        self.currentsource = currentsource
+        self.powermeter = powermeter
+        self.channel = channel
+        self.pulse = pulse
+        self.writer = None
+
+
+class Multiplexer(object):
+    """Schedules several platform measurements over a shared thermometer.
+
+    Each scan cycle visits every platform once, in the given order. A visit
+    switches the scanner to the platform channel, steps the heater current
+    to the next pulse value, reads the heater current and voltage and, once
+    the bridge settled, the temperature. A platform therefore gets one
+    sample per cycle and its sampling time is the cycle period. Platforms
+    whose pulse is finished are dropped from the cycle.
+
+    .. note::
+
+        Dropping a platform changes the timing of the remaining ones. Without
+        a fixed `sampling` the cycle period shortens, and in any case the
+        platforms visited after the dropped one move to an earlier slot of
+        the cycle. The traces of the longer pulses are therefore only
+        uniformly sampled until the shortest pulse finished. Give all
+        platforms pulses of equal length, e.g. padded with the final current,
+        if uniformly sampled traces are needed, e.g. for
+        :meth:`~heatcapacity.fit.FirstOrder.fit_arx`.
+
+    :param platforms: A sequence of :class:`Platform` instances.
+    :param scanner: An object implementing the
+        :class:`~heatcapacity.measure.Scanner` interface.
+    :param thermometer: An object implementing the
+        :class:`~heatcapacity.measure.Thermometer` interface, reading the
+        selected channel. Defaults to the scanner, e.g. a bridge with a
+        built-in scanner.
+    :param settle: The settling time of the bridge after a channel switch in
+        seconds.
+    :param sampling: The cycle period. If `None`, the next cycle starts as
+        soon as the previous one finished, which maximises the samples per
+        second.
+    :param interleave: If `True`, the heater is updated and read while the
+        bridge settles. Otherwise the heater is handled after the bridge
+        settled, e.g. if switching the heater disturbs the bridge.
+
+    The :attr:`clock` defaults to the
+    :class:`~heatcapacity.measure.SystemClock` and can be replaced, e.g. by a
+    :class:`~heatcapacity.simulation.VirtualClock`.
+
+    """
+    def __init__(self, platforms, scanner, thermometer=None, settle=0.,
+                 sampling=None, interleave=True):
+        names = [platform.name for platform in platforms]
+        if len(set(names)) != len(names):
+            raise ValueError('Platform names must be unique.')
+        self.platforms = list(platforms)
+        self.scanner = scanner
+        self.thermometer = scanner if thermometer is None else thermometer
+        self.settle = settle
+        self.sampling = sampling
+        self.interleave = interleave
+        self.clock = SystemClock()
+        #: The number of samples per platform kept in memory while its
+        #: writer is set.
+        self.tail = 2**16
+        #: The :class:`~heatcapacity.measure.Scheduler` of the last run, if
+        #: it was paced.
+        self.scheduler = None
+        #: The number of scan cycles of the last run.
+        self.cycles = 0
+        #: The number of samples of the last run.
+        self.samples = 0
+        #: The number of channel switches of the last run.
+        self.switches = 0
+        #: The duration of the last run in seconds.
+        self.duration = 0.
+
+    def start(self):
+        """Starts the measurement of all platforms.
+
+        :returns: A dictionary mapping the platform names to tuples of arrays
+            `(timestamp, power, temperature)`.
+
+        """
+        data = dict((platform.name, SampleBuffer(
+            len(platform.pulse), maxlen=None if platform.writer is None else self.tail))
+            for platform in self.platforms)
+        self.cycles = self.samples = self.switches = 0
+        self._channel = None
+        self.scheduler = None
+        if self.sampling is not None:
+            self.scheduler = Scheduler(self.sampling, clock=self.clock)
+
+        start = self.clock.monotonic()
+        active = [platform for platform in self.platforms if len(platform.pulse)]
+        while active:
+            if self.scheduler is None:
+                self._cycle(active, data)
+            else:
+                with self.scheduler:
+                    self._cycle(active, data)
+            self.cycles += 1
+            active = [platform for platform in active if self.cycles < len(platform.pulse)]
+        self.duration = self.clock.monotonic() - start
+
+        traces = {}
+        for platform in self.platforms:
+            if platform.writer is not None:
+                platform.writer.flush()
+            traces[platform.name] = data[platform.name].columns()
+        return traces
+
+    def statistics(self):
+        """Returns the throughput statistics of the last run as dictionary."""
+        return {
+            'cycles': self.cycles,
+            'samples': self.samples,
+            'switches': self.switches,
+            'duration': self.duration,
+            'samples_per_second': self.samples / self.duration if self.duration else 0.,
+        }
+
+    def _cycle(self, platforms, data):
+        """Visits every platform once."""
+        for platform in platforms:
+            sample = self._visit(platform, platform.pulse[self.cycles])
+            data[platform.name].append(sample)
+            if platform.writer is not None:
+                platform.writer.append(sample)
+            self.samples += 1
+
+    def _visit(self, platform, current):
+        """Measures one sample of a platform."""
+        clock = self.clock
+        switched = None
+        if platform.channel != self._channel:
+            self.scanner.channel = self._channel = platform.channel
+            switched = clock.monotonic()
+            self.switches += 1
+        if self.interleave:
+            power = self._heat(platform, current)
+        if switched is not None:
+            remaining = self.settle - (clock.monotonic() - switched)
+            if remaining > 0:
+                clock.sleep(remaining)
+        if not self.interleave:
+            power = self._heat(platform, current)
+
+        timestamp = clock.time()
+        start = clock.monotonic()
+        temperature = self.thermometer.temperature
+        latency = clock.monotonic() - start
+        return timestamp + 0.5 * latency, power, temperature
+
+    def _heat(self, platform, current):
+        """Steps the heater current and returns the measured power."""
+        platform.currentsource.current = current
+        return platform.currentsource.current * platform.powermeter.voltage
@@ -0,0 +1,186 @@
+#  -*- coding: utf-8 -*-
+"""Chunked and resumable processing of temperature sweeps.
+
+A sweep is a stream of heat pulses, e.g. read lazily from an archive of
+trace files or cut from one long memory mapped trace. Every pulse is fitted
+and the results are appended to a compact columnar table on disk, e.g.::
+
+    from heatcapacity.pipeline import iter_pulses, load_sweep, sweep
+    from heatcapacity.storage import load_trace
+
+    timestamp, power, temperature = load_trace('run.npy')
+    sweep(iter_pulses(timestamp, temperature, power), 'sweep.npy')
+    curve = load_sweep('sweep.npy')
+    print(curve['temperature'], curve['heat_capacity'])
+
+The table doubles as checkpoint. Running the same sweep again skips the
+pulses already in the table, so an interrupted run resumes without
+refitting. Pulses are processed in chunks, the memory used does not depend
+on the size of the archive.
+
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import sys
+if sys.version_info[0] < 3:
+    from future.builtins import *
+import functools
+import itertools
+
+import numpy as np
+
+from heatcapacity.fit import FirstOrder
+from heatcapacity.segment import fit_window, heater_state
+from heatcapacity.storage import TraceWriter, load_trace
+
+#: The columns of the sweep table.
+COLUMNS = ('pulse', 'temperature', 'heat_capacity', 'thermal_conductivity', 'residual')
+
+
+def iter_traces(paths):
+    """Lazily loads one pulse per trace file.
+
+    :param paths: An iterable of paths of files written by a
+        :class:`~heatcapacity.storage.TraceWriter`.
+    :returns: A generator of memory mapped `(timestamp, temperature, power)`
+        tuples.
+
+    """
+    for path in paths:
+        timestamp, power, temperature = load_trace(path)
+        yield timestamp, temperature, power
+
+
+def iter_pulses(t, y, u, threshold=None, blocksize=2**20, hysteresis=0., min_samples=1):
+    """Cuts a long trace into pulses while streaming through it.
+
+    The windows are the same as the ones of
+    :func:`~heatcapacity.segment.segment` with the same threshold,
+    hysteresis and minimal pulse length, but the heater power is scanned in blocks, so memory mapped
+    traces of any length can be processed. Without a `threshold`, an
+    additional pass over the power finds its range first.
+
+    :param t: A sequence of timestamps.
+    :param y: A sequence of temperatures.
+    :param u: A sequence of heater power values.
+    :param threshold: The power threshold, defaults to the mean of the
+        minimal and maximal power.
+    :param blocksize: The number of samples scanned at once.
+    :param hysteresis: The hysteresis of the threshold, see
+        :func:`~heatcapacity.segment.find_edges`.
+    :param min_samples: The minimal pulse length, see
+        :func:`~heatcapacity.segment.find_edges`. A pulse is yielded once the
+        heater switched off again.
+    :returns: A generator of `(t, y, u)` views, one per pulse.
+
+    """
+    blocks = range(0, len(u), blocksize)
+    if threshold is None:
+        low = min(np.min(u[i:i + blocksize]) for i in blocks)
+        high = max(np.max(u[i:i + blocksize]) for i in blocks)
+        threshold = 0.5 * (low + high)
+    # The start of the current window and the rising edge of the current
+    # pulse, which starts the next window if the pulse is long enough.
+    start, rising, previous = None, None, None
+    for i in blocks:
+        on = heater_state(np.asarray(u[i:i + blocksize]), threshold, hysteresis, previous)
+        edges = np.flatnonzero(on[1:] != on[:-1]) + 1
+        if previous is not None and on[0] != previous:
+            edges = np.r_[0, edges]
+        previous = on[-1]
+        for edge, switched_on in zip((edges + i).tolist(), on[edges].tolist()):
+            if switched_on:
+                rising = edge
+                continue
+            if rising is not None and edge - rising >= min_samples:
+                if start is not None:
+                    yield t[start:rising], y[start:rising], u[start:rising]
+                start = rising
+            rising = None
+    if rising is not None and len(u) - rising >= min_samples:
+        if start is not None:
+            yield t[start:rising], y[start:rising], u[start:rising]
+        start = rising
+    if start is not None:
+        yield t[start:], y[start:], u[start:]
+
+
+def fit_pulses(pulses, fit=None, chunksize=256, workers=1):
+    """Fits a stream of pulses chunk by chunk.
+
+    :param pulses: An iterable of `(t, y, u)` traces, one per pulse.
+    :param fit: A picklable callable `fit(t, y, u)` returning a
+        :class:`~heatcapacity.fit.FirstOrder` model, e.g.
+        :meth:`FirstOrder.fit <heatcapacity.fit.FirstOrder.fit>`. Defaults
+        to :meth:`~heatcapacity.fit.FirstOrder.fit_integral` with a fitted
+        bath temperature, see :func:`~heatcapacity.segment.fit_segments`.
+    :param chunksize: The number of pulses fitted at once.
+    :param workers: The number of worker processes. `None` uses one process
+        per cpu, `1` fits all pulses in the calling process.
+    :returns: A generator of 2-D arrays with one row
+        `(temperature, heat_capacity, thermal_conductivity, residual)` per
+        pulse, one array per chunk.
+
+    """
+    if fit is None:
+        fit = functools.partial(FirstOrder.fit_integral, offset=True)
+    pulses = iter(pulses)
+    executor = None
+    if workers != 1:
+        from concurrent import futures
+        executor = futures.ProcessPoolExecutor(workers)
+    try:
+        while True:
+            chunk = list(itertools.islice(pulses, chunksize))
+            if not chunk:
+                break
+            fits = [fit] * len(chunk)
+            if executor is None:
+                rows = list(map(fit_window, fits, chunk))
+            else:
+                rows = list(executor.map(fit_window, fits, chunk))
+            yield np.array(rows, dtype=float).reshape(-1, 4)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def sweep(pulses, path, fit=None, chunksize=256, workers=1, resume=True):
+    """Fits a stream of pulses and appends the results to a table.
+
+    :param pulses: An iterable of `(t, y, u)` traces, one per pulse. When
+        resuming, it must yield the same pulses in the same order as before.
+    :param path: The path of the table, a `.npy` file with the
+        :data:`COLUMNS`. It is flushed after every chunk.
+    :param fit: The fit function, see :func:`fit_pulses`.
+    :param chunksize: The number of pulses fitted at once.
+    :param workers: The number of worker processes, see :func:`fit_pulses`.
+    :param resume: If `True`, pulses already in an existing table are
+        skipped. Otherwise the table is overwritten.
+    :returns: The number of pulses fitted by this call.
+
+    """
+    with TraceWriter(path, columns=COLUMNS, chunksize=chunksize,
+                     flush_interval=float('inf'), append=resume) as writer:
+        done = writer.rows
+        # The pulses already in the table are skipped without fitting.
+        pulses = itertools.islice(pulses, done, None)
+        for rows in fit_pulses(pulses, fit, chunksize, workers):
+            index = np.arange(writer.rows, writer.rows + len(rows))
+            for row in np.column_stack((index, rows)):
+                writer.append(row)
+            writer.flush()
+        return writer.rows - done
+
+
+def load_sweep(path):
+    """Loads a sweep table as C(T) and K(T) curve.
+
+    :param path: The path of a table written by :func:`sweep`.
+    :returns: A dictionary of arrays, one per column in :data:`COLUMNS`,
+        sorted by temperature.
+
+    """
+    columns = load_trace(path, mmap=False)
+    order = np.argsort(columns[COLUMNS.index('temperature')], kind='stable')
+    return dict((name, column[order]) for name, column in zip(COLUMNS, columns))
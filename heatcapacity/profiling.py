@@ -0,0 +1,187 @@
+#  -*- coding: utf-8 -*-
+"""Opt-in timers and counters of the measurement and fitting hot paths.
+
+Profiling is disabled by default and costs a single attribute check per
+instrumented call. Once enabled, the instrumented code records
+
+* ``measure.<channel>``: the duration of each instrument read, e.g.
+  ``measure.temperature``,
+* ``scheduler.overrun``: the delay of each sampling period overrunning its
+  deadline, including periods paced by :func:`~heatcapacity.measure.sampling`,
+  and the counter ``scheduler.missed`` of the skipped deadlines,
+* ``adaptive_step.filter``: the stop policy update of
+  :class:`~heatcapacity.measure.AdaptiveStep` and its asynchronous variant,
+  by default the derivative filter,
+* ``fit.resample``, ``fit.derivative``, ``fit.spline`` and ``fit.lstsq``: the
+  stages of :meth:`~heatcapacity.fit.FirstOrder.fit`.
+
+E.g.::
+
+    from heatcapacity import profiling
+
+    profiling.enable()
+    profiling.add_hook(lambda kind, name, value: metrics.send(name, value))
+    measurement.start()
+    print(profiling.report())
+
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import sys
+if sys.version_info[0] < 3:
+    from future.builtins import *
+import contextlib
+import threading
+import time
+
+try:
+    #: The clock used by the timers.
+    monotonic = time.perf_counter
+except AttributeError:
+    # Python 2 lacks a monotonic clock.
+    monotonic = time.time
+
+#: `True` while profiling is enabled. Instrumented code checks this flag
+#: before taking any timestamps, e.g.::
+#:
+#:     start = profiling.monotonic() if profiling.enabled else None
+#:     value = instrument.temperature
+#:     if start is not None:
+#:         profiling.record('measure.temperature', profiling.monotonic() - start)
+enabled = False
+
+_lock = threading.Lock()
+_timers = {}
+_counters = {}
+_hooks = []
+
+
+def enable():
+    """Enables profiling."""
+    global enabled
+    enabled = True
+
+
+def disable():
+    """Disables profiling, the collected data is kept."""
+    global enabled
+    enabled = False
+
+
+def reset():
+    """Clears all timers and counters."""
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def add_hook(callback):
+    """Registers a callback receiving every event.
+
+    :param callback: A callable `callback(kind, name, value)`. `kind` is
+        either `'timer'` with the duration in seconds as `value` or
+        `'counter'` with the increment. It is called in the thread that
+        recorded the event and should return quickly.
+
+    """
+    _hooks.append(callback)
+
+
+def remove_hook(callback):
+    """Removes a callback registered with :func:`add_hook`."""
+    _hooks.remove(callback)
+
+
+def record(name, duration):
+    """Records the duration of a timed call.
+
+    :param name: The timer name.
+    :param duration: The duration in seconds.
+
+    """
+    with _lock:
+        stats = _timers.get(name)
+        if stats is None:
+            _timers[name] = [1, duration, duration, duration]
+        else:
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = min(stats[2], duration)
+            stats[3] = max(stats[3], duration)
+    for hook in _hooks:
+        hook('timer', name, duration)
+
+
+def count(name, increment=1):
+    """Increments a counter.
+
+    :param name: The counter name.
+    :param increment: The increment.
+
+    """
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + increment
+    for hook in _hooks:
+        hook('counter', name, increment)
+
+
+@contextlib.contextmanager
+def _timing(name):
+    start = monotonic()
+    try:
+        yield
+    finally:
+        record(name, monotonic() - start)
+
+
+@contextlib.contextmanager
+def _disabled():
+    yield
+
+
+def timer(name):
+    """Returns a context manager timing the enclosed block, e.g.::
+
+        with profiling.timer('fit.lstsq'):
+            result = linalg.lstsq(a, b)
+
+    Nothing is recorded while profiling is disabled.
+
+    :param name: The timer name.
+
+    """
+    return _timing(name) if enabled else _disabled()
+
+
+def summary():
+    """Returns the collected data as dictionary.
+
+    Every timer maps to a dictionary with the `count`, `total`, `mean`,
+    `min` and `max` duration in seconds, every counter to a dictionary with
+    its `count`. The result is a plain mapping, ready to be exported to a
+    metrics system.
+
+    """
+    with _lock:
+        result = dict((name, {'count': value}) for name, value in _counters.items())
+        for name, (calls, total, minimum, maximum) in _timers.items():
+            result[name] = {
+                'count': calls,
+                'total': total,
+                'mean': total / calls,
+                'min': minimum,
+                'max': maximum,
+            }
+    return result
+
+
+def report():
+    """Returns the :func:`summary` as a human readable table."""
+    lines = ['{:<28} {:>10} {:>12} {:>12} {:>12}'.format('name', 'count', 'total/s', 'mean/s', 'max/s')]
+    for name, stats in sorted(summary().items()):
+        if 'total' in stats:
+            lines.append('{:<28} {:>10} {:>12.6f} {:>12.6f} {:>12.6f}'.format(
+                name, stats['count'], stats['total'], stats['mean'], stats['max']))
+        else:
+            lines.append('{:<28} {:>10}'.format(name, stats['count']))
+    return '\n'.join(lines)
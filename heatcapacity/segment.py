@@ -0,0 +1,196 @@
+#  -*- coding: utf-8 -*-
+"""Segmentation of long multi-pulse traces.
+
+A continuous trace with many heat pulses, e.g. at stepped bath temperatures,
+is cut at the rising edges of the heater power and every pulse is fitted
+separately, e.g.::
+
+    from heatcapacity.segment import fit_segments
+
+    table = fit_segments(timestamp, temperature, power)
+    print(table['temperature'], table['heat_capacity'])
+
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import os
+import sys
+if sys.version_info[0] < 3:
+    from future.builtins import *
+import functools
+
+import numpy as np
+
+from heatcapacity.fit import FirstOrder
+
+#: The fields of the table returned by :func:`fit_segments`.
+FIELDS = [
+    ('start', np.intp),
+    ('stop', np.intp),
+    ('temperature', float),
+    ('heat_capacity', float),
+    ('thermal_conductivity', float),
+    ('residual', float),
+]
+
+
+def find_edges(power, threshold=None, hysteresis=0., min_samples=1):
+    """Finds the edges of the heater pulses.
+
+    :param power: A sequence of heater power values.
+    :param threshold: The power level separating heater on and off. Defaults
+        to the mean of the minimal and maximal power.
+    :param hysteresis: The width of a band around the threshold. The heater
+        is switched on above the band and off below it, power values within
+        the band keep the previous state. This suppresses spurious edges of
+        noisy power readings close to the threshold.
+    :param min_samples: Pulses shorter than `min_samples` samples, e.g.
+        glitches of the power reading, are ignored.
+    :returns: A tuple of index arrays `(rising, falling)`. Each index is the
+        first sample after the edge.
+
+    """
+    power = np.asarray(power)
+    if threshold is None:
+        threshold = 0.5 * (np.min(power) + np.max(power))
+    on = heater_state(power, threshold, hysteresis)
+    change = np.diff(on.astype(np.int8))
+    rising, falling = np.flatnonzero(change == 1) + 1, np.flatnonzero(change == -1) + 1
+    if min_samples > 1 and len(power):
+        starts = np.r_[0, rising] if on[0] else rising
+        stops = np.r_[falling, len(power)][:len(starts)]
+        short = stops - starts < min_samples
+        rising = np.setdiff1d(rising, starts[short])
+        falling = np.setdiff1d(falling, stops[short])
+    return rising, falling
+
+
+def heater_state(power, threshold, hysteresis=0., previous=None):
+    """Determines if the heater is on at every sample.
+
+    :param power: An array of heater power values.
+    :param threshold: The power threshold, see :func:`find_edges`.
+    :param hysteresis: The hysteresis of the threshold, see :func:`find_edges`.
+    :param previous: The state before the first sample, e.g. the last state
+        of the previous block of a long trace. Defaults to the state given by
+        the threshold alone.
+    :returns: A boolean array, `True` where the heater is on.
+
+    """
+    on = power > threshold + 0.5 * hysteresis
+    decided = on | (power <= threshold - 0.5 * hysteresis)
+    if not len(power) or not hysteresis:
+        return on
+    if previous is None:
+        previous = power[0] > threshold
+    # Samples within the band repeat the last decided state.
+    on, decided = np.r_[previous, on], np.r_[True, decided]
+    index = np.maximum.accumulate(np.where(decided, np.arange(len(on)), 0))
+    return on[index][1:]
+
+
+def segment(t, y, u, threshold=None, hysteresis=0., min_samples=1):
+    """Cuts a trace into pulse windows.
+
+    Each window starts at a rising edge of the heater power and ends before
+    the next one, so it contains the heating and the subsequent decay. Data
+    before the first rising edge is skipped.
+
+    :param t: A sequence of timestamps.
+    :param y: A sequence of temperatures.
+    :param u: A sequence of heater power values.
+    :param threshold: The power threshold, see :func:`find_edges`.
+    :param hysteresis: The hysteresis of the threshold, see :func:`find_edges`.
+    :param min_samples: The minimal pulse length, see :func:`find_edges`.
+    :returns: A list of `(start, stop)` index pairs.
+
+    """
+    rising, _ = find_edges(u, threshold, hysteresis, min_samples)
+    stops = np.r_[rising[1:], len(u)]
+    return list(zip(rising.tolist(), stops.tolist()))
+
+
+def fit_segments(t, y, u, threshold=None, fit=None, workers=None, hysteresis=0.,
+                 min_samples=1):
+    """Segments a trace and fits every pulse.
+
+    :param t: A sequence of timestamps.
+    :param y: A sequence of temperatures.
+    :param u: A sequence of heater power values.
+    :param threshold: The power threshold, see :func:`find_edges`.
+    :param fit: A picklable callable `fit(t, y, u)` returning a
+        :class:`~heatcapacity.fit.FirstOrder` model. Defaults to
+        :meth:`~heatcapacity.fit.FirstOrder.fit_integral` with a fitted bath
+        temperature, so each pulse may sit at its own bath temperature.
+    :param workers: The number of worker processes. `None` uses one process
+        per cpu, `1` fits all pulses in the calling process.
+    :param hysteresis: The hysteresis of the threshold, see :func:`find_edges`.
+    :param min_samples: The minimal pulse length, see :func:`find_edges`.
+    :returns: A structured array with the fields in :data:`FIELDS`, one row
+        per pulse. `temperature` is the mean temperature of the pulse and
+        `residual` the rms deviation from the model prediction. The model
+        fields of pulses that could not be fitted are `nan`, see
+        :func:`fit_window`.
+
+    """
+    t, y, u = (np.asarray(x, dtype=float) for x in (t, y, u))
+    if fit is None:
+        fit = functools.partial(FirstOrder.fit_integral, offset=True)
+    windows = segment(t, y, u, threshold, hysteresis, min_samples)
+    # Basic slicing, the windows are views into the trace.
+    traces = [(t[i:j], y[i:j], u[i:j]) for i, j in windows]
+
+    fits = [fit] * len(traces)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        rows = list(map(fit_window, fits, traces))
+    else:
+        from concurrent import futures
+        with futures.ProcessPoolExecutor(workers) as executor:
+            # Send the windows in batches to amortize the pickling overhead.
+            chunksize = max(1, len(traces) // (16 * workers))
+            rows = list(executor.map(fit_window, fits, traces, chunksize=chunksize))
+
+    table = np.empty(len(windows), dtype=FIELDS)
+    table['start'], table['stop'] = np.reshape(windows, (-1, 2)).T
+    columns = np.reshape(rows, (-1, 4)).T
+    for name, column in zip(('temperature', 'heat_capacity', 'thermal_conductivity', 'residual'), columns):
+        table[name] = column
+    return table
+
+
+def fit_window(fit, trace):
+    """Fits a single window.
+
+    A window that can not be fitted, e.g. a truncated pulse, does not abort
+    the whole trace. Its model values are `nan` instead.
+
+    :param fit: A callable `fit(t, y, u)` returning a
+        :class:`~heatcapacity.fit.FirstOrder` model.
+    :param trace: A `(t, y, u)` tuple.
+    :returns: A tuple `(temperature, heat_capacity, thermal_conductivity,
+        residual)`, see :func:`fit_segments`.
+
+    """
+    t, y, u = trace
+    try:
+        model = fit(t, y, u)
+        residual = _residual(model, t, y, u)
+    except (ValueError, ArithmeticError):
+        return np.mean(y), np.nan, np.nan, np.nan
+    return np.mean(y), model.heat_capacity, model.thermal_conductivity, residual
+
+
+def _residual(model, t, y, u):
+    """Computes the rms deviation of the model prediction.
+
+    The initial and the bath temperature enter the prediction linearly and are
+    fitted by least squares.
+
+    """
+    decay = np.exp(-model.thermal_conductivity / model.heat_capacity * (t - t[0]))
+    design = np.column_stack((decay, 1. - decay))
+    target = y - model.predict(t, u)
+    coefficients = np.linalg.lstsq(design, target, rcond=None)[0]
+    return np.sqrt(np.mean((target - design.dot(coefficients))**2))
@@ -1,12 +1,12 @@
 #  -*- coding: utf-8 -*-
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
-from future.builtins import *
-import time
+import sys
+if sys.version_info[0] < 3:
+    from future.builtins import *
 
 import numpy as np
 from scipy import signal
-import audiolazy
 
 
 class Simulation(object):
@@ -17,7 +17,13 @@ class Simulation(object):
     :param heater_resistance: A resistance in ohm used to calculate the voltage
         drop.
     :param sigma: The standart deviation of tjhe gaussian noise added to the simulated temperature
-    
+    :param seed: An optional seed of the noise generator. Simulations with the
+        same seed are reproducible.
+
+    The simulation can be used sample by sample as current source, powermeter
+    and thermometer, each temperature read advances the simulation by one
+    sampling step. Alternatively, :meth:`.simulate` computes the response to a
+    whole current sequence at once.
 
     E.g.::
 
@@ -40,31 +46,137 @@ class Simulation(object):
         measurement.start()
 
     """
-    def __init__(self, model, sampling, heater_resistance, sigma, ):
+    def __init__(self, model, sampling, heater_resistance, sigma, seed=None):
         self.heater_resistance = heater_resistance
-        
-        self.power = audiolazy.ControlStream(0.)
-        self.current = 0.
-        
+        self.sigma = sigma
+        self._random = np.random.RandomState(seed)
+
         # convert model to discrete representation
         num, den, dt = signal.cont2discrete((model.num, model.den), sampling)
-        model = audiolazy.ZFilter(list(num.flatten()), list(den.flatten()))
-        self.model = model(self.power) + audiolazy.gauss_noise(sigma=sigma)
+        self._num, self._den = num.flatten(), den.flatten()
+        self._state = np.zeros(max(len(self._num), len(self._den)) - 1)
+        self.current = 0.
 
     @property
     def current(self):
         return self._current
-    
+
     @current.setter
     def current(self, value):
         self._current = value
-        self.power.value = self.voltage * self.current
-        
+
     @property
     def voltage(self):
         return self.heater_resistance * self.current
 
+    @property
+    def power(self):
+        return self.voltage * self.current
+
     @property
     def temperature(self):
         """Simulates the temperature response to the current change."""
-        return self.model.take()
\ No newline at end of file
+        temperature, self._state = signal.lfilter(
+            self._num, self._den, [self.power], zi=self._state)
+        return temperature[0] + self._random.normal(scale=self.sigma)
+
+    def simulate(self, current):
+        """Simulates the response to a current sequence in bulk.
+
+        This is equivalent to setting each current and reading the
+        temperature once, but runs in a single vectorized pass. The
+        simulation state is carried over, so bulk and sample by sample
+        simulation can be mixed.
+
+        :param current: A sequence of current values, one per sampling step.
+        :returns: A tuple of arrays `(power, temperature)`.
+
+        """
+        current = np.asarray(current, dtype=float)
+        power = self.heater_resistance * current**2
+        temperature, self._state = signal.lfilter(
+            self._num, self._den, power, zi=self._state)
+        temperature += self._random.normal(scale=self.sigma, size=len(power))
+        if len(current):
+            self.current = current[-1]
+        return power, temperature
+
+
+class SimulatedScanner(object):
+    """A scanner switching one simulated bridge between several thermometers.
+
+    It implements the :class:`~heatcapacity.measure.Scanner` and
+    :class:`~heatcapacity.measure.Thermometer` interfaces, reading the
+    temperature returns the one of the selected channel, e.g.::
+
+        first, second = Simulation(model, 0.1, 1e3, 1e-3), Simulation(model, 0.1, 1e3, 1e-3)
+        clock = VirtualClock()
+        scanner = SimulatedScanner({1: first, 2: second}, settle=0.03, clock=clock)
+
+    :param thermometers: A mapping of channels to thermometers, e.g.
+        :class:`Simulation` instances.
+    :param settle: The time in seconds the bridge needs to settle after a
+        channel switch. Earlier reads are counted in :attr:`early_reads`.
+    :param clock: The clock used to track the settling, e.g. a
+        :class:`VirtualClock` shared with the measurement.
+
+    """
+    def __init__(self, thermometers, settle=0., clock=None):
+        self.thermometers = thermometers
+        self.settle = settle
+        self.clock = VirtualClock() if clock is None else clock
+        #: The number of temperature reads before the bridge settled.
+        self.early_reads = 0
+        #: The number of channel switches.
+        self.switches = 0
+        self._channel = None
+        self._switched = None
+
+    @property
+    def channel(self):
+        return self._channel
+
+    @channel.setter
+    def channel(self, value):
+        if value not in self.thermometers:
+            raise ValueError('Unknown channel {!r}.'.format(value))
+        self._channel = value
+        self._switched = self.clock.monotonic()
+        self.switches += 1
+
+    @property
+    def temperature(self):
+        if self._channel is None:
+            raise ValueError('No channel selected.')
+        # The tolerance absorbs rounding errors of the clock arithmetic.
+        if self.clock.monotonic() - self._switched < self.settle - 1e-9:
+            self.early_reads += 1
+        return self.thermometers[self._channel].temperature
+
+
+class VirtualClock(object):
+    """A clock that advances only while sleeping.
+
+    Replacing the :attr:`~heatcapacity.measure.Measurement.clock` of a
+    measurement driven by a :class:`Simulation` with a virtual clock runs it
+    as fast as possible, while timestamps and durations behave as in real
+    time, e.g.::
+
+        measurement = hc.PulseMeasurement(sim, sim, sim, pulse, sampling_time)
+        measurement.clock = VirtualClock()
+        timestamp, power, temperature = measurement.start()
+
+    :param start: The initial time in seconds.
+
+    """
+    def __init__(self, start=0.):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0.)
@@ -0,0 +1,192 @@
+#  -*- coding: utf-8 -*-
+"""Streaming persistence of raw measurement traces.
+
+Samples are appended to a `.npy` file with a structured dtype while the
+measurement is running, e.g.::
+
+    with TraceWriter('run.npy') as writer:
+        measurement.writer = writer
+        measurement.start()
+
+    timestamp, power, temperature = load_trace('run.npy')
+    model = FirstOrder.fit(timestamp, temperature, power)
+
+The file is a valid `.npy` file after every flush, so it can also be opened
+with :func:`numpy.load`. :func:`load_trace` memory maps it and tolerates
+files of interrupted runs.
+
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import sys
+if sys.version_info[0] < 3:
+    from future.builtins import *
+import os
+import struct
+
+import numpy as np
+
+from heatcapacity.measure import SystemClock
+
+#: The default column names.
+COLUMNS = ('timestamp', 'power', 'temperature')
+
+_MAGIC = b'\x93NUMPY\x01\x00'
+
+
+def _dtype(columns):
+    return np.dtype([(str(name), '<f8') for name in columns])
+
+
+def _header(dtype, rows):
+    """Creates a `.npy` version 1.0 header of fixed size.
+
+    The size does not depend on the number of rows, so the header can be
+    rewritten in place as the file grows.
+
+    """
+    template = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }"
+    descr = np.lib.format.dtype_to_descr(dtype)
+    header = template % (descr, rows)
+    # Reserve space for the largest row count, measured from the empty
+    # header, and align to 64 bytes.
+    size = len(_MAGIC) + 2 + len(template % (descr, 0)) + 20 + 1
+    size = 64 * (size // 64 + 1)
+    header = header.ljust(size - len(_MAGIC) - 2 - 1) + '\n'
+    return _MAGIC + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+class TraceWriter(object):
+    """Appends samples to a `.npy` file in chunks.
+
+    Samples are collected in a preallocated chunk, which is written to disk
+    when it is full or when the oldest unwritten sample is older than
+    `flush_interval`. This bounds both the write overhead per sample and the
+    data lost in a crash.
+
+    .. note::
+
+        The flush runs in the thread calling :meth:`append`, i.e. in the
+        sampling loop of a measurement. It blocks for the duration of one
+        chunk write, and of the sync if `fsync` is `True`. Keep the chunks
+        small enough for this to fit into the sampling time.
+
+    :param path: The file path. An existing file is overwritten.
+    :param columns: The column names.
+    :param chunksize: The number of samples per chunk.
+    :param flush_interval: The maximum time in seconds a sample is kept in
+        memory before it is written.
+    :param fsync: If `True`, every flush is synced to the storage device.
+    :param clock: The clock used for the flush interval, defaults to the
+        :class:`~heatcapacity.measure.SystemClock`.
+    :param append: If `True`, samples are appended to an existing file written
+        by a :class:`TraceWriter` with the same columns, e.g. to resume an
+        interrupted run. An incomplete last sample is discarded.
+
+    """
+    def __init__(self, path, columns=COLUMNS, chunksize=1024, flush_interval=1.,
+                 fsync=False, clock=None, append=False):
+        self.path = path
+        self.dtype = _dtype(columns)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.clock = SystemClock() if clock is None else clock
+        #: The number of samples written to disk.
+        self.rows = 0
+        self._chunk = np.empty(chunksize, dtype=self.dtype)
+        self._view = self._chunk.view('<f8').reshape(chunksize, len(columns))
+        self._size = 0
+        self._oldest = None
+        if append and os.path.exists(path) and os.path.getsize(path):
+            self._file = open(path, 'r+b')
+            self._resume()
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(_header(self.dtype, 0))
+
+    def _resume(self):
+        """Positions the writer at the end of the last complete sample."""
+        try:
+            np.lib.format.read_magic(self._file)
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(self._file)
+        except ValueError:
+            self._file.close()
+            raise
+        offset = self._file.tell()
+        if dtype != self.dtype or offset != len(_header(self.dtype, 0)):
+            self._file.close()
+            raise ValueError('{} was not written with the same columns.'.format(self.path))
+        self.rows = (os.fstat(self._file.fileno()).st_size - offset) // self.dtype.itemsize
+        self._file.truncate(offset + self.rows * self.dtype.itemsize)
+        self._file.seek(0)
+        self._file.write(_header(self.dtype, self.rows))
+        self._file.seek(0, os.SEEK_END)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.rows + self._size
+
+    def append(self, sample):
+        """Appends a single sample.
+
+        :param sample: A sequence with one value per column.
+
+        """
+        if self._size == 0:
+            self._oldest = self.clock.monotonic()
+        self._view[self._size] = sample
+        self._size += 1
+        if self._size == len(self._chunk) or \
+                self.clock.monotonic() - self._oldest >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Writes the pending samples to disk."""
+        if self._size:
+            self._file.write(self._chunk[:self._size].tobytes())
+            self.rows += self._size
+            self._size = 0
+            # Keep the header consistent, so the file is always valid.
+            self._file.seek(0)
+            self._file.write(_header(self.dtype, self.rows))
+            self._file.seek(0, os.SEEK_END)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        """Flushes the pending samples and closes the file."""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def load_trace(path, mmap=True):
+    """Loads a trace written by a :class:`TraceWriter`.
+
+    The number of samples is derived from the file size, so files of
+    interrupted runs can be read up to the last complete sample.
+
+    :param path: The file path.
+    :param mmap: If `True`, the file is memory mapped instead of read into
+        memory.
+    :returns: A tuple with one array view per column.
+
+    """
+    with open(path, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        if version != (1, 0):
+            raise ValueError('Unsupported file format version {}.'.format(version))
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        offset = f.tell()
+        rows = (os.fstat(f.fileno()).st_size - offset) // dtype.itemsize
+        if mmap:
+            data = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(rows,)) if rows else np.empty(0, dtype)
+        else:
+            data = np.fromfile(f, dtype=dtype, count=rows)
+    return tuple(data[name] for name in dtype.names)
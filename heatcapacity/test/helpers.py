@@ -0,0 +1,52 @@
+"""Shared helpers of the test suite."""
+import numpy as np
+
+from heatcapacity.fit import FirstOrder
+from heatcapacity.measure import DerivativeThreshold, StopPolicy
+from heatcapacity.simulation import Simulation
+
+
+def simulation(c=0.004, k=0.002, sigma=0., seed=None):
+    """Simulates a first order platform sampled every 0.1 s."""
+    return Simulation(FirstOrder.from_ck(c, k), sampling=0.1,
+                      heater_resistance=1e3, sigma=sigma, seed=seed)
+
+
+def pulse_train(models, baths, sampling=0.1, length=400):
+    """Simulates consecutive pulses, each at its own bath temperature."""
+    t = sampling * np.arange(len(models) * length)
+    u = np.tile(np.r_[np.full(length // 2, 1e-3), np.zeros(length // 2)], len(models))
+    y = np.empty_like(t)
+    for i, (model, bath) in enumerate(zip(models, baths)):
+        window = slice(i * length, (i + 1) * length)
+        y[window] = bath + model.predict(t[window], u[window])
+    # A short lead-in, so the first pulse has a rising edge.
+    lead = sampling * np.arange(-10, 0)
+    return np.r_[lead, t], np.r_[np.full(10, baths[0]), y], np.r_[np.zeros(10), u]
+
+
+class SlowPowermeter(object):
+    """A powermeter where every read takes some virtual time."""
+    def __init__(self, instrument, clock, latency):
+        self.instrument = instrument
+        self.clock = clock
+        self.latency = latency
+
+    @property
+    def voltage(self):
+        self.clock.sleep(self.latency)
+        return self.instrument.voltage
+
+
+class FailingPolicy(DerivativeThreshold):
+    """A policy failing after some heating samples."""
+    def update(self, phase, timestamp, power, temperature):
+        if phase == 'heating' and len(self.derivative) > 60:
+            raise RuntimeError('Analysis failed.')
+        return super(FailingPolicy, self).update(phase, timestamp, power, temperature)
+
+
+class NeverPolicy(StopPolicy):
+    """A policy never ending a phase."""
+    def update(self, phase, timestamp, power, temperature):
+        return False
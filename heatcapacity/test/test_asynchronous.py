@@ -0,0 +1,125 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from heatcapacity.asynchronous import AsyncAdaptiveStep, AsyncPulseMeasurement, BlockingInstrument
+from heatcapacity.fit import FirstOrder
+from heatcapacity.measure import Equilibrium
+from heatcapacity.simulation import VirtualClock
+from heatcapacity.test.helpers import FailingPolicy, NeverPolicy, simulation
+
+
+class TestAsyncPulseMeasurement(object):
+    def test_start(self):
+        pulse = [0.] * 10 + [1e-3] * 100 + [0.] * 100
+        parameters = [(0.004, 0.002), (0.006, 0.001)]
+        measurements = []
+        for c, k in parameters:
+            sim = simulation(c, k)
+            measurement = AsyncPulseMeasurement(sim, sim, sim, pulse, sampling_time=0.1)
+            measurement.clock = VirtualClock()
+            measurements.append(measurement)
+
+        async def main():
+            queue = asyncio.Queue()
+            results = await asyncio.gather(
+                measurements[0].start(queue=queue),
+                measurements[1].start(),
+            )
+            samples = []
+            while True:
+                sample = await queue.get()
+                if sample is None:
+                    break
+                samples.append(sample)
+            return results, samples
+
+        results, samples = asyncio.run(main())
+        assert list(zip(*results[0])) == samples
+        for (c, k), (timestamp, power, temperature) in zip(parameters, results):
+            np.testing.assert_allclose(timestamp, np.arange(len(pulse)) * 0.1, atol=1e-9)
+            model = FirstOrder.fit_integral(timestamp, temperature, power)
+            assert model.heat_capacity == pytest.approx(c, rel=1e-3)
+            assert model.thermal_conductivity == pytest.approx(k, rel=1e-3)
+
+
+class TestAsyncAdaptiveStep(object):
+    def test_start(self):
+        sim = simulation()
+        measurement = AsyncAdaptiveStep(sim, sim, sim, duration=5., max_current=1e-3, sampling=0.1)
+        measurement.clock = VirtualClock()
+        timestamp, power, temperature = asyncio.run(measurement.start())
+
+        model = FirstOrder.fit_integral(timestamp, temperature, power)
+        assert model.heat_capacity == pytest.approx(0.004, rel=1e-3)
+        assert model.thermal_conductivity == pytest.approx(0.002, rel=1e-3)
+
+    def test_policy(self):
+        sim = simulation()
+        measurement = AsyncAdaptiveStep(sim, sim, sim, duration=5., max_current=1e-3,
+                                        sampling=0.1, policy=Equilibrium(multiple=5., tau=2.))
+        measurement.clock = VirtualClock()
+        timestamp, power, temperature = asyncio.run(measurement.start())
+        assert not hasattr(measurement, 'window')
+        assert np.count_nonzero(power) == 100
+
+    def test_max_duration(self):
+        sim = simulation()
+        measurement = AsyncAdaptiveStep(sim, sim, sim, duration=5., max_current=1e-3,
+                                        sampling=0.1, policy=NeverPolicy(), max_duration=3.)
+        measurement.clock = VirtualClock()
+        with pytest.warns(RuntimeWarning):
+            timestamp, power, temperature = asyncio.run(measurement.start())
+        assert measurement.timeouts == ['heating', 'decay']
+        assert np.count_nonzero(power) == pytest.approx(30, abs=1)
+
+    def test_heater_off(self):
+        sim = simulation()
+        measurement = AsyncAdaptiveStep(sim, sim, sim, duration=5., max_current=1e-3,
+                                        sampling=0.1, policy=FailingPolicy())
+        measurement.clock = VirtualClock()
+
+        async def main():
+            queue = asyncio.Queue()
+            with pytest.raises(RuntimeError):
+                await measurement.start(queue=queue)
+            samples = []
+            while True:
+                sample = await queue.get()
+                if sample is None:
+                    return samples
+                samples.append(sample)
+
+        samples = asyncio.run(main())
+        assert len(samples) > 60
+        assert sim.current == 0.
+
+
+class TestBlockingInstrument(object):
+    def test_shared_executor(self):
+        sim = simulation()
+        measurement = AsyncPulseMeasurement(sim, sim, sim, [1e-3] * 10, sampling_time=0.1)
+        measurement.clock = VirtualClock()
+        # One instrument in three roles is accessed by a single thread.
+        assert measurement.currentsource.executor is measurement.powermeter.executor
+        assert measurement.powermeter.executor is measurement.thermometer.executor
+        other = BlockingInstrument(simulation())
+        assert other.executor is not measurement.thermometer.executor
+        other.close()
+
+        with measurement:
+            asyncio.run(measurement.start())
+        executor = measurement.thermometer.executor
+        with pytest.raises(RuntimeError):
+            executor.submit(int)
+
+    def test_close(self):
+        sim = simulation()
+        with BlockingInstrument(sim) as first:
+            with BlockingInstrument(sim) as second:
+                assert first.executor is second.executor
+            # Still used by the first adapter.
+            assert first.executor.submit(int).result() == 0
+        with pytest.raises(RuntimeError):
+            first.executor.submit(int)
@@ -0,0 +1,35 @@
+import numpy as np
+
+from heatcapacity.buffer import SampleBuffer
+
+
+class TestSampleBuffer(object):
+    def test_append(self):
+        buffer = SampleBuffer(capacity=2)
+        samples = np.arange(30.).reshape(10, 3)
+        for sample in samples[:5]:
+            buffer.append(sample)
+        buffer.extend(samples[5:])
+
+        assert len(buffer) == 10
+        assert buffer.capacity >= 10
+        timestamp, power, temperature = buffer.columns()
+        np.testing.assert_array_equal(np.column_stack(buffer.columns()), samples)
+        # The columns are views into the buffer.
+        assert np.shares_memory(timestamp, buffer._data)
+
+        buffer.clear()
+        assert len(buffer) == 0
+        assert all(len(column) == 0 for column in buffer.columns())
+
+    def test_maxlen(self):
+        buffer = SampleBuffer(capacity=2, maxlen=4)
+        samples = np.arange(60.).reshape(20, 3)
+        for sample in samples[:9]:
+            buffer.append(sample)
+        buffer.extend(samples[9:15])
+        buffer.extend(samples[15:])
+
+        assert len(buffer) == 4
+        assert buffer.capacity <= 8
+        np.testing.assert_array_equal(np.column_stack(buffer.columns()), samples[-4:])
@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+
+from heatcapacity import cache as cache_module
+
+from heatcapacity.cache import FitCache, fingerprint
+from heatcapacity.fit import FirstOrder
+
+
+def trace(scale=1.):
+    t = np.linspace(0., 30., 301)
+    u = np.where(t >= 5., 1e-3, 0.)
+    y = scale * np.where(t >= 5., 0.5 * (1. - np.exp(-0.5 * (t - 5.))), 0.)
+    return t, y, u
+
+
+class TestFingerprint(object):
+    def test_fingerprint(self):
+        t, y, u = trace()
+        key = fingerprint(FirstOrder.fit, (t, y, u), {})
+        assert key == fingerprint(FirstOrder.fit, (t.copy(), list(y), u), {})
+        assert key != fingerprint(FirstOrder.fit, (t, y * 2., u), {})
+        assert key != fingerprint(FirstOrder.fit, (t, y, u), {'derivative': 'savgol'})
+        assert key != fingerprint(FirstOrder.fit_integral, (t, y, u), {})
+
+    def test_version(self, monkeypatch):
+        t, y, u = trace()
+        key = fingerprint(FirstOrder.fit, (t, y, u), {})
+        monkeypatch.setattr(cache_module, 'VERSION', cache_module.VERSION + 1)
+        assert key != fingerprint(FirstOrder.fit, (t, y, u), {})
+
+
+class TestFitCache(object):
+    def test_memory(self):
+        cache = FitCache(maxsize=2)
+        fit = cache(FirstOrder.fit_integral)
+        model = fit(*trace())
+        assert fit(*trace()) is model
+        fit(*trace(2.))
+        fit(*trace(3.))
+        # The least recently used result was evicted.
+        fit(*trace())
+        assert cache.statistics()['hits'] == 1
+        assert cache.statistics()['misses'] == 4
+        assert len(cache) == 2
+
+    def test_disk(self, tmpdir):
+        directory = str(tmpdir)
+        fit = FitCache(directory=directory)(FirstOrder.fit_integral)
+        model = fit(*trace())
+
+        # A new cache, e.g. in another process, finds the result on disk.
+        cache = FitCache(directory=directory)
+        cached = cache.fit(FirstOrder.fit_integral, *trace())
+        assert cached.heat_capacity == model.heat_capacity
+        assert cache.statistics()['disk_hits'] == 1
+
+        size = cache.statistics()['disk_bytes']
+        cache = FitCache(directory=directory, max_bytes=int(2.5 * size))
+        for scale in (2., 3., 4.):
+            cache.fit(FirstOrder.fit_integral, *trace(scale))
+        assert cache.statistics()['disk_bytes'] <= cache.max_bytes
+        assert len(os.listdir(directory)) == 2
+
+        cache.clear()
+        assert not os.listdir(directory)
+
+    def test_replace(self, tmpdir):
+        cache = FitCache(directory=str(tmpdir))
+        model = FirstOrder.fit_integral(*trace())
+        key = fingerprint(FirstOrder.fit_integral, trace(), {})
+        # Concurrent stores of the same key replace a single file.
+        cache._store(key, model)
+        cache._store(key, model)
+        assert cache.statistics()['disk_bytes'] == os.path.getsize(cache._path(key))
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from heatcapacity.design import (FAMILIES, design, excitation, fisher_information,
+                                 relative_uncertainty)
+from heatcapacity.fit import FirstOrder
+from heatcapacity.montecarlo import monte_carlo
+from heatcapacity.simulation import Simulation
+
+
+class TestDesign(object):
+    prior = FirstOrder.from_ck(0.004, 0.002)
+
+    @pytest.mark.parametrize('family', FAMILIES)
+    def test_excitation(self, family):
+        power = excitation(family, 1000, 20)
+        assert power[0] == 1.
+        assert np.all((power >= 0.) & (power <= 1.))
+        np.testing.assert_array_equal(excitation(family, 300, 20), power[:300])
+
+    def test_excitation_unknown(self):
+        with pytest.raises(ValueError):
+            excitation('sine', 100, 10)
+
+    def test_fisher_information(self):
+        """The sensitivities match finite differences of the simulated response."""
+        power = 1e-3 * excitation('multistep', 500, 30)
+        current = np.sqrt(power)
+
+        def response(c, k):
+            sim = Simulation(FirstOrder.from_ck(c, k), 0.1, heater_resistance=1., sigma=0.)
+            return sim.simulate(current)[1]
+
+        eps = 1e-6
+        jacobian = np.column_stack([
+            (response(0.004 * (1. + eps), 0.002) - response(0.004, 0.002)) / eps,
+            (response(0.004, 0.002 * (1. + eps)) - response(0.004, 0.002)) / eps,
+        ])
+        expected = np.dot(jacobian.T, jacobian) / 1e-3**2
+        information = fisher_information(self.prior, power, 0.1, sigma=1e-3)
+        np.testing.assert_allclose(information[:2, :2], expected, rtol=1e-4)
+
+    def test_design(self):
+        best = design(self.prior, sampling=0.1, sigma=2e-2, target=0.01,
+                      max_current=1e-3, heater_resistance=1e3)
+        assert best.family in FAMILIES
+        assert best.relative_uncertainty[0] <= 0.01
+        assert np.max(best.pulse) <= 1e-3
+        power = 1e3 * np.square(best.pulse)
+        # One sample less misses the target.
+        assert relative_uncertainty(self.prior, power[:-1], 0.1, 2e-2)[0] > 0.01
+
+        # The prediction is validated by fitting simulated measurements.
+        result = monte_carlo(self.prior, best.pulse, sampling=0.1, sigma=2e-2, trials=200,
+                             heater_resistance=1e3, method='fit_integral', seed=0)
+        assert result.std()[0] / 0.004 == pytest.approx(0.01, rel=0.25)
+
+    def test_design_unreachable(self):
+        with pytest.raises(ValueError):
+            design(self.prior, sampling=0.1, sigma=2e-2, target=0.01, max_current=1e-3,
+                   heater_resistance=1e3, families=('step',))
@@ -1,9 +1,226 @@
+import numpy as np
+import pytest
+
 from heatcapacity import fit
 
 
+def step_response(c, k, t, t0=0., power=1.):
+    """Analytic response of a first order model to a heater power step."""
+    u = np.where(t >= t0, power, 0.)
+    y = np.where(t >= t0, power / k * (1. - np.exp(-k / c * (t - t0))), 0.)
+    return y, u
+
+
 class TestFitFirstOrderModel(object):
     def test_from_ck(self):
         c, k = 0.005, 0.002
         model = fit.FirstOrder.from_ck(c, k)
         assert model.heat_capacity == c
         assert model.thermal_conductivity == k
+
+    def test_fit_batch(self):
+        c = np.array([0.004, 0.005, 0.006])
+        k = np.array([0.002, 0.001, 0.003])
+        t = np.linspace(0., 30., 3001)
+        y, u = zip(*[step_response(ci, ki, t, t0=5.) for ci, ki in zip(c, k)])
+
+        heat_capacity, thermal_conductivity = fit.FirstOrder.fit_batch(t, np.array(y), np.array(u))
+        np.testing.assert_allclose(heat_capacity, c, rtol=1e-2)
+        np.testing.assert_allclose(thermal_conductivity, k, rtol=1e-2)
+
+        # Ragged traces give the same result as their scalar counterparts.
+        ts = [t[:1000], t[:2000], t]
+        ys = [yi[:len(ti)] for yi, ti in zip(y, ts)]
+        us = [ui[:len(ti)] for ui, ti in zip(u, ts)]
+        heat_capacity, thermal_conductivity = fit.FirstOrder.fit_batch(ts, ys, us)
+        for ti, yi, ui, ci, ki in zip(ts, ys, us, heat_capacity, thermal_conductivity):
+            model = fit.FirstOrder.fit(ti, yi, ui, derivative='gradient')
+            assert model.heat_capacity == pytest.approx(ci, rel=1e-9)
+            assert model.thermal_conductivity == pytest.approx(ki, rel=1e-9)
+        np.testing.assert_allclose(heat_capacity, c, rtol=1e-2)
+        np.testing.assert_allclose(thermal_conductivity, k, rtol=1e-2)
+
+    def test_predict_batch(self):
+        c = np.array([0.004, 0.005, 0.006])
+        k = np.array([0.002, 0.001, 0.003])
+        t = np.linspace(0., 30., 3001)
+        u = np.where(t >= 5., 1., 0.)
+        expected = np.array([fit.FirstOrder.from_ck(ci, ki).predict(t, u) for ci, ki in zip(c, k)])
+
+        y = fit.FirstOrder.predict_batch(c, k, t, np.tile(u, (3, 1)))
+        np.testing.assert_allclose(y, expected, rtol=1e-12, atol=1e-12)
+
+        # Ragged traces, each with its own initial temperature.
+        ts = [t[:1000], t[:2000], t]
+        us = [u[:len(ti)] for ti in ts]
+        ys = fit.FirstOrder.predict_batch(c, k, ts, us, y0=[1., 2., 3.])
+        for yi, ti, ui, ci, ki, y0 in zip(ys, ts, us, c, k, [1., 2., 3.]):
+            np.testing.assert_allclose(yi, fit.FirstOrder.from_ck(ci, ki).predict(ti, ui, y0), rtol=1e-12)
+
+    def test_residuals_batch(self):
+        c = np.array([0.004, 0.005])
+        k = np.array([0.002, 0.001])
+        t = np.linspace(0., 30., 3001)
+        y, u = (np.array(x) for x in zip(*[step_response(ci, ki, t, t0=5.) for ci, ki in zip(c, k)]))
+        noise = np.random.RandomState(0).normal(scale=1e-3, size=y.shape)
+
+        residuals, rms, r_squared = fit.FirstOrder.residuals_batch(c, k, t, y + noise, u, y0=0.)
+        np.testing.assert_allclose(residuals, noise, atol=1e-9)
+        np.testing.assert_allclose(rms, 1e-3, rtol=0.1)
+        assert np.all(r_squared > 0.999)
+
+        # A wrong model fits worse.
+        _, wrong_rms, wrong_r_squared = fit.FirstOrder.residuals_batch(2 * c, k, t, y + noise, u, y0=0.)
+        assert np.all(wrong_rms > rms) and np.all(wrong_r_squared < r_squared)
+
+    @pytest.mark.parametrize('derivative', sorted(fit.DERIVATIVES))
+    def test_fit(self, derivative):
+        c, k = 0.004, 0.002
+        t = np.linspace(0., 30., 3001)
+        y, u = step_response(c, k, t, t0=5.)
+
+        model = fit.FirstOrder.fit(t, y, u, derivative=derivative)
+        assert model.heat_capacity == pytest.approx(c, rel=2e-2)
+        assert model.thermal_conductivity == pytest.approx(k, rel=2e-2)
+
+    def test_is_uniform(self):
+        t = np.linspace(0., 10., 101)
+        assert fit.is_uniform(t)
+        assert fit.is_uniform(t + 1.5e9)
+        assert not fit.is_uniform(t ** 2)
+
+    def test_fit_integral(self):
+        c, k = 0.004, 0.002
+        t = np.linspace(0., 30., 3001)
+        y, u = step_response(c, k, t, t0=5.)
+
+        model = fit.FirstOrder.fit_integral(t, y, u)
+        assert model.heat_capacity == pytest.approx(c, rel=1e-2)
+        assert model.thermal_conductivity == pytest.approx(k, rel=1e-2)
+
+        # Traces starting off equilibrium are handled by fitting y(0).
+        model = fit.FirstOrder.fit_integral(t[1000:], y[1000:], u[1000:])
+        assert model.heat_capacity == pytest.approx(c, rel=1e-2)
+        assert model.thermal_conductivity == pytest.approx(k, rel=1e-2)
+
+        weights = np.where(t < 20., 1., 0.)
+        model = fit.FirstOrder.fit_integral(t, y, u, weights=weights)
+        assert model.heat_capacity == pytest.approx(c, rel=1e-2)
+
+    def test_fit_integral_hold(self):
+        c, k = 0.004, 0.002
+        # A coarsely sampled pulse, the current is held over each period.
+        t = np.arange(60) * 0.5
+        u = np.where((t >= 1.) & (t < 10.), 1e-3, 0.)
+        y = fit._response(k / c, 1. / c, t, u, 0.)
+
+        model = fit.FirstOrder.fit_integral(t, y, u)
+        # The trapezoidal power integral is off by 8% in C.
+        assert model.heat_capacity == pytest.approx(c, rel=1e-2)
+        assert model.thermal_conductivity == pytest.approx(k, rel=1e-6)
+
+    def test_fit_arx(self):
+        c, k = 0.004, 0.002
+        t = np.linspace(0., 30., 3001)
+        y, u = step_response(c, k, t, t0=5.)
+
+        model = fit.FirstOrder.fit_arx(t, y, u)
+        assert model.heat_capacity == pytest.approx(c, rel=1e-6)
+        assert model.thermal_conductivity == pytest.approx(k, rel=1e-6)
+
+        # Chunking does not change the result.
+        chunked = fit.FirstOrder.fit_arx(t, y, u, chunksize=7)
+        assert chunked.heat_capacity == pytest.approx(model.heat_capacity, rel=1e-9)
+
+        with pytest.raises(ValueError):
+            fit.FirstOrder.fit_arx(t ** 2, y, u)
+        # A missed sample.
+        with pytest.raises(ValueError):
+            fit.FirstOrder.fit_arx(np.delete(t, 100), np.delete(y, 100), np.delete(u, 100))
+
+        # The jitter of measured timestamps is tolerated.
+        jittered = t + np.random.RandomState(0).uniform(-1e-3, 1e-3, size=len(t))
+        for sampling in (None, 0.01):
+            model = fit.FirstOrder.fit_arx(jittered, y, u, sampling=sampling)
+            assert model.heat_capacity == pytest.approx(c, rel=1e-2)
+            assert model.thermal_conductivity == pytest.approx(k, rel=1e-2)
+        with pytest.raises(ValueError):
+            fit.FirstOrder.fit_arx(jittered, y, u, rtol=1e-4)
+
+        # A bath temperature offset is fitted as constant term.
+        model = fit.FirstOrder.fit_arx(t, y + 4.2, u, offset=True)
+        assert model.heat_capacity == pytest.approx(c, rel=1e-6)
+        assert model.thermal_conductivity == pytest.approx(k, rel=1e-6)
+        biased = fit.FirstOrder.fit_arx(t, y + 4.2, u)
+        assert biased.heat_capacity != pytest.approx(c, rel=1e-3)
+
+
+class TestSecondOrder(object):
+    parameters = (0.002, 0.004, 0.002, 0.001)
+
+    def test_from_ck(self):
+        model = fit.SecondOrder.from_ck(*self.parameters)
+        np.testing.assert_allclose(model._parameters(), self.parameters)
+        assert model.heat_capacity == pytest.approx(0.006)
+        # The slow time constant approaches the first order one.
+        assert model.time_constants[0] > 0.006 / 0.002 > model.time_constants[1]
+
+    def test_predict(self):
+        from scipy import signal
+
+        model = fit.SecondOrder.from_ck(*self.parameters)
+        t = np.arange(3000) * 0.1
+        u = np.where(t < 100., 1e-3, 0.)
+        expected = signal.lsim((model.num, model.den), u, t, interp=False)[1]
+        np.testing.assert_allclose(model.predict(t, u), expected, atol=1e-12)
+
+    @pytest.mark.parametrize('refine', [False, True])
+    def test_fit(self, refine):
+        t = np.arange(6000) * 0.1
+        u = np.where((t >= 10.) & (t < 310.), 1e-3, 0.)
+        y = fit.SecondOrder.from_ck(*self.parameters).predict(t, u)
+        y += np.random.RandomState(0).normal(scale=1e-3, size=y.shape)
+
+        model = fit.SecondOrder.fit(t, y, u, refine=refine)
+        np.testing.assert_allclose(model._parameters(), self.parameters, rtol=1e-2)
+
+    @pytest.mark.parametrize('den', [
+        [1., -1., 0.5],  # Complex poles.
+        [1., 0.3, -0.1],  # A negative pole.
+        [1., -2.5, 1.5],  # An unstable pole.
+    ])
+    def test_continuous_unphysical(self, den):
+        with pytest.raises(ValueError):
+            fit._continuous([0., 1e-3, -0.5e-3], den, dt=0.1)
+
+
+class TestRecursiveFirstOrder(object):
+    def test_update(self):
+        c, k = 0.004, 0.002
+        t = np.linspace(0., 30., 3001)
+        y, u = step_response(c, k, t, t0=5., power=1e-3)
+        y = y + np.random.RandomState(0).normal(scale=1e-3, size=len(t))
+
+        estimator = fit.RecursiveFirstOrder()
+        for sample in zip(t, u, y):
+            estimator.update(*sample)
+
+        expected = fit.FirstOrder.fit_integral(t, y, u)
+        assert estimator.heat_capacity == pytest.approx(expected.heat_capacity, rel=1e-4)
+        assert estimator.thermal_conductivity == pytest.approx(expected.thermal_conductivity, rel=1e-4)
+        assert estimator.variance == pytest.approx(1e-6, rel=0.5)
+        assert np.all(estimator.relative_uncertainty < 1e-2)
+        assert estimator.model().heat_capacity == estimator.heat_capacity
+
+    def test_hold(self):
+        c, k = 0.004, 0.002
+        # A coarsely sampled pulse, the current is held over each period.
+        t = np.arange(60) * 0.5
+        u = np.where((t >= 1.) & (t < 10.), 1e-3, 0.)
+        y = fit._response(k / c, 1. / c, t, u, 0.)
+
+        estimator = fit.RecursiveFirstOrder()
+        for sample in zip(t, u, y):
+            estimator.update(*sample)
+        assert estimator.heat_capacity == pytest.approx(c, rel=1e-2)
+        assert estimator.thermal_conductivity == pytest.approx(k, rel=1e-3)
@@ -0,0 +1,49 @@
+import subprocess
+import sys
+
+import pytest
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 7), reason='requires -X importtime')
+
+#: Cumulative import time budgets in seconds, measured with -X importtime.
+BUDGETS = {
+    'heatcapacity': 0.05,
+}
+
+
+def import_times(statement):
+    """Returns the cumulative import time in seconds of every module imported
+    by the statement."""
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.STDOUT, universal_newlines=True)
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) * 1e-6
+    return times
+
+
+def test_import_budget():
+    times = import_times('import heatcapacity')
+    for module, budget in BUDGETS.items():
+        assert times[module] < budget
+    heavy = [name for name in times if name.split('.')[0] in ('numpy', 'scipy', 'audiolazy')]
+    assert not heavy
+
+
+def test_fit_import():
+    times = import_times('import heatcapacity.fit')
+    assert 'heatcapacity.measure' not in times
+    assert 'audiolazy' not in times
+
+
+def test_lazy_attributes():
+    import heatcapacity as hc
+    assert hc.FirstOrder.__module__ == 'heatcapacity.fit'
+    assert hc.PulseMeasurement.__module__ == 'heatcapacity.measure'
+    assert 'Simulation' in dir(hc)
+    with pytest.raises(AttributeError):
+        hc.DoesNotExist
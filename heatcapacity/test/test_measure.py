@@ -0,0 +1,226 @@
+import time
+
+import numpy as np
+import pytest
+from scipy import signal
+
+from heatcapacity import measure
+from heatcapacity.fit import FirstOrder
+from heatcapacity.measure import (AdaptiveStep, Convergence, DerivativeThreshold, Equilibrium,
+                                  FIRFilter, Measurement, PulseMeasurement, Scheduler,
+                                  savitzky_golay)
+from heatcapacity.simulation import VirtualClock
+from heatcapacity.test.helpers import FailingPolicy, NeverPolicy, simulation
+
+
+class SlowClock(VirtualClock):
+    """A virtual clock where every reading takes some time."""
+    def __init__(self, latency):
+        super(SlowClock, self).__init__()
+        self.latency = latency
+
+    def monotonic(self):
+        self.now += self.latency
+        return self.now
+
+
+class TestScheduler(object):
+    def test_deadlines(self):
+        clock = VirtualClock()
+        scheduler = Scheduler(0.1, clock=clock)
+        wakeups = []
+        for _ in range(100):
+            with scheduler:
+                wakeups.append(clock.now)
+        np.testing.assert_allclose(np.diff(wakeups), 0.1)
+        assert clock.now == pytest.approx(10.)
+        assert scheduler.statistics()['overruns'] == 0
+
+    def test_overruns(self):
+        clock = VirtualClock()
+        scheduler = Scheduler(0.1, clock=clock)
+        for duration in [0.05, 0.25, 0.05]:
+            with scheduler:
+                clock.now += duration
+        # The overrun skips the deadline at 0.3 s, the grid is kept.
+        assert scheduler.overruns == 1
+        assert scheduler.missed == 1
+        assert clock.now == pytest.approx(0.4)
+
+    def test_jitter(self):
+        clock = SlowClock(latency=0.001)
+        scheduler = Scheduler(0.1, clock=clock)
+        for _ in range(10):
+            with scheduler:
+                pass
+        assert scheduler.max_jitter == pytest.approx(0.001)
+        assert scheduler.mean_jitter == pytest.approx(0.001)
+
+    def test_sampling(self, monkeypatch):
+        schedulers = []
+
+        class Recorder(Scheduler):
+            def __init__(self, *args, **kwargs):
+                super(Recorder, self).__init__(*args, **kwargs)
+                schedulers.append(self)
+
+        monkeypatch.setattr(measure, 'Scheduler', Recorder)
+        start = time.monotonic()
+        with measure.sampling(0.02, sleep_ratio=0.1):
+            pass
+        assert time.monotonic() - start >= 0.02
+        assert schedulers[0].spin == pytest.approx(0.002)
+
+
+class TestPulseMeasurement(object):
+    def test_start(self):
+        sim = simulation()
+        pulse = [0.] * 10 + [1e-3] * 100 + [0.] * 100
+        measurement = PulseMeasurement(sim, sim, sim, pulse, sampling_time=0.1)
+        measurement.clock = VirtualClock()
+        timestamp, power, temperature = measurement.start()
+
+        np.testing.assert_allclose(timestamp, np.arange(len(pulse)) * 0.1, atol=1e-9)
+        model = FirstOrder.fit_integral(timestamp, temperature, power)
+        assert model.heat_capacity == pytest.approx(0.004, rel=1e-3)
+        assert model.thermal_conductivity == pytest.approx(0.002, rel=1e-3)
+
+
+class FailingThermometer(object):
+    @property
+    def temperature(self):
+        raise IOError('Read failed.')
+
+
+class TestAdaptiveStep(object):
+    @pytest.mark.parametrize('threaded', [True, False])
+    def test_start(self, threaded):
+        sim = simulation()
+        measurement = AdaptiveStep(sim, sim, sim, duration=5., max_current=1e-3,
+                                   sampling=0.1, threaded=threaded)
+        measurement.clock = VirtualClock()
+        timestamp, power, temperature = measurement.start()
+
+        assert measurement.scheduler.overruns == 0
+        model = FirstOrder.fit_integral(timestamp, temperature, power)
+        assert model.heat_capacity == pytest.approx(0.004, rel=1e-3)
+        assert model.thermal_conductivity == pytest.approx(0.002, rel=1e-3)
+
+
+class TestAnalysisError(object):
+    @pytest.mark.parametrize('threaded', [True, False])
+    def test_heater_off(self, threaded):
+        sim = simulation()
+        measurement = AdaptiveStep(sim, sim, sim, duration=5., max_current=1e-3,
+                                   sampling=0.1, threaded=threaded, policy=FailingPolicy())
+        measurement.clock = VirtualClock()
+        with pytest.raises(RuntimeError):
+            measurement.start()
+        assert sim.current == 0.
+
+
+class TestStopPolicy(object):
+    def measure(self, policy, sigma=1e-3):
+        sim = simulation(sigma=sigma, seed=0)
+        measurement = AdaptiveStep(sim, sim, sim, duration=5., max_current=1e-3,
+                                   sampling=0.1, threaded=False, policy=policy)
+        measurement.clock = VirtualClock()
+        return measurement.start(verbose=True)
+
+    def test_default(self):
+        timestamp, power, temperature, derivative = self.measure(None)
+        expected = self.measure(DerivativeThreshold(threshold=1.))
+        np.testing.assert_array_equal(temperature, expected[2])
+        assert len(derivative) == len(timestamp)
+        heating = np.count_nonzero(power)
+        assert heating >= 50
+        assert len(timestamp) == pytest.approx(50 + 2 * heating, abs=1)
+
+    @pytest.mark.parametrize('tau', [2., None])
+    def test_equilibrium(self, tau):
+        timestamp, power, temperature, _ = self.measure(Equilibrium(multiple=5., tau=tau))
+        assert np.count_nonzero(power) == pytest.approx(100, abs=5)
+        assert len(timestamp) == pytest.approx(250, abs=10)
+
+    @pytest.mark.parametrize('threaded', [True, False])
+    def test_max_duration(self, threaded):
+        sim = simulation(sigma=1e-3, seed=0)
+        measurement = AdaptiveStep(sim, sim, sim, duration=5., max_current=1e-3, sampling=0.1,
+                                   threaded=threaded, policy=NeverPolicy(), max_duration=3.)
+        measurement.clock = VirtualClock()
+        with pytest.warns(RuntimeWarning):
+            timestamp, power, temperature = measurement.start()
+        assert measurement.timeouts == ['heating', 'decay']
+        assert np.count_nonzero(power) == pytest.approx(30, abs=1)
+        assert len(timestamp) == pytest.approx(50 + 60, abs=1)
+        assert sim.current == 0.
+
+    def test_convergence(self):
+        timestamp, power, temperature, _ = self.measure(Convergence(tolerance=0.01))
+        default = self.measure(None)
+        assert len(timestamp) < len(default[0])
+        model = FirstOrder.fit_integral(timestamp, temperature, power)
+        assert model.heat_capacity == pytest.approx(0.004, rel=0.03)
+        assert model.thermal_conductivity == pytest.approx(0.002, rel=0.03)
+
+
+class SlowInstrument(object):
+    """An instrument where every read blocks for some time."""
+    def __init__(self, latency):
+        self.latency = latency
+        #: The `(start, stop)` times of every read.
+        self.reads = []
+
+    def _read(self):
+        start = time.monotonic()
+        time.sleep(self.latency)
+        self.reads.append((start, time.monotonic()))
+        return 2.
+
+    current = voltage = temperature = property(_read)
+
+
+class TestMeasurement(object):
+    @pytest.mark.parametrize('concurrent', [False, True])
+    def test_measure(self, concurrent):
+        instrument = SlowInstrument(0.05)
+        measurement = Measurement(instrument, instrument, instrument, concurrent=concurrent)
+        timestamp, power, temperature = measurement.measure()
+        measurement.close()
+
+        assert (power, temperature) == (4., 2.)
+        assert sorted(measurement.latency) == ['current', 'temperature', 'voltage']
+        assert all(latency >= 0.05 for latency in measurement.latency.values())
+        assert all(t > timestamp for t in measurement.timestamps.values())
+        # The reads overlap if and only if they are concurrent, which does
+        # not depend on the wall clock duration of the reads.
+        starts, stops = zip(*instrument.reads)
+        assert (max(starts) < min(stops)) == concurrent
+
+    def test_acquisition_error(self):
+        sim = simulation()
+        measurement = AdaptiveStep(sim, sim, FailingThermometer(), duration=5.,
+                                   max_current=1e-3, sampling=0.1)
+        measurement.clock = VirtualClock()
+        with pytest.raises(IOError):
+            measurement.start()
+
+
+class TestFIRFilter(object):
+    def test_filter(self):
+        coefficients = [0.5, 0.25, 0.125, 0.0625]
+        x = np.random.RandomState(0).normal(size=50)
+        expected = signal.lfilter(coefficients, 1., x)
+
+        fir = FIRFilter(coefficients)
+        np.testing.assert_allclose([fir(xi) for xi in x], expected)
+
+        fir.reset()
+        y = np.r_[fir.process(x[:2]), fir.process([]), [fir(xi) for xi in x[2:20]], fir.process(x[20:])]
+        np.testing.assert_allclose(y, expected)
+
+    def test_savitzky_golay(self):
+        derivative = savitzky_golay(7, 2, deriv=1, sampling=0.1)
+        t = np.arange(100) * 0.1
+        y = derivative.process(3. * t + 1.)
+        np.testing.assert_allclose(y[6:], 3.)
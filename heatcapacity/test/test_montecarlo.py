@@ -0,0 +1,24 @@
+import numpy as np
+
+from heatcapacity.fit import FirstOrder
+from heatcapacity.montecarlo import monte_carlo
+
+
+class TestMonteCarlo(object):
+    def test_monte_carlo(self):
+        c, k = 0.004, 0.002
+        pulse = np.r_[np.zeros(50), np.full(150, 1e-3), np.zeros(150)]
+        kwargs = dict(model=FirstOrder.from_ck(c, k), pulse=pulse, sampling=0.1,
+                      sigma=1e-3, trials=20, heater_resistance=1e3,
+                      method='fit_integral', seed=1)
+
+        result = monte_carlo(workers=1, **kwargs)
+        assert len(result) == 20
+        (c_low, c_high), (k_low, k_high) = result.confidence_interval(0.99)
+        assert c_low < c < c_high
+        assert k_low < k < k_high
+
+        # The result does not depend on the number of workers.
+        parallel = monte_carlo(workers=2, **kwargs)
+        np.testing.assert_array_equal(parallel.heat_capacity, result.heat_capacity)
+        np.testing.assert_array_equal(parallel.thermal_conductivity, result.thermal_conductivity)
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from heatcapacity.fit import FirstOrder
+from heatcapacity.multiplex import Multiplexer, Platform
+from heatcapacity.simulation import SimulatedScanner, Simulation, VirtualClock
+from heatcapacity.test.helpers import SlowPowermeter, simulation
+
+MODELS = {1: (0.004, 0.002), 2: (0.01, 0.004), 3: (0.002, 0.003)}
+
+
+def engine(period, settle=0.03, latency=0., pulse=None, **kwargs):
+    clock = VirtualClock()
+    sims = dict((channel, Simulation(FirstOrder.from_ck(c, k), sampling=period,
+                                     heater_resistance=1e3, sigma=0.))
+                for channel, (c, k) in MODELS.items())
+    if pulse is None:
+        pulse = [0.] * 20 + [1e-3] * 100 + [0.] * 100
+    platforms = [Platform('platform{}'.format(channel), sim,
+                          SlowPowermeter(sim, clock, latency), channel, pulse)
+                 for channel, sim in sorted(sims.items())]
+    scanner = SimulatedScanner(sims, settle=settle, clock=clock)
+    multiplexer = Multiplexer(platforms, scanner, settle=settle, **kwargs)
+    multiplexer.clock = clock
+    return multiplexer, scanner
+
+
+class TestMultiplexer(object):
+    def test_start(self):
+        multiplexer, scanner = engine(0.1, sampling=0.1)
+        traces = multiplexer.start()
+
+        assert scanner.early_reads == 0
+        assert multiplexer.scheduler.overruns == 0
+        assert sorted(traces) == ['platform1', 'platform2', 'platform3']
+        for channel, (c, k) in MODELS.items():
+            timestamp, power, temperature = traces['platform{}'.format(channel)]
+            assert len(timestamp) == 220
+            np.testing.assert_allclose(np.diff(timestamp), 0.1)
+            # Without noise, the ARX fit of the sampled response is exact.
+            model = FirstOrder.fit_arx(timestamp, temperature, power)
+            assert model.heat_capacity == pytest.approx(c, rel=1e-6)
+            assert model.thermal_conductivity == pytest.approx(k, rel=1e-6)
+
+    @pytest.mark.parametrize('interleave', [True, False])
+    def test_throughput(self, interleave):
+        multiplexer, scanner = engine(0.1, settle=0.03, latency=0.02, interleave=interleave,
+                                      pulse=np.zeros(10))
+        multiplexer.start()
+
+        statistics = multiplexer.statistics()
+        assert scanner.early_reads == 0
+        assert statistics['samples'] == statistics['switches'] == 30
+        # Interleaving hides the powermeter read in the settling time.
+        slot = 0.03 if interleave else 0.05
+        assert statistics['duration'] == pytest.approx(30 * slot)
+        assert statistics['samples_per_second'] == pytest.approx(1. / slot)
+
+    def test_unequal_pulses(self):
+        clock = VirtualClock()
+        sims = dict((channel, simulation())
+                    for channel in (1, 2))
+        platforms = [Platform('short', sims[1], sims[1], 1, [1e-3] * 5),
+                     Platform('long', sims[2], sims[2], 2, [1e-3] * 8)]
+        multiplexer = Multiplexer(platforms, SimulatedScanner(sims, clock=clock))
+        multiplexer.clock = clock
+        traces = multiplexer.start()
+        assert len(traces['short'][0]) == 5
+        assert len(traces['long'][0]) == 8
+        # The remaining platform is not switched away from.
+        assert multiplexer.switches == 10
+
+    def test_unequal_pulses_timing(self):
+        clock = VirtualClock()
+        sims = dict((channel, simulation())
+                    for channel in (1, 2))
+        platforms = [Platform('short', sims[1], SlowPowermeter(sims[1], clock, 0.02), 1, [1e-3] * 5),
+                     Platform('long', sims[2], SlowPowermeter(sims[2], clock, 0.02), 2, [1e-3] * 8)]
+        # Without a cycle period, the long pulse is sampled faster once the
+        # short one finished.
+        multiplexer = Multiplexer(platforms, SimulatedScanner(sims, clock=clock))
+        multiplexer.clock = clock
+        timestamp = multiplexer.start()['long'][0]
+        np.testing.assert_allclose(np.diff(timestamp), [0.04] * 4 + [0.02] * 3)
+
+        # With a cycle period, it moves to the first slot of the cycle.
+        multiplexer.sampling = 0.1
+        timestamp = multiplexer.start()['long'][0]
+        np.testing.assert_allclose(np.diff(timestamp), [0.1] * 4 + [0.08] + [0.1] * 2)
+
+    def test_unique_names(self):
+        sim = simulation()
+        platforms = [Platform('a', sim, sim, 1, [0.]), Platform('a', sim, sim, 2, [0.])]
+        with pytest.raises(ValueError):
+            Multiplexer(platforms, SimulatedScanner({1: sim, 2: sim}))
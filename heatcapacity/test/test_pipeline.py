@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from heatcapacity.fit import FirstOrder
+from heatcapacity.pipeline import fit_pulses, iter_pulses, iter_traces, load_sweep, sweep
+from heatcapacity.segment import fit_segments, segment
+from heatcapacity.storage import TraceWriter
+from heatcapacity.test.helpers import pulse_train
+
+
+def trace():
+    models = [FirstOrder.from_ck(0.002 * (1. + i), 0.002) for i in range(5)]
+    return pulse_train(models, baths=[8., 4., 6., 5., 7.])
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt(pulses, count):
+    for i, pulse in enumerate(pulses):
+        if i == count:
+            raise Interrupted()
+        yield pulse
+
+
+class TestPipeline(object):
+    def test_iter_pulses(self):
+        t, y, u = trace()
+        expected = segment(t, y, u)
+        for blocksize in (7, 400, 10**6):
+            pulses = list(iter_pulses(t, y, u, blocksize=blocksize))
+            assert [(len(p[0]), p[0][0]) for p in pulses] == [(j - i, t[i]) for i, j in expected]
+
+        # Noisy power readings chatter around the threshold.
+        u = u + np.random.RandomState(0).normal(scale=2e-4, size=len(u))
+        expected = segment(t, y, u, hysteresis=6e-4)
+        assert len(expected) == 5
+        for blocksize in (7, 400, 10**6):
+            pulses = list(iter_pulses(t, y, u, blocksize=blocksize, hysteresis=6e-4))
+            assert [(len(p[0]), p[0][0]) for p in pulses] == [(j - i, t[i]) for i, j in expected]
+
+    def test_iter_pulses_glitches(self):
+        t, y, u = trace()
+        # Short power glitches, the last one at the end of the trace.
+        u = u.copy()
+        for i in (400, 401, 1100, 1799, len(u) - 2, len(u) - 1):
+            u[i] = 1e-3
+        assert len(segment(t, y, u)) > 5
+        expected = segment(t, y, u, min_samples=5)
+        assert len(expected) == 5
+        for blocksize in (7, 400, 10**6):
+            pulses = list(iter_pulses(t, y, u, blocksize=blocksize, min_samples=5))
+            assert [(len(p[0]), p[0][0]) for p in pulses] == [(j - i, t[i]) for i, j in expected]
+
+    def test_iter_traces(self, tmpdir):
+        t, y, u = trace()
+        paths = []
+        for i, (start, stop) in enumerate(segment(t, y, u)):
+            paths.append(str(tmpdir.join('pulse{}.npy'.format(i))))
+            with TraceWriter(paths[-1]) as writer:
+                for sample in zip(t[start:stop], u[start:stop], y[start:stop]):
+                    writer.append(sample)
+        rows = np.vstack(list(fit_pulses(iter_traces(paths), chunksize=2)))
+        np.testing.assert_allclose(rows[:, 1], fit_segments(t, y, u, workers=1)['heat_capacity'])
+
+    def test_sweep(self, tmpdir):
+        path = str(tmpdir.join('sweep.npy'))
+        t, y, u = trace()
+
+        with pytest.raises(Interrupted):
+            sweep(interrupt(iter_pulses(t, y, u), 3), path, chunksize=2)
+        # The first chunk was checkpointed, the second one is incomplete.
+        assert len(load_sweep(path)['pulse']) == 2
+
+        assert sweep(iter_pulses(t, y, u), path, chunksize=2) == 3
+        assert sweep(iter_pulses(t, y, u), path, chunksize=2) == 0
+
+        curve = load_sweep(path)
+        table = fit_segments(t, y, u, workers=1)
+        np.testing.assert_array_equal(curve['pulse'], [1, 3, 2, 4, 0])
+        np.testing.assert_array_equal(np.diff(curve['temperature']) > 0, True)
+        np.testing.assert_allclose(curve['heat_capacity'], table['heat_capacity'][[1, 3, 2, 4, 0]])
+        np.testing.assert_allclose(curve['heat_capacity'], [0.004, 0.008, 0.006, 0.01, 0.002], rtol=1e-2)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from heatcapacity import profiling
+from heatcapacity.fit import FirstOrder
+from heatcapacity.measure import AdaptiveStep, PulseMeasurement, Scheduler
+from heatcapacity.simulation import VirtualClock
+from heatcapacity.test.helpers import simulation
+
+
+@pytest.fixture
+def enabled():
+    profiling.reset()
+    profiling.enable()
+    yield
+    profiling.disable()
+    profiling.reset()
+
+
+class TestProfiling(object):
+    def test_disabled(self):
+        profiling.reset()
+        sim = simulation()
+        measurement = PulseMeasurement(sim, sim, sim, np.zeros(10), 0.1)
+        measurement.clock = VirtualClock()
+        measurement.start()
+        assert profiling.summary() == {}
+
+    def test_measurement(self, enabled):
+        events = []
+        hook = lambda kind, name, value: events.append((kind, name))
+        profiling.add_hook(hook)
+        try:
+            sim = simulation()
+            measurement = AdaptiveStep(sim, sim, sim, duration=5., max_current=1e-3, sampling=0.1)
+            measurement.clock = VirtualClock()
+            timestamp, power, temperature = measurement.start()
+        finally:
+            profiling.remove_hook(hook)
+
+        summary = profiling.summary()
+        for channel in ('current', 'voltage', 'temperature'):
+            assert summary['measure.' + channel]['count'] == len(timestamp)
+        assert summary['adaptive_step.filter']['count'] == len(timestamp)
+        assert summary['adaptive_step.filter']['max'] >= summary['adaptive_step.filter']['mean'] > 0
+        assert len(events) == 4 * len(timestamp)
+
+        FirstOrder.fit(timestamp, temperature, power)
+        summary = profiling.summary()
+        for stage in ('resample', 'derivative', 'spline', 'lstsq'):
+            assert summary['fit.' + stage]['count'] >= 1
+        assert 'fit.lstsq' in profiling.report()
+
+    def test_overrun(self, enabled):
+        clock = VirtualClock()
+        scheduler = Scheduler(0.1, clock=clock)
+        with scheduler:
+            clock.sleep(0.35)
+        summary = profiling.summary()
+        assert summary['scheduler.overrun']['total'] == pytest.approx(0.25)
+        assert summary['scheduler.missed']['count'] == 2
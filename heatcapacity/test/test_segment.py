@@ -0,0 +1,58 @@
+import numpy as np
+
+from heatcapacity.fit import FirstOrder
+from heatcapacity.segment import find_edges, fit_segments, segment
+from heatcapacity.test.helpers import pulse_train
+
+
+class TestSegment(object):
+    def test_find_edges(self):
+        rising, falling = find_edges([0, 0, 1, 1, 0, 1, 0])
+        np.testing.assert_array_equal(rising, [2, 5])
+        np.testing.assert_array_equal(falling, [4, 6])
+
+    def test_segment(self):
+        u = np.r_[0, 0, 1, 1, 0, 1, 0]
+        assert segment(np.arange(7), u, u) == [(2, 5), (5, 7)]
+
+    def test_hysteresis(self):
+        # Noise around the threshold chatters within the band.
+        u = np.r_[0., 0.4, 0.6, 0.45, 0.9, 1., 0.55, 0.4, 0.6, 0.1, 0.]
+        rising, falling = find_edges(u, threshold=0.5)
+        assert len(rising) == 3
+        rising, falling = find_edges(u, threshold=0.5, hysteresis=0.4)
+        np.testing.assert_array_equal(rising, [4])
+        np.testing.assert_array_equal(falling, [9])
+
+    def test_min_samples(self):
+        u = np.r_[1, 1, 0, 0, 1, 0, 0, 1, 1, 1, 0, 1]
+        rising, falling = find_edges(u, min_samples=2)
+        np.testing.assert_array_equal(rising, [7])
+        np.testing.assert_array_equal(falling, [2, 10])
+
+    def test_fit_segments(self):
+        models = [FirstOrder.from_ck(c, 0.002) for c in (0.002, 0.004, 0.008)]
+        baths = [4., 5., 6.]
+        t, y, u = pulse_train(models, baths)
+
+        table = fit_segments(t, y, u, workers=1)
+        assert len(table) == 3
+        np.testing.assert_allclose(table['heat_capacity'], [0.002, 0.004, 0.008], rtol=1e-2)
+        np.testing.assert_allclose(table['thermal_conductivity'], 0.002, rtol=1e-2)
+        assert np.all((table['temperature'] > baths) & (table['temperature'] < np.add(baths, 0.5)))
+        assert np.all(table['residual'] < 1e-3)
+
+        parallel = fit_segments(t, y, u, workers=2)
+        np.testing.assert_array_equal(parallel, table)
+
+    def test_fit_failure(self):
+        models = [FirstOrder.from_ck(c, 0.002) for c in (0.002, 0.004)]
+        t, y, u = pulse_train(models, [4., 5.])
+        # A truncated last pulse with a single sample.
+        t, y, u = np.r_[t, t[-1] + 0.1], np.r_[y, y[-1]], np.r_[u, 1e-3]
+
+        table = fit_segments(t, y, u, workers=1)
+        assert len(table) == 3
+        np.testing.assert_allclose(table['heat_capacity'][:2], [0.002, 0.004], rtol=1e-2)
+        assert np.isnan(table['heat_capacity'][2])
+        assert np.isnan(table['residual'][2])
@@ -0,0 +1,30 @@
+import numpy as np
+
+from heatcapacity.test.helpers import simulation
+
+
+class TestSimulation(object):
+    def test_step_response(self):
+        sim = simulation()
+        sim.current = 1e-3
+        temperature = [sim.temperature for _ in range(200)]
+        t = np.arange(200) * 0.1
+        expected = 1e-3 / 0.002 * (1. - np.exp(-0.5 * t))
+        np.testing.assert_allclose(temperature, expected, atol=1e-12)
+
+    def test_simulate(self):
+        current = np.r_[np.zeros(10), np.full(50, 1e-3), np.zeros(40)]
+        sim = simulation(sigma=1e-3, seed=42)
+        power = []
+        temperature = []
+        for value in current:
+            sim.current = value
+            power.append(sim.power)
+            temperature.append(sim.temperature)
+
+        bulk = simulation(sigma=1e-3, seed=42)
+        p, y = bulk.simulate(current[:30])
+        p2, y2 = bulk.simulate(current[30:])
+        np.testing.assert_allclose(np.r_[p, p2], power)
+        np.testing.assert_allclose(np.r_[y, y2], temperature)
+        assert bulk.current == current[-1]
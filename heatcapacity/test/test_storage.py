@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from heatcapacity.fit import FirstOrder
+from heatcapacity.measure import PulseMeasurement
+from heatcapacity.simulation import VirtualClock
+from heatcapacity.storage import TraceWriter, load_trace
+from heatcapacity.test.helpers import simulation
+
+
+class TestTraceWriter(object):
+    def test_append(self, tmpdir):
+        path = str(tmpdir.join('trace.npy'))
+        samples = np.arange(30.).reshape(10, 3)
+        clock = VirtualClock()
+        writer = TraceWriter(path, chunksize=4, flush_interval=1., clock=clock)
+        for sample in samples[:6]:
+            writer.append(sample)
+        # One full chunk is on disk and readable, e.g. after a crash.
+        assert writer.rows == 4
+        np.testing.assert_array_equal(np.column_stack(load_trace(path)), samples[:4])
+        assert np.load(path).shape == (4,)
+
+        # Pending samples are flushed once they exceed the flush interval.
+        clock.sleep(1.)
+        writer.append(samples[6])
+        assert writer.rows == 7
+
+        for sample in samples[7:]:
+            writer.append(sample)
+        writer.close()
+        np.testing.assert_array_equal(np.column_stack(load_trace(path)), samples)
+        np.testing.assert_array_equal(np.column_stack(load_trace(path, mmap=False)), samples)
+        assert np.load(path)['power'].tolist() == samples[:, 1].tolist()
+
+    def test_measurement(self, tmpdir):
+        path = str(tmpdir.join('trace.npy'))
+        sim = simulation()
+        pulse = [0.] * 10 + [1e-3] * 100 + [0.] * 100
+        measurement = PulseMeasurement(sim, sim, sim, pulse, sampling_time=0.1)
+        measurement.clock = VirtualClock()
+        with TraceWriter(path) as writer:
+            measurement.writer = writer
+            result = measurement.start()
+
+        timestamp, power, temperature = load_trace(path)
+        np.testing.assert_array_equal(np.column_stack(result), np.column_stack((timestamp, power, temperature)))
+        model = FirstOrder.fit_integral(timestamp, temperature, power)
+        assert model.heat_capacity == pytest.approx(0.004, rel=1e-3)
+
+    def test_bounded_memory(self, tmpdir):
+        path = str(tmpdir.join('trace.npy'))
+        sim = simulation()
+        pulse = [0.] * 10 + [1e-3] * 100 + [0.] * 100
+        measurement = PulseMeasurement(sim, sim, sim, pulse, sampling_time=0.1)
+        measurement.clock = VirtualClock()
+        measurement.tail = 50
+        with TraceWriter(path, chunksize=16) as writer:
+            measurement.writer = writer
+            result = measurement.start()
+
+        trace = np.column_stack(load_trace(path))
+        assert len(trace) == 210
+        np.testing.assert_array_equal(np.column_stack(result), trace[-50:])
+
+    def test_append_to_existing(self, tmpdir):
+        path = str(tmpdir.join('trace.npy'))
+        samples = np.arange(30.).reshape(10, 3)
+        with TraceWriter(path) as writer:
+            for sample in samples[:4]:
+                writer.append(sample)
+        # An incomplete sample of an interrupted run is discarded.
+        with open(path, 'ab') as f:
+            f.write(b'\0' * 5)
+
+        with TraceWriter(path, append=True) as writer:
+            assert writer.rows == 4
+            for sample in samples[4:]:
+                writer.append(sample)
+        np.testing.assert_array_equal(np.load(path).view('<f8').reshape(-1, 3), samples)
+
+        with pytest.raises(ValueError):
+            TraceWriter(path, columns=('timestamp', 'power'), append=True)
+
+    def test_header_size(self, tmpdir):
+        # The header of this dtype would grow at 100000 rows if its size
+        # depended on the row count.
+        path = str(tmpdir.join('trace.npy'))
+        samples = np.arange(200002.).reshape(-1, 2)
+        with TraceWriter(path, columns=('timestamp', 'power'), chunksize=4096) as writer:
+            for sample in samples[:100000]:
+                writer.append(sample)
+        with TraceWriter(path, columns=('timestamp', 'power'), append=True) as writer:
+            assert writer.rows == 100000
+            writer.append(samples[100000])
+        np.testing.assert_array_equal(np.load(path).view('<f8').reshape(-1, 2), samples)
+        np.testing.assert_array_equal(np.column_stack(load_trace(path)), samples)
@@ -27,4 +27,5 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     install_requires=requires,
+    python_requires='>=3.7',
 )